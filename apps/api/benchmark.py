@@ -0,0 +1,326 @@
+"""Concurrent-load benchmarks of the reservation and carpool services and of the GraphQL end-point.
+
+Every scenario runs the given number of operations split among worker threads (or processes) and reports
+throughput, latency percentiles, DB queries per operation, errors and retry rate of reservations as a plain dict
+ready to be dumped as JSON. Scenarios write into the database, so they are meant to be run against a throw-away
+one (see the `benchmark` management command).
+"""
+
+import json
+import math
+import multiprocessing
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from django.db import connection, connections
+from django.test import RequestFactory
+from django.urls import resolve
+
+from apps.carpool import services as carpool
+from apps.carpool.models import Car, CarMake, CarModel
+from apps.reservation import metrics as reservation_metrics, services as reservation
+from apps.reservation.models import Reservation
+
+
+EXECUTOR_THREAD = 'thread'
+EXECUTOR_PROCESS = 'process'
+
+SEED_CHUNK_SIZE = 2000
+
+
+@dataclass
+class Fleet:
+    """Seeded data the operations pick their arguments from."""
+
+    start: datetime
+    slots: int
+    cars: list[tuple[str, str, str, str]]  # (car_id, registration_number, make, model)
+    models: list[tuple[str, str]]  # (make, model)
+
+
+def seed(cars: int, reservations: int, start: datetime, seed: int = 0) -> Fleet:
+    """Create `cars` cars (of a few models) and about `reservations` reservations spread evenly among them.
+
+    Each car is reserved for every other hour since `start` (even cars for the even hours, odd cars for the odd
+    ones), so that each hour of the benchmark window has only some cars free.
+    """
+
+    rng = random.Random(seed)
+
+    makes = CarMake.objects.bulk_create([
+        CarMake(name=name, official_name=name) for name in ('Skoda', 'Volkswagen', 'Toyota')
+    ])
+    models = CarModel.objects.bulk_create([
+        CarModel(make=make, name=f'Model {i}') for make in makes for i in range(1, 4)
+    ])
+    car_objects = Car.objects.bulk_create(
+        [
+            Car(car_id=f'C{i}', registration_number=f'R{i:07d}', model=rng.choice(models))
+            for i in range(1, cars + 1)
+        ],
+        batch_size=SEED_CHUNK_SIZE,
+    )
+
+    per_car = math.ceil(reservations / cars) if cars else 0
+    chunk = []
+    for j in range(per_car):
+        for k, car in enumerate(car_objects):
+            if j * cars + k >= reservations:
+                break
+
+            to_rent_at = start + timedelta(hours=2 * j + k % 2)
+            chunk.append(Reservation(
+                car=car,
+                to_rent_at=to_rent_at,
+                to_return_at=to_rent_at + timedelta(hours=1),
+                request_id=uuid.UUID(int=rng.getrandbits(128)),
+            ))
+            if len(chunk) >= SEED_CHUNK_SIZE:
+                Reservation.objects.bulk_create(chunk)
+                chunk = []
+    Reservation.objects.bulk_create(chunk)
+
+    models_by_pk = {model.pk: model for model in models}
+    return Fleet(
+        start=start,
+        slots=2 * per_car + 2,
+        cars=[
+            (
+                car.car_id,
+                car.registration_number,
+                models_by_pk[car.model_id].make.name,
+                models_by_pk[car.model_id].name,
+            )
+            for car in car_objects
+        ],
+        models=[(model.make.name, model.name) for model in models],
+    )
+
+
+def _make_reservation(fleet: Fleet, rng: random.Random, i: int):
+    reservation.make_reservation(
+        request_id=uuid.UUID(int=rng.getrandbits(128)),
+        to_rent_at=fleet.start + timedelta(hours=rng.randrange(fleet.slots)),
+        duration=timedelta(hours=1),
+    )
+
+
+def _get_or_create_car(fleet: Fleet, rng: random.Random, i: int):
+    # half of the requests ask for an existing car, the other half creates a new one
+    if fleet.cars and rng.random() < 0.5:
+        car_id, registration_number, make, model = rng.choice(fleet.cars)
+    else:
+        car_id, registration_number = f'C{len(fleet.cars) + 1 + i}', f'N{i:07d}'
+        make, model = rng.choice(fleet.models)
+
+    carpool.get_or_create_car(make, model, car_id, registration_number)
+
+
+def _all_cars(fleet: Fleet, rng: random.Random, i: int):
+    len(carpool.all_cars())
+
+
+def _graphql(query: str, variables: dict | None = None):
+    view = resolve('/gql', urlconf='apps.api.urls').func
+    request = RequestFactory().post(
+        '/gql',
+        data=json.dumps({'query': query, 'variables': variables or {}}),
+        content_type='application/json',
+    )
+    response = view(request)
+    if response.status_code != 200:
+        raise RuntimeError(f'GraphQL request failed with status {response.status_code}')
+    if errors := json.loads(response.content).get('errors'):
+        raise RuntimeError(errors[0].get('message'))
+
+
+def _graphql_cars(fleet: Fleet, rng: random.Random, i: int):
+    _graphql('{ cars { carId registrationNumber make model } }')
+
+
+def _graphql_reserve(fleet: Fleet, rng: random.Random, i: int):
+    _graphql(
+        '''
+        mutation ($input: ReserveInput!) {
+            reserve(input: $input) { payload { requestId car { carId } } }
+        }
+        ''',
+        {'input': {
+            'toRentAt': (fleet.start + timedelta(hours=rng.randrange(fleet.slots))).isoformat(),
+            'durationMinutes': 60,
+        }},
+    )
+
+
+SCENARIOS: dict[str, Callable[[Fleet, random.Random, int], None]] = {
+    'make_reservation': _make_reservation,
+    'get_or_create_car': _get_or_create_car,
+    'all_cars': _all_cars,
+    'graphql_cars': _graphql_cars,
+    'graphql_reserve': _graphql_reserve,
+}
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+
+    if not values:
+        return 0.0
+
+    return values[max(math.ceil(p / 100 * len(values)), 1) - 1]
+
+
+def _trials() -> tuple[int, float]:
+    """Number of reservation requests and sum of their trials observed so far (by this process)."""
+
+    requests = trials = 0
+    for counts, total in reservation_metrics.trials.values().values():
+        requests += sum(counts)
+        trials += total
+    return requests, trials
+
+
+def _work(scenario: str, fleet: Fleet, operations: range, seed: str) -> dict:
+    operation = SCENARIOS[scenario]
+    rng = random.Random(seed)
+    latencies = []
+    errors = Counter()
+    queries = 0
+
+    def count_queries(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    try:
+        with connection.execute_wrapper(count_queries):
+            for i in operations:
+                began = time.perf_counter()
+                try:
+                    operation(fleet, rng, i)
+                except Exception as ex:
+                    errors[type(ex).__name__] += 1
+                latencies.append(time.perf_counter() - began)
+    finally:
+        connections.close_all()
+
+    return {'latencies': latencies, 'errors': dict(errors), 'queries': queries}
+
+
+def _work_with_trials(scenario: str, fleet: Fleet, operations: range, seed: str) -> dict:
+    """Single worker of its own process (reservation metrics are not shared with other workers)."""
+
+    requests_before, trials_before = _trials()
+    result = _work(scenario, fleet, operations, seed)
+    requests_after, trials_after = _trials()
+    return result | {
+        'reservation_requests': requests_after - requests_before,
+        'reservation_trials': trials_after - trials_before,
+    }
+
+
+def _run_threads(scenario: str, fleet: Fleet, parts: list[range], seed: int) -> list[dict]:
+    results = [None] * len(parts)
+
+    def target(n: int):
+        results[n] = _work(scenario, fleet, parts[n], f'{seed}:{scenario}:{n}')
+
+    # reservation metrics are shared by all the threads
+    requests_before, trials_before = _trials()
+    threads = [threading.Thread(target=target, args=(n,)) for n in range(len(parts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    requests_after, trials_after = _trials()
+
+    results[0] |= {
+        'reservation_requests': requests_after - requests_before,
+        'reservation_trials': trials_after - trials_before,
+    }
+    return results
+
+
+def _run_processes(scenario: str, fleet: Fleet, parts: list[range], seed: int) -> list[dict]:
+    # forked children must not share DB connections of the parent
+    connections.close_all()
+
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=lambda n: results.put(_work_with_trials(scenario, fleet, parts[n], f'{seed}:{scenario}:{n}')),
+            args=(n,),
+        )
+        for n in range(len(parts))
+    ]
+    for process in processes:
+        process.start()
+
+    collected = []
+    try:
+        for _ in processes:
+            collected.append(results.get(timeout=3600))
+    except queue.Empty:
+        raise RuntimeError('benchmark worker process did not finish')
+    finally:
+        for process in processes:
+            process.join()
+    return collected
+
+
+def run(
+        scenario: str,
+        fleet: Fleet,
+        operations: int,
+        workers: int = 1,
+        executor: str = EXECUTOR_THREAD,
+        seed: int = 0,
+) -> dict:
+    """Run `operations` operations of the given scenario split among `workers` concurrent workers."""
+
+    if scenario not in SCENARIOS:
+        raise ValueError(f'unknown scenario {scenario!r}')
+    if workers <= 0 or operations <= 0:
+        raise ValueError('number of workers and operations has to be positive')
+
+    parts = [range(n, operations, workers) for n in range(workers)]
+    runner = _run_processes if executor == EXECUTOR_PROCESS else _run_threads
+
+    began = time.perf_counter()
+    results = runner(scenario, fleet, parts, seed)
+    duration = time.perf_counter() - began
+
+    latencies = sorted(latency for result in results for latency in result['latencies'])
+    errors = Counter()
+    for result in results:
+        errors.update(result['errors'])
+    reservation_requests = sum(result.get('reservation_requests', 0) for result in results)
+    reservation_trials = sum(result.get('reservation_trials', 0) for result in results)
+
+    return {
+        'scenario': scenario,
+        'executor': executor,
+        'workers': workers,
+        'operations': len(latencies),
+        'errors': dict(errors),
+        'duration_s': duration,
+        'throughput_per_s': len(latencies) / duration if duration else 0.0,
+        'latency_ms': {
+            'mean': 1000 * sum(latencies) / len(latencies),
+            'p50': 1000 * percentile(latencies, 50),
+            'p99': 1000 * percentile(latencies, 99),
+            'max': 1000 * latencies[-1],
+        },
+        'queries_per_operation': sum(result['queries'] for result in results) / len(latencies),
+        'retry_rate': (
+            (reservation_trials - reservation_requests) / reservation_requests if reservation_requests else None
+        ),
+    }
@@ -0,0 +1,141 @@
+"""Streaming export of reservations (with their cars) and cars as NDJSON or CSV.
+
+Rows are read by `iterator(chunk_size=...)` (a server-side cursor on PostgreSQL) as plain tuples and rendered line by
+line, so the memory used does not depend on the size of the exported table.
+"""
+
+import csv
+import json
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from itertools import islice
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive, make_aware
+
+from apps.carpool.models import Car
+from apps.reservation.models import Reservation
+
+
+NDJSON = 'ndjson'
+CSV = 'csv'
+
+CONTENT_TYPES = {
+    NDJSON: 'application/x-ndjson',
+    CSV: 'text/csv; charset=utf-8',
+}
+
+# exported column -> field lookup
+RESERVATION_COLUMNS = {
+    'id': 'id',
+    'request_id': 'request_id',
+    'client_name': 'client_name',
+    'to_rent_at': 'to_rent_at',
+    'to_return_at': 'to_return_at',
+    'car_id': 'car__car_id',
+    'registration_number': 'car__registration_number',
+    'model': 'car__model__name',
+    'make': 'car__model__make__name',
+}
+CAR_COLUMNS = {
+    'car_id': 'car_id',
+    'registration_number': 'registration_number',
+    'model': 'model__name',
+    'make': 'model__make__name',
+    'date_created': 'date_created',
+}
+
+
+def parse_moment(value: str | None) -> datetime | None:
+    """Parse the bound of the time range (ISO 8601, in the current time zone if naive)."""
+
+    if not value:
+        return None
+    if (moment := parse_datetime(value)) is None:
+        raise ValueError(f'invalid time {value!r}')
+    return make_aware(moment) if is_naive(moment) else moment
+
+
+def reservations(start: datetime | None = None, end: datetime | None = None) -> QuerySet:
+    """Reservations overlapping the time range ordered by the time of renting (served by `reservation_period_idx`)."""
+
+    queryset = Reservation.objects.all()
+    if start is not None:
+        queryset = queryset.filter(to_return_at__gt=start)
+    if end is not None:
+        queryset = queryset.filter(to_rent_at__lt=end)
+    return queryset.order_by('to_rent_at', 'id').values_list(*RESERVATION_COLUMNS.values())
+
+
+def cars(start: datetime | None = None, end: datetime | None = None) -> QuerySet:
+    """Cars added to the fleet within the time range ordered by car ID."""
+
+    queryset = Car.objects.all()
+    if start is not None:
+        queryset = queryset.filter(date_created__gte=start)
+    if end is not None:
+        queryset = queryset.filter(date_created__lt=end)
+    return queryset.order_by('car_id').values_list(*CAR_COLUMNS.values())
+
+
+DATASETS = {
+    'reservations': (reservations, RESERVATION_COLUMNS),
+    'cars': (cars, CAR_COLUMNS),
+}
+
+
+class _Line:
+    """File-like object just returning what the CSV writer writes."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _value(value):
+    """Times in full precision (including microseconds, unlike `DjangoJSONEncoder`)."""
+
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def render(rows: Iterable[tuple], columns: list[str], format: str) -> Iterator[str]:
+    """Lines (including the header of CSV) of the rows in the format."""
+
+    if format == NDJSON:
+        for row in rows:
+            yield json.dumps(dict(zip(columns, map(_value, row))), cls=DjangoJSONEncoder) + '\n'
+    elif format == CSV:
+        writer = csv.writer(_Line(), lineterminator='\n')
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(map(_value, row))
+    else:
+        raise ValueError(f'unknown format {format!r}')
+
+
+def export(
+        dataset: str,
+        format: str,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        chunk_size: int | None = None,
+) -> Iterator[str]:
+    """Stream the dataset as chunks of lines (each chunk rendered from a single batch of fetched rows). The dataset and
+    format are checked immediately, rows are fetched lazily.
+    """
+
+    if dataset not in DATASETS:
+        raise ValueError(f'unknown dataset {dataset!r}')
+    if format not in CONTENT_TYPES:
+        raise ValueError(f'unknown format {format!r}')
+
+    queryset, columns = DATASETS[dataset]
+    chunk_size = chunk_size or getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    return _chunks(render(queryset(start, end).iterator(chunk_size=chunk_size), list(columns), format), chunk_size)
+
+
+def _chunks(lines: Iterator[str], chunk_size: int) -> Iterator[str]:
+    while chunk := ''.join(islice(lines, chunk_size)):
+        yield chunk
@@ -0,0 +1,63 @@
+"""Blocking (DB) work of GraphQL resolvers executed by either of the views.
+
+The synchronous view calls resolvers as usual. The asynchronous one (`AsyncGraphQLView`) executes operations on the
+event loop, so resolvers doing DB work (decorated by `blocking`) return awaitables and their work runs off the loop.
+Like Django's async ORM, the work is run by the thread asgiref binds the request to. All the DB work of a request
+therefore shares a single DB connection and never runs concurrently, so loaders need no locking. At most
+`GRAPHQL_ASYNC_DB_CONCURRENCY` resolvers of the whole process are doing DB work at once. Resolvers only sometimes
+hitting DB (e.g. fields of related objects usually loaded already) skip the hop to that thread when they need not.
+"""
+
+import asyncio
+from functools import partial, wraps
+from weakref import WeakKeyDictionary
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from graphql import GraphQLResolveInfo
+
+
+ASYNC_FLAG = '_graphql_async'
+
+_limits: WeakKeyDictionary = WeakKeyDictionary()
+
+
+def is_async(info: GraphQLResolveInfo) -> bool:
+    """Check that the operation is executed on the event loop (by the asynchronous view)."""
+
+    return getattr(info.context, ASYNC_FLAG, False)
+
+
+def _limit() -> asyncio.Semaphore:
+    # semaphores are bound to the event loop they are used by
+    loop = asyncio.get_running_loop()
+    if (semaphore := _limits.get(loop)) is None:
+        semaphore = _limits[loop] = asyncio.Semaphore(getattr(settings, 'GRAPHQL_ASYNC_DB_CONCURRENCY', 10))
+    return semaphore
+
+
+async def run_off_loop(func, *args, **kwargs):
+    """Run the blocking function by the thread of the current request (limited by the concurrency setting)."""
+
+    async with _limit():
+        return await sync_to_async(func, thread_sensitive=True)(*args, **kwargs)
+
+
+def blocking(resolver=None, *, unless=None):
+    """Decorate the resolver (or mutate method) doing blocking work, so its result is awaitable if the operation is
+    executed asynchronously. The resolver has to return fully evaluated results (e.g. lists, not generators). If
+    `unless` (called with the arguments of the resolver) is true, the work is known not to block this time (e.g. the
+    related object is already loaded) and the resolver is called directly.
+    """
+
+    if resolver is None:
+        return partial(blocking, unless=unless)
+
+    @wraps(resolver)
+    def wrapper(*args, **kwargs):
+        info = next(arg for arg in args if isinstance(arg, GraphQLResolveInfo))
+        if not is_async(info) or (unless is not None and unless(*args, **kwargs)):
+            return resolver(*args, **kwargs)
+        return run_off_loop(resolver, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,276 @@
+"""Static cost analysis of GraphQL operations (run on the validated document before its execution).
+
+Every selected field costs its weight (1 for fields of object types, 0 for scalars by default) plus the cost of its
+selection, all multiplied by the number of items of list fields: edges of connections count as many items as
+requested by `first` or `last` (at most `RELAY_CONNECTION_MAX_LIMIT`), other lists as given by their size argument
+or `GRAPHQL_COST_LIST_SIZE` items. Weights and sizes of particular fields are set by `cost_hints` of graphene types
+-- a mapping of (snake-cased) field names to `Cost` objects. Operations costing more than `GRAPHQL_MAX_COST` or
+nested deeper than `GRAPHQL_MAX_DEPTH` are rejected; cost budgets of clients can be throttled too.
+"""
+
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from functools import cache
+
+import graphene as g
+from django.conf import settings
+from graphene.utils.str_converters import to_snake_case
+from graphene_django.settings import graphene_settings
+from graphql import (
+    DocumentNode,
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLList,
+    GraphQLNamedType,
+    GraphQLNonNull,
+    GraphQLObjectType,
+    GraphQLSchema,
+    InlineFragmentNode,
+    SelectionSetNode,
+    get_named_type,
+    get_operation_ast,
+    is_composite_type,
+)
+from graphql.execution.values import get_argument_values, get_variable_values
+
+
+QUERY_TOO_COMPLEX = 'QUERY_TOO_COMPLEX'
+QUERY_THROTTLED = 'QUERY_THROTTLED'
+
+
+@dataclass(frozen=True)
+class Cost:
+    """Cost of a field (per item of its parent): its own weight and number of items if it is a list."""
+
+    weight: int | None = None
+    size: int | None = None
+    size_argument: str | None = None
+
+
+@dataclass
+class OperationCost:
+    cost: int = 0
+    depth: int = 0
+
+    def as_extension(self) -> dict:
+        return {
+            'requested': self.cost,
+            'maximum': getattr(settings, 'GRAPHQL_MAX_COST', 10_000),
+            'depth': self.depth,
+            'maximumDepth': getattr(settings, 'GRAPHQL_MAX_DEPTH', 10),
+        }
+
+
+@cache
+def _hints(graphene_type: type) -> dict[str, Cost]:
+    """Cost hints of the type including the ones of its bases (e.g. of queries combined into the root query)."""
+
+    hints = {}
+    for base in reversed(graphene_type.__mro__):
+        hints.update(base.__dict__.get('cost_hints', {}))
+    return hints
+
+
+def _is_list(graphql_type) -> bool:
+    if isinstance(graphql_type, GraphQLNonNull):
+        graphql_type = graphql_type.of_type
+    return isinstance(graphql_type, GraphQLList)
+
+
+def _is_connection(graphql_type: GraphQLNamedType) -> bool:
+    graphene_type = getattr(graphql_type, 'graphene_type', None)
+    return graphene_type is not None and issubclass(graphene_type, g.Connection)
+
+
+def _page_size(arguments: dict) -> int:
+    max_limit = graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+    sizes = [arguments[name] for name in ('first', 'last') if arguments.get(name) is not None]
+    if not sizes:
+        return max_limit or getattr(settings, 'GRAPHQL_COST_LIST_SIZE', 100)
+    return min(sizes[0], max_limit) if max_limit else sizes[0]
+
+
+class _Analysis:
+    def __init__(self, schema: GraphQLSchema, fragments: dict[str, FragmentDefinitionNode], variables: dict):
+        self.schema = schema
+        self.fragments = fragments
+        self.variables = variables
+        self.depth = 0
+
+    def _fields(self, selection_set: SelectionSetNode | None, visited: frozenset = frozenset()) -> Iterator[FieldNode]:
+        """Fields of the selection set with fragments flattened (fields excluded by directives included too)."""
+
+        if selection_set is None:
+            return
+
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                yield selection
+            elif isinstance(selection, InlineFragmentNode):
+                yield from self._fields(selection.selection_set, visited)
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                # cycles of fragments are rejected by validation, but better safe than sorry
+                if name not in visited and name in self.fragments:
+                    yield from self._fields(self.fragments[name].selection_set, visited | {name})
+
+    def _arguments(self, field_def, field_node: FieldNode) -> dict:
+        try:
+            return get_argument_values(field_def, field_node, self.variables)
+        except GraphQLError:
+            # invalid arguments fail the execution anyway
+            return {}
+
+    def selection_cost(
+            self,
+            selection_set: SelectionSetNode | None,
+            parent_type: GraphQLNamedType,
+            depth: int,
+            page_size: int | None = None,
+    ) -> int:
+        if not isinstance(parent_type, GraphQLObjectType):
+            # interfaces and unions are not used by the schema, fields of their selections are not weighted
+            return 0
+
+        self.depth = max(self.depth, depth)
+        hints = _hints(parent_type.graphene_type) if hasattr(parent_type, 'graphene_type') else {}
+
+        total = 0
+        for field_node in self._fields(selection_set):
+            name = field_node.name.value
+            if name.startswith('__') or name not in parent_type.fields:
+                continue
+
+            field_def = parent_type.fields[name]
+            field_type = get_named_type(field_def.type)
+            hint = hints.get(to_snake_case(name), Cost())
+            arguments = self._arguments(field_def, field_node) if field_def.args else {}
+
+            weight = hint.weight
+            if weight is None:
+                weight = 1 if is_composite_type(field_type) else 0
+
+            size = 1
+            if hint.size_argument is not None and arguments.get(hint.size_argument) is not None:
+                size = arguments[hint.size_argument]
+            elif hint.size is not None:
+                size = hint.size
+            elif _is_list(field_def.type):
+                size = page_size if name == 'edges' and page_size is not None else (
+                    getattr(settings, 'GRAPHQL_COST_LIST_SIZE', 100)
+                )
+
+            children = 0
+            if field_node.selection_set is not None:
+                children = self.selection_cost(
+                    field_node.selection_set,
+                    field_type,
+                    depth + 1,
+                    page_size=_page_size(arguments) if _is_connection(field_type) else None,
+                )
+
+            total += max(size, 0) * (weight + children)
+        return total
+
+
+def analyze(
+        schema: GraphQLSchema,
+        document: DocumentNode,
+        operation_name: str | None = None,
+        variables: dict | None = None,
+) -> OperationCost:
+    """Cost and depth of the operation of the (validated) document to be executed."""
+
+    operation = get_operation_ast(document, operation_name)
+    if operation is None:
+        return OperationCost()
+
+    coerced = get_variable_values(schema, operation.variable_definitions or (), variables or {})
+    if not isinstance(coerced, dict):
+        # invalid variables fail the execution anyway
+        coerced = {}
+
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions
+        if isinstance(definition, FragmentDefinitionNode)
+    }
+    analysis = _Analysis(schema, fragments, coerced)
+    cost = analysis.selection_cost(operation.selection_set, schema.get_root_type(operation.operation), 1)
+    return OperationCost(cost=cost, depth=analysis.depth)
+
+
+class CostThrottle:
+    """Token buckets of cost per client: each bucket holds at most `burst` and is refilled by `rate` per second."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, client: str, cost: float) -> float | None:
+        """Take the cost from the budget of the client and return the rest, None if the budget is insufficient."""
+
+        with self._lock:
+            moment = time.monotonic()
+            tokens, updated_at = self._buckets.get(client, (self.burst, moment))
+            tokens = min(self.burst, tokens + (moment - updated_at) * self.rate)
+            if cost > tokens:
+                self._buckets[client] = (tokens, moment)
+                return None
+
+            self._buckets[client] = (tokens - cost, moment)
+            # drop full buckets of idle clients from time to time
+            if len(self._buckets) > 10_000:
+                self._buckets = {
+                    key: value for key, value in self._buckets.items()
+                    if value[0] + (moment - value[1]) * self.rate < self.burst
+                }
+            return tokens - cost
+
+
+_throttle = None
+
+
+def throttle() -> CostThrottle | None:
+    global _throttle
+
+    rate = getattr(settings, 'GRAPHQL_COST_THROTTLE_RATE', None)
+    if rate is None:
+        return None
+
+    burst = getattr(settings, 'GRAPHQL_COST_THROTTLE_BURST', 20_000)
+    if _throttle is None or (_throttle.rate, _throttle.burst) != (rate, burst):
+        _throttle = CostThrottle(rate, burst)
+    return _throttle
+
+
+def check(operation_cost: OperationCost, client: str) -> GraphQLError | None:
+    """Error rejecting the operation if it is over budget (or the budget of the client is exhausted)."""
+
+    max_depth = getattr(settings, 'GRAPHQL_MAX_DEPTH', 10)
+    if max_depth is not None and operation_cost.depth > max_depth:
+        return GraphQLError(
+            f'query depth {operation_cost.depth} exceeds the maximum depth {max_depth}',
+            extensions={'code': QUERY_TOO_COMPLEX},
+        )
+
+    max_cost = getattr(settings, 'GRAPHQL_MAX_COST', 10_000)
+    if max_cost is not None and operation_cost.cost > max_cost:
+        return GraphQLError(
+            f'query cost {operation_cost.cost} exceeds the maximum cost {max_cost}',
+            extensions={'code': QUERY_TOO_COMPLEX},
+        )
+
+    if (bucket := throttle()) is not None and bucket.acquire(client, operation_cost.cost) is None:
+        return GraphQLError(
+            f'query cost {operation_cost.cost} exceeds the remaining budget of the client, retry later',
+            extensions={'code': QUERY_THROTTLED},
+        )
+
+    return None
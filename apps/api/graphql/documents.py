@@ -0,0 +1,132 @@
+"""Cache of parsed and validated GraphQL documents and persisted queries.
+
+Parsing and validation of a document against the schema depend on nothing but the query text (and the validation
+rules), so documents of queries sent over and over again are kept in an LRU cache keyed by SHA-256 hash of the
+query. Persisted queries let clients send just the hash (as `extensions.persistedQuery.sha256Hash` in the spirit of
+Apollo automatic persisted queries). Queries are either loaded from the `GRAPHQL_PERSISTED_QUERIES` file (a JSON
+object mapping hashes to queries) or registered by the first request sending the query along with its hash. In
+strict mode, only queries of the file are executed -- unknown hashes and queries are rejected.
+"""
+
+import hashlib
+import json
+from collections.abc import Collection
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from graphene_django.settings import graphene_settings
+from graphql import ASTValidationRule, DocumentNode, GraphQLError, GraphQLSchema, parse, validate
+
+from libs.cache import LRUCache, MISSING
+from .. import metrics
+from .tracing import Tracer, phase
+
+
+PERSISTED_QUERY_NOT_FOUND = 'PERSISTED_QUERY_NOT_FOUND'
+PERSISTED_QUERY_NOT_ALLOWED = 'PERSISTED_QUERY_NOT_ALLOWED'
+PERSISTED_QUERY_INVALID = 'PERSISTED_QUERY_INVALID'
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+# (query hash, schema, validation rules) -> valid document
+documents = LRUCache(max_size=getattr(settings, 'GRAPHQL_DOCUMENT_CACHE_SIZE', 1000))
+
+
+def parse_and_validate(
+        schema: GraphQLSchema,
+        query: str,
+        rules: Collection[type[ASTValidationRule]] | None = None,
+        tracer: Tracer | None = None,
+) -> tuple[DocumentNode | None, list[GraphQLError]]:
+    """Parsed document of the query and its validation errors. Valid documents are served from the cache."""
+
+    key = (query_hash(query), schema, tuple(rules or ()))
+    if (document := documents.get(key)) is not MISSING:
+        metrics.document_cache.inc(result='hit')
+        return document, []
+
+    metrics.document_cache.inc(result='miss')
+    try:
+        with phase(tracer, 'parse'):
+            document = parse(query)
+    except GraphQLError as ex:
+        return None, [ex]
+
+    with phase(tracer, 'validate'):
+        errors = validate(schema, document, rules, graphene_settings.MAX_VALIDATION_ERRORS)
+    if not errors:
+        documents.set(key, document)
+    return document, errors
+
+
+def _error(message: str, code: str, outcome: str) -> GraphQLError:
+    metrics.persisted_queries.inc(outcome=outcome)
+    return GraphQLError(message, extensions={'code': code})
+
+
+class PersistedQueries:
+    """Queries known by their SHA-256 hashes, either loaded from a file or registered by clients (if not strict)."""
+
+    def __init__(self, queries: dict[str, str] | None = None, max_size: int = 1000, strict: bool = False):
+        self.strict = strict
+        self._queries = dict(queries or {})
+        self._registered = LRUCache(max_size=0 if strict else max_size)
+
+        for sha256_hash, query in self._queries.items():
+            if query_hash(query) != sha256_hash:
+                raise ImproperlyConfigured(f'persisted query does not match its hash {sha256_hash}')
+
+    @classmethod
+    def from_settings(cls) -> 'PersistedQueries':
+        queries = {}
+        if path := getattr(settings, 'GRAPHQL_PERSISTED_QUERIES', None):
+            with open(path, encoding='utf-8') as f:
+                queries = json.load(f)
+
+        return cls(
+            queries,
+            max_size=getattr(settings, 'GRAPHQL_PERSISTED_QUERIES_CACHE_SIZE', 1000),
+            strict=getattr(settings, 'GRAPHQL_PERSISTED_QUERIES_STRICT', False),
+        )
+
+    def get(self, sha256_hash: str) -> str | None:
+        if (query := self._queries.get(sha256_hash)) is not None:
+            return query
+        if (query := self._registered.get(sha256_hash)) is not MISSING:
+            return query
+        return None
+
+    def resolve(self, query: str | None, extensions: dict | None) -> str | None:
+        """Query to be executed for the query and extensions sent by the client."""
+
+        persisted = extensions.get('persistedQuery') if isinstance(extensions, dict) else None
+        if persisted is None:
+            if query and self.strict and query_hash(query) not in self._queries:
+                raise _error('only persisted queries are allowed', PERSISTED_QUERY_NOT_ALLOWED, 'rejected')
+            return query
+
+        sha256_hash = persisted.get('sha256Hash') if isinstance(persisted, dict) else None
+        if not isinstance(sha256_hash, str) or persisted.get('version') != 1:
+            raise _error('unsupported persisted query', PERSISTED_QUERY_INVALID, 'rejected')
+
+        if (stored := self.get(sha256_hash)) is not None:
+            metrics.persisted_queries.inc(outcome='found')
+            return stored
+
+        if self.strict:
+            raise _error('unknown persisted query', PERSISTED_QUERY_NOT_ALLOWED, 'rejected')
+        if not query:
+            # the client is expected to send the query along with its hash again
+            raise _error('PersistedQueryNotFound', PERSISTED_QUERY_NOT_FOUND, 'not_found')
+        if query_hash(query) != sha256_hash:
+            raise _error('provided sha256Hash does not match the query', PERSISTED_QUERY_INVALID, 'rejected')
+
+        self._registered.set(sha256_hash, query)
+        metrics.persisted_queries.inc(outcome='registered')
+        return query
+
+
+persisted_queries = PersistedQueries.from_settings()
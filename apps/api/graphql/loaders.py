@@ -0,0 +1,165 @@
+"""Per-request batched loading of related objects (in the spirit of DataLoader) for GraphQL resolvers.
+
+Graphene resolves fields of list items one item after another, so resolvers of list fields prime the loaders with
+keys of all the objects that may be needed later and the first lookup of any of them loads all the primed ones by
+a single query. Related objects already cached on instances (e.g. by `select_related`) are used as they are.
+Loaders live as long as the request (GraphQL context) they are bound to, operations of a batched request share them
+until a mutation is executed.
+"""
+
+from collections.abc import Callable, Iterable
+
+from django.db.models import Model, QuerySet
+
+from apps.carpool.models import Car, CarMake, CarModel
+from apps.reservation.models import Reservation
+
+
+MAX_BATCH_SIZE = 1000
+
+
+class ModelLoader:
+    """Cache of model instances by primary key filled in batches."""
+
+    def __init__(self, queryset: QuerySet, on_load: Callable[[list[Model]], None] | None = None):
+        self._queryset = queryset
+        self._on_load = on_load
+        self._cache: dict = {}
+        self._pending: set = set()
+
+    def prime(self, *objects: Model):
+        """Put already fetched objects into the cache."""
+
+        for obj in objects:
+            if obj.get_deferred_fields():
+                # partially loaded (by the optimizer) for one field, other fields may need the rest of the object
+                continue
+            self._cache[obj.pk] = obj
+            self._pending.discard(obj.pk)
+
+    def prime_keys(self, keys: Iterable):
+        """Remember keys to be loaded together with the next lookup of a missing object."""
+
+        self._pending.update(key for key in keys if key not in self._cache)
+
+    def cached(self, key) -> Model | None:
+        """Object already loaded (without any query)."""
+
+        return self._cache.get(key)
+
+    def load(self, key) -> Model:
+        if key not in self._cache:
+            self._pending.add(key)
+            self._dispatch()
+
+        try:
+            return self._cache[key]
+        except KeyError:
+            raise self._queryset.model.DoesNotExist(f'{self._queryset.model.__name__} {key} does not exist')
+
+    def load_many(self, keys: Iterable) -> list[Model]:
+        keys = list(keys)
+        self.prime_keys(keys)
+        return [self.load(key) for key in keys]
+
+    def _dispatch(self):
+        keys, self._pending = sorted(self._pending), set()
+        for i in range(0, len(keys), MAX_BATCH_SIZE):
+            objects = list(self._queryset.filter(pk__in=keys[i:i + MAX_BATCH_SIZE]))
+            self.prime(*objects)
+            if self._on_load is not None:
+                self._on_load(objects)
+
+
+def _needs_loading(instance: Model, relation) -> bool:
+    """Check that the related object is neither cached nor unwanted (with deferred foreign key)."""
+
+    return not relation.is_cached(instance) and relation.field.attname not in instance.get_deferred_fields()
+
+
+class Loaders:
+    """Loaders of cars and their models and makes. Loading a level primes the keys of the level below."""
+
+    def __init__(self):
+        self.makes = ModelLoader(CarMake.objects.all())
+        self.models = ModelLoader(
+            CarModel.objects.all(),
+            on_load=lambda models: self.makes.prime_keys(model.make_id for model in models),
+        )
+        self.cars = ModelLoader(
+            Car.objects.all(),
+            on_load=lambda cars: self.models.prime_keys(car.model_id for car in cars),
+        )
+
+    def prime_cars(self, cars: Iterable[Car]) -> list[Car]:
+        """Evaluate cars about to be resolved and prime the keys of their models."""
+
+        cars = list(cars)
+        self.cars.prime(*cars)
+        self.models.prime_keys(car.model_id for car in cars if _needs_loading(car, Car.model))
+        return cars
+
+    def prime_reservations(self, reservations: Iterable[Reservation]) -> list[Reservation]:
+        """Evaluate reservations about to be resolved and prime the keys of their cars."""
+
+        reservations = list(reservations)
+        self.cars.prime_keys(
+            reservation.car_id for reservation in reservations if _needs_loading(reservation, Reservation.car)
+        )
+        return reservations
+
+    def car_of(self, reservation: Reservation) -> Car:
+        if Reservation.car.is_cached(reservation):
+            return reservation.car
+        return self.cars.load(reservation.car_id)
+
+    def cached_car_of(self, reservation: Reservation) -> Car | None:
+        """Car of the reservation if available without any query."""
+
+        if Reservation.car.is_cached(reservation):
+            return reservation.car
+        return self.cars.cached(reservation.car_id)
+
+    def cached_model_of(self, car: Car) -> CarModel | None:
+        if Car.model.is_cached(car):
+            return car.model
+        return self.models.cached(car.model_id)
+
+    def cached_make_of(self, car: Car) -> CarMake | None:
+        if (model := self.cached_model_of(car)) is None:
+            return None
+        if CarModel.make.is_cached(model):
+            return model.make
+        return self.makes.cached(model.make_id)
+
+    def model_of(self, car: Car) -> CarModel:
+        if Car.model.is_cached(car):
+            return car.model
+        return self.models.load(car.model_id)
+
+    def make_of(self, car: Car) -> CarMake:
+        model = self.model_of(car)
+        if CarModel.make.is_cached(model):
+            return model.make
+        return self.makes.load(model.make_id)
+
+
+def clear_loaders(context):
+    """Forget objects loaded within the context (e.g. after a mutation of a batch changed them)."""
+
+    if context is not None and getattr(context, '_graphql_loaders', None) is not None:
+        setattr(context, '_graphql_loaders', None)
+
+
+def loaders_for(info) -> Loaders:
+    """Loaders bound to the context (request) of the GraphQL execution."""
+
+    context = info.context
+    if context is None:
+        # nothing to bind the loaders to (e.g. schema executed directly without any context)
+        return Loaders()
+
+    if (loaders := getattr(context, '_graphql_loaders', None)) is None:
+        loaders = Loaders()
+        setattr(context, '_graphql_loaders', loaders)
+    return loaders
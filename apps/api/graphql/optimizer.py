@@ -0,0 +1,150 @@
+"""Optimization of querysets according to the selection set of the GraphQL field being resolved.
+
+The selection set (including fragments and connection edges) is walked along with the Django model. Selected
+concrete fields restrict columns by `only()`, selected forward relations are joined by `select_related` (and
+optimized recursively) and selected reverse or many-to-many relations are fetched by `prefetch_related`.
+
+Fields served by custom resolvers are described by `optimizer_hints` of the graphene type -- a mapping of
+(snake-cased) field names to `Hint` objects. If a selected field can be mapped neither to a model field nor to a
+hint, columns are not restricted at all, so that such resolver never triggers loading of a deferred field.
+"""
+
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+
+import graphene as g
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Model, QuerySet
+from graphene.utils.str_converters import to_snake_case
+from graphql import (
+    FieldNode,
+    FragmentSpreadNode,
+    GraphQLObjectType,
+    InlineFragmentNode,
+    SelectionSetNode,
+    get_named_type,
+)
+
+
+@dataclass(frozen=True)
+class Hint:
+    """Model fields (relative to the model of the graphene type) needed by a custom resolver."""
+
+    only: tuple[str, ...] = ()
+    select_related: tuple[str, ...] = ()
+    prefetch_related: tuple[str, ...] = ()
+
+
+@dataclass
+class _Plan:
+    only: set[str] = field(default_factory=set)
+    select_related: set[str] = field(default_factory=set)
+    prefetch_related: set[str] = field(default_factory=set)
+    restrictable: bool = True
+
+    def add(self, prefix: str, hint: Hint):
+        self.only.update(prefix + name for name in hint.only)
+        self.select_related.update(prefix + name for name in hint.select_related)
+        self.prefetch_related.update(prefix + name for name in hint.prefetch_related)
+
+    def apply(self, queryset: QuerySet) -> QuerySet:
+        if self.select_related:
+            queryset = queryset.select_related(*sorted(self.select_related))
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*sorted(self.prefetch_related))
+
+        if self.restrictable:
+            only = set(self.only) or {queryset.model._meta.pk.name}
+            # joined relations (and all the relations on the way to them) cannot be deferred
+            for path in self.select_related:
+                parts = path.split('__')
+                only.update('__'.join(parts[:i]) for i in range(1, len(parts) + 1))
+            queryset = queryset.only(*sorted(only))
+
+        return queryset
+
+
+def _selected_fields(info, selection_set: SelectionSetNode | None) -> Iterator[FieldNode]:
+    """Fields of the selection set with fragments flattened (fields excluded by directives included too)."""
+
+    if selection_set is None:
+        return
+
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            yield selection
+        elif isinstance(selection, InlineFragmentNode):
+            yield from _selected_fields(info, selection.selection_set)
+        elif isinstance(selection, FragmentSpreadNode):
+            yield from _selected_fields(info, info.fragments[selection.name.value].selection_set)
+
+
+def _field_type(graphql_type: GraphQLObjectType, name: str) -> GraphQLObjectType:
+    return get_named_type(graphql_type.fields[name].type)
+
+
+def _collect(
+        info,
+        selection_set: SelectionSetNode | None,
+        graphql_type: GraphQLObjectType,
+        model: type[Model],
+        prefix: str,
+        plan: _Plan,
+):
+    graphene_type = getattr(graphql_type, 'graphene_type', None)
+
+    if graphene_type is not None and issubclass(graphene_type, g.Connection):
+        # only nodes of a connection are model instances
+        edge_type = _field_type(graphql_type, 'edges')
+        for edges in _selected_fields(info, selection_set):
+            if edges.name.value != 'edges':
+                continue
+            for node in _selected_fields(info, edges.selection_set):
+                if node.name.value == 'node':
+                    _collect(info, node.selection_set, _field_type(edge_type, 'node'), model, prefix, plan)
+        return
+
+    hints = getattr(graphene_type, 'optimizer_hints', {})
+    for field_node in _selected_fields(info, selection_set):
+        graphql_name = field_node.name.value
+        if graphql_name.startswith('__'):
+            continue
+
+        name = to_snake_case(graphql_name)
+        if (hint := hints.get(name)) is not None:
+            plan.add(prefix, hint)
+            continue
+
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            plan.restrictable = False
+            continue
+
+        if not model_field.is_relation:
+            plan.only.add(prefix + model_field.name)
+        elif model_field.many_to_one or (model_field.one_to_one and model_field.concrete):
+            plan.select_related.add(prefix + model_field.name)
+            _collect(
+                info,
+                field_node.selection_set,
+                _field_type(graphql_type, graphql_name),
+                model_field.related_model,
+                f'{prefix}{model_field.name}__',
+                plan,
+            )
+        else:
+            plan.prefetch_related.add(prefix + model_field.name)
+
+
+def optimize(queryset: QuerySet, info, required: tuple[str, ...] = ()) -> QuerySet:
+    """Apply `select_related`, `prefetch_related` and `only()` to the queryset resolved for the current field.
+    Fields needed by the resolver itself (e.g. ordering keys of cursors) can be `required` explicitly.
+    """
+
+    plan = _Plan(only=set(required))
+    graphql_type = get_named_type(info.return_type)
+    for field_node in info.field_nodes:
+        _collect(info, field_node.selection_set, graphql_type, queryset.model, '', plan)
+
+    return plan.apply(queryset)
@@ -0,0 +1,188 @@
+"""Keyset (cursor) pagination of Relay connections over querysets.
+
+Instead of offsets, cursors encode values of the ordering keys of the node they point to, so a page is fetched by a
+range condition served by an index, however far from the beginning of the result it is. The ordering has to be
+unique (e.g. end with the primary key). Total count is computed only when requested -- taken from the maintained
+counters if they know it, counted or (optionally) estimated otherwise.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime, time
+from functools import reduce
+from operator import or_
+
+import graphene as g
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Model, Q, QuerySet
+from graphene_django.settings import graphene_settings
+from graphql import GraphQLError
+
+from apps.counters import services as counters
+from .blocking import blocking
+
+
+def _keys(ordering: tuple[str, ...]) -> list[tuple[str, bool]]:
+    """Ordering like `('-to_rent_at', 'id')` as `(field name, descending)` pairs."""
+
+    return [(key.lstrip('-'), key.startswith('-')) for key in ordering]
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    """Times are encoded with microseconds (not truncated to milliseconds), so a cursor never matches its node."""
+
+    def default(self, o):
+        if isinstance(o, (datetime, time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(node: Model, ordering: tuple[str, ...]) -> str:
+    values = [getattr(node, name) for name, _ in _keys(ordering)]
+    return base64.urlsafe_b64encode(json.dumps(values, cls=_CursorEncoder).encode()).decode()
+
+
+def decode_cursor(cursor: str, queryset: QuerySet, ordering: tuple[str, ...]) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        keys = _keys(ordering)
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError
+        opts = queryset.model._meta
+        return [
+            (opts.pk if name == 'pk' else opts.get_field(name)).to_python(value)
+            for (name, _), value in zip(keys, values)
+        ]
+    except (ValueError, TypeError, binascii.Error, ValidationError) as ex:
+        raise GraphQLError(f'invalid cursor {cursor!r}') from ex
+
+
+def keyset_filter(ordering: tuple[str, ...], values: list, backwards: bool = False) -> Q:
+    """Nodes following (or preceding if `backwards`) the node with the given key values."""
+
+    conditions = []
+    equal = {}
+    for (name, descending), value in zip(_keys(ordering), values):
+        lookup = 'lt' if descending != backwards else 'gt'
+        conditions.append(Q(**equal, **{f'{name}__{lookup}': value}))
+        equal[name] = value
+    return reduce(or_, conditions)
+
+
+def _reversed(ordering: tuple[str, ...]) -> tuple[str, ...]:
+    return tuple(key[1:] if key.startswith('-') else f'-{key}' for key in ordering)
+
+
+def paginate(
+        queryset: QuerySet,
+        ordering: tuple[str, ...],
+        first: int | None = None,
+        after: str | None = None,
+        last: int | None = None,
+        before: str | None = None,
+) -> tuple[list[Model], bool, bool]:
+    """Fetch a single page as `(nodes, has previous page, has next page)` by one query.
+
+    Pages are at most `RELAY_CONNECTION_MAX_LIMIT` (of graphene-django settings) long. Whether there is a page on
+    the side the page was approached from (e.g. before the `after` cursor) is not checked, it is assumed to exist.
+    """
+
+    if first is not None and last is not None:
+        raise GraphQLError('first and last cannot be used together')
+    if (first is not None and first < 0) or (last is not None and last < 0):
+        raise GraphQLError('first and last cannot be negative')
+
+    if after is not None:
+        queryset = queryset.filter(keyset_filter(ordering, decode_cursor(after, queryset, ordering)))
+    if before is not None:
+        queryset = queryset.filter(keyset_filter(ordering, decode_cursor(before, queryset, ordering), backwards=True))
+
+    size = last if last is not None else first
+    if max_limit := graphene_settings.RELAY_CONNECTION_MAX_LIMIT:
+        size = max_limit if size is None else min(size, max_limit)
+
+    if size is None:
+        return list(queryset.order_by(*ordering)), after is not None, before is not None
+
+    if last is not None:
+        nodes = list(queryset.order_by(*_reversed(ordering))[:size + 1])
+        return nodes[:size][::-1], len(nodes) > size, before is not None
+
+    nodes = list(queryset.order_by(*ordering)[:size + 1])
+    return nodes[:size], after is not None, len(nodes) > size
+
+
+def estimated_count(queryset: QuerySet) -> int:
+    """Cheap estimate of the number of rows of the whole table (from PostgreSQL statistics) if available,
+    exact count otherwise.
+    """
+
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        # negative for never analyzed tables
+        if row is not None and row[0] >= 0:
+            return int(row[0])
+
+    return queryset.count()
+
+
+class CountableConnection(g.Connection):
+    """Connection with total count of nodes (of all the pages) computed only if requested."""
+
+    class Meta:
+        abstract = True
+
+    total_count = g.Int(
+        required=True,
+        description='Total count of nodes of all the pages.',
+        estimate=g.Boolean(
+            required=False,
+            default_value=False,
+            description='Allow cheap (possibly imprecise) estimate for large tables.',
+        ),
+    )
+
+    @staticmethod
+    @blocking
+    def resolve_total_count(root, info, estimate=False):
+        if (count := counters.count(root.queryset)) is not None:
+            return count
+        if estimate:
+            return estimated_count(root.queryset)
+        return root.queryset.count()
+
+
+def keyset_connection(
+        connection_type: type[g.Connection],
+        queryset: QuerySet,
+        ordering: tuple[str, ...],
+        edge_type: type[g.ObjectType] | None = None,
+        first: int | None = None,
+        after: str | None = None,
+        last: int | None = None,
+        before: str | None = None,
+        **kwargs,
+) -> g.Connection:
+    """Build the connection for a single page of the (unpaginated) queryset."""
+
+    nodes, has_previous_page, has_next_page = paginate(queryset, ordering, first, after, last, before)
+
+    edge_type = edge_type or connection_type.Edge
+    edges = [edge_type(node=node, cursor=encode_cursor(node, ordering)) for node in nodes]
+    connection = connection_type(
+        edges=edges,
+        page_info=g.PageInfo(
+            has_previous_page=has_previous_page,
+            has_next_page=has_next_page,
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+        ),
+    )
+    connection.queryset = queryset
+    return connection
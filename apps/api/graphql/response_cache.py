@@ -0,0 +1,217 @@
+"""Cache of responses (execution results) of read-only GraphQL queries.
+
+Root query fields declare the data they depend on by `response_cache_namespaces` of graphene types -- a mapping of
+(snake-cased) field names to namespaces. Only queries selecting nothing but such fields are cached. Each namespace
+has a version bumped whenever the data changes (e.g. the `carpool` one by `fleet_changed` signal of the carpool
+services) and the key of a cached response consists of the query, operation name, variables and versions of all
+the namespaces, so a change makes all the dependent responses unreachable at once.
+
+Responses are kept either in-process (`GRAPHQL_RESPONSE_CACHE = 'in-process'`) or in a Django cache shared by all
+the worker processes (`'shared'`, e.g. a file-based one on the local disk).
+"""
+
+import hashlib
+import json
+import threading
+import time
+from functools import cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.dispatch import receiver
+from graphene.utils.str_converters import to_snake_case
+from graphql import (
+    DocumentNode,
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLSchema,
+    InlineFragmentNode,
+    OperationDefinitionNode,
+    OperationType,
+    SelectionSetNode,
+)
+
+from apps.carpool.signals import fleet_changed
+from libs.cache import MISSING, TTLCache
+from .. import metrics
+from .documents import query_hash
+
+
+BACKEND_IN_PROCESS = 'in-process'
+BACKEND_SHARED = 'shared'
+
+CARPOOL = 'carpool'
+
+
+class InProcessBackend:
+    def __init__(self, timeout: float, max_size: int):
+        self._responses = TTLCache(ttl=timeout, max_size=max_size)
+        self._versions: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict | None:
+        data = self._responses.get(key)
+        return None if data is MISSING else data
+
+    def set(self, key: str, data: dict):
+        self._responses.set(key, data)
+
+    def versions(self, namespaces: list[str]) -> list[int]:
+        return [self._versions.get(namespace, 0) for namespace in namespaces]
+
+    def bump(self, namespace: str):
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+
+class SharedBackend:
+    """Responses and versions kept in a Django cache (shared by all the processes using it)."""
+
+    def __init__(self, timeout: float, alias: str):
+        self.timeout = timeout
+        self._cache = caches[alias]
+
+    def get(self, key: str) -> dict | None:
+        return self._cache.get(f'graphql:response:{key}')
+
+    def set(self, key: str, data: dict):
+        self._cache.set(f'graphql:response:{key}', data, self.timeout)
+
+    def _initial_version(self, key: str):
+        # a version evicted from the cache has to restart at a value never used before
+        self._cache.add(key, time.time_ns(), timeout=None)
+
+    def versions(self, namespaces: list[str]) -> list[int]:
+        keys = [f'graphql:version:{namespace}' for namespace in namespaces]
+        versions = self._cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                self._initial_version(key)
+                versions[key] = self._cache.get(key)
+        return [versions[key] for key in keys]
+
+    def bump(self, namespace: str):
+        key = f'graphql:version:{namespace}'
+        try:
+            self._cache.incr(key)
+        except ValueError:
+            self._initial_version(key)
+
+
+_backend = None
+
+
+def backend() -> InProcessBackend | SharedBackend | None:
+    """Backend configured by settings (None if responses are not cached)."""
+
+    global _backend
+
+    kind = getattr(settings, 'GRAPHQL_RESPONSE_CACHE', None)
+    if kind is None:
+        return None
+
+    config = (
+        kind,
+        getattr(settings, 'GRAPHQL_RESPONSE_CACHE_TIMEOUT', 300),
+        getattr(settings, 'GRAPHQL_RESPONSE_CACHE_SIZE', 1000),
+        getattr(settings, 'GRAPHQL_RESPONSE_CACHE_ALIAS', 'default'),
+    )
+    if _backend is None or _backend[0] != config:
+        if kind == BACKEND_IN_PROCESS:
+            _backend = (config, InProcessBackend(timeout=config[1], max_size=config[2]))
+        elif kind == BACKEND_SHARED:
+            _backend = (config, SharedBackend(timeout=config[1], alias=config[3]))
+        else:
+            raise ValueError(f'unknown GraphQL response cache backend {kind!r}')
+    return _backend[1]
+
+
+@cache
+def _namespaces(graphene_type: type) -> dict[str, str]:
+    """Namespaces of root fields including the ones of bases (queries combined into the root query)."""
+
+    namespaces = {}
+    for base in reversed(graphene_type.__mro__):
+        namespaces.update(base.__dict__.get('response_cache_namespaces', {}))
+    return namespaces
+
+
+def _root_fields(document: DocumentNode, selection_set: SelectionSetNode):
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions
+        if isinstance(definition, FragmentDefinitionNode)
+    }
+
+    def fields(selection_set: SelectionSetNode, visited: frozenset):
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                yield selection
+            elif isinstance(selection, InlineFragmentNode):
+                yield from fields(selection.selection_set, visited)
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                if name not in visited and name in fragments:
+                    yield from fields(fragments[name].selection_set, visited | {name})
+
+    return fields(selection_set, frozenset())
+
+
+def cache_key(
+        schema: GraphQLSchema,
+        document: DocumentNode,
+        operation: OperationDefinitionNode | None,
+        query: str,
+        variables: dict | None,
+) -> str | None:
+    """Key of the response of the operation, None if it cannot be cached."""
+
+    if (cache_backend := backend()) is None or operation is None or operation.operation != OperationType.QUERY:
+        return None
+
+    hints = _namespaces(schema.query_type.graphene_type)
+    namespaces = set()
+    for field_node in _root_fields(document, operation.selection_set):
+        if field_node.name.value == '__typename':
+            continue
+        if (namespace := hints.get(to_snake_case(field_node.name.value))) is None:
+            return None
+        namespaces.add(namespace)
+
+    if not namespaces:
+        return None
+
+    namespaces = sorted(namespaces)
+    key = json.dumps(
+        [
+            query_hash(query),
+            operation.name.value if operation.name else None,
+            variables or {},
+            dict(zip(namespaces, cache_backend.versions(namespaces))),
+        ],
+        sort_keys=True,
+        cls=DjangoJSONEncoder,
+    )
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def lookup(key: str) -> dict | None:
+    data = backend().get(key)
+    metrics.response_cache.inc(result='miss' if data is None else 'hit')
+    return data
+
+
+def store(key: str, data: dict):
+    backend().set(key, data)
+
+
+def invalidate(namespace: str):
+    if (cache_backend := backend()) is not None:
+        cache_backend.bump(namespace)
+
+
+@receiver(fleet_changed)
+def _fleet_changed(sender, **kwargs):
+    invalidate(CARPOOL)
@@ -0,0 +1,185 @@
+"""Opt-in tracing of GraphQL operations (`GRAPHQL_TRACING`).
+
+A sample of operations (`GRAPHQL_TRACING_SAMPLE_RATE`) is traced. For each operation the tracer records:
+
+- the durations of the parse, validate and execute phases;
+- the timings of resolvers, recorded by the tracer acting as a graphql-core middleware;
+- the DB queries run by each resolver, counted by a DB execute wrapper.
+
+Resolvers of list items are aggregated by their path with list indices collapsed (e.g. `cars.*.make`), so traces of
+large lists stay small. Traces are returned in `extensions.tracing` of responses and/or logged by structlog.
+"""
+
+import random
+import threading
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass
+from time import perf_counter
+
+import structlog
+from django.conf import settings
+from django.db import connection
+from graphql import GraphQLResolveInfo
+from graphql.pyutils import is_awaitable
+
+
+log = structlog.get_logger()
+
+# path of the field being resolved (DB queries are attributed to it)
+_current_path: ContextVar[str | None] = ContextVar('graphql_tracing_path', default=None)
+
+
+def _milliseconds(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+@dataclass
+class _FieldTrace:
+    parent_type: str
+    field_name: str
+    return_type: str
+    count: int = 0
+    duration: float = 0.0
+    max_duration: float = 0.0
+
+
+class Tracer:
+    """Trace of a single operation."""
+
+    def __init__(self):
+        self.started_at = perf_counter()
+        self.phases: dict[str, float] = defaultdict(float)
+        self.fields: dict[str, _FieldTrace] = {}
+        # path (None outside of resolvers) -> [count, duration]
+        self.queries: dict[str | None, list] = defaultdict(lambda: [0, 0.0])
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] += perf_counter() - start
+
+    # DB queries
+
+    def _execute(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - start
+            with self._lock:
+                trace = self.queries[_current_path.get()]
+                trace[0] += 1
+                trace[1] += duration
+
+    def install(self):
+        """Start counting DB queries of the current thread."""
+
+        connection.execute_wrappers.append(self._execute)
+
+    def uninstall(self):
+        connection.execute_wrappers.remove(self._execute)
+
+    @contextmanager
+    def capture_queries(self):
+        self.install()
+        try:
+            yield
+        finally:
+            self.uninstall()
+
+    # resolvers
+
+    def _record(self, info: GraphQLResolveInfo, path: str, start: float):
+        duration = perf_counter() - start
+        with self._lock:
+            if (trace := self.fields.get(path)) is None:
+                trace = self.fields[path] = _FieldTrace(
+                    parent_type=info.parent_type.name, field_name=info.field_name, return_type=str(info.return_type),
+                )
+            trace.count += 1
+            trace.duration += duration
+            trace.max_duration = max(trace.max_duration, duration)
+
+    async def _resolve_async(self, result, info: GraphQLResolveInfo, path: str, start: float):
+        # the awaitable does its (DB) work only now, e.g. off the loop by the thread copying this context
+        token = _current_path.set(path)
+        try:
+            return await result
+        finally:
+            _current_path.reset(token)
+            self._record(info, path, start)
+
+    def resolve(self, next, root, info: GraphQLResolveInfo, **args):
+        path = '.'.join('*' if isinstance(key, int) else key for key in info.path.as_list())
+        start = perf_counter()
+        token = _current_path.set(path)
+        try:
+            result = next(root, info, **args)
+        finally:
+            _current_path.reset(token)
+
+        if is_awaitable(result):
+            return self._resolve_async(result, info, path, start)
+        self._record(info, path, start)
+        return result
+
+    # results
+
+    def as_extension(self) -> dict:
+        with self._lock:
+            queries = {path: tuple(trace) for path, trace in self.queries.items()}
+            fields = dict(self.fields)
+
+        resolvers = []
+        for path, trace in sorted(fields.items()):
+            count, duration = queries.get(path, (0, 0.0))
+            resolvers.append({
+                'path': path,
+                'parentType': trace.parent_type,
+                'fieldName': trace.field_name,
+                'returnType': trace.return_type,
+                'count': trace.count,
+                'duration': _milliseconds(trace.duration),
+                'maxDuration': _milliseconds(trace.max_duration),
+                'queries': count,
+                'queriesDuration': _milliseconds(duration),
+            })
+
+        return {
+            'duration': _milliseconds(perf_counter() - self.started_at),
+            'phases': {name: _milliseconds(duration) for name, duration in self.phases.items()},
+            'queries': sum(count for count, _ in queries.values()),
+            'queriesDuration': _milliseconds(sum(duration for _, duration in queries.values())),
+            'resolvers': resolvers,
+        }
+
+
+def start() -> Tracer | None:
+    """Tracer of the operation about to be executed, None if it is not traced (disabled or not sampled)."""
+
+    if not getattr(settings, 'GRAPHQL_TRACING', False):
+        return None
+    if random.random() >= getattr(settings, 'GRAPHQL_TRACING_SAMPLE_RATE', 1.0):
+        return None
+    return Tracer()
+
+
+def phase(tracer: Tracer | None, name: str):
+    """Time the phase of the operation if it is traced."""
+
+    return nullcontext() if tracer is None else tracer.phase(name)
+
+
+def finish(tracer: Tracer, operation_name: str | None) -> dict | None:
+    """Log the trace (if enabled) and return the extension of the response (None if not returned to clients)."""
+
+    trace = tracer.as_extension()
+    if getattr(settings, 'GRAPHQL_TRACING_LOG', False):
+        log.info('graphql_trace', operation_name=operation_name, **trace)
+    return trace if getattr(settings, 'GRAPHQL_TRACING_EXTENSION', True) else None
@@ -0,0 +1,393 @@
+"""GraphQL views of the API app built upon the one of graphene-django."""
+
+import json
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseNotAllowed
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.utils.utils import set_rollback
+from graphene_django.views import GraphQLView as BaseGraphQLView, HttpError
+from graphql import (
+    DocumentNode,
+    ExecutionResult,
+    GraphQLError,
+    GraphQLSchema,
+    MiddlewareManager,
+    OperationDefinitionNode,
+    OperationType,
+    execute,
+    get_operation_ast,
+    validate_schema,
+)
+from graphql.pyutils import is_awaitable
+
+from . import cost, documents, response_cache, tracing
+from .blocking import ASYNC_FLAG, run_off_loop
+from .loaders import clear_loaders
+
+
+def _with_extensions(result: ExecutionResult, extensions: dict) -> ExecutionResult:
+    result.extensions = {**extensions, **(result.extensions or {})}
+    return result
+
+
+def _atomic_mutations() -> bool:
+    return (
+        graphene_settings.ATOMIC_MUTATIONS is True
+        or connection.settings_dict.get('ATOMIC_MUTATIONS', False) is True
+    )
+
+
+@dataclass
+class Operation:
+    """Parsed and validated operation (within the cost limits) ready to be executed."""
+
+    schema: GraphQLSchema
+    document: DocumentNode
+    ast: OperationDefinitionNode | None
+    query: str
+    variables: dict | None
+    options: dict
+    extensions: dict
+    tracer: tracing.Tracer | None = None
+
+    @property
+    def is_mutation(self) -> bool:
+        return self.ast is not None and self.ast.operation == OperationType.MUTATION
+
+    def cache_key(self) -> str | None:
+        return response_cache.cache_key(self.schema, self.document, self.ast, self.query, self.variables)
+
+    def result(self, result: ExecutionResult, cache: str | None = None) -> ExecutionResult:
+        extensions = self.extensions if cache is None else {**self.extensions, 'responseCache': cache}
+        return _with_extensions(result, extensions)
+
+    def cached(self, data: dict) -> ExecutionResult:
+        return ExecutionResult(data=data, extensions={**self.extensions, 'responseCache': 'hit'})
+
+    @contextmanager
+    def tracing(self):
+        """Trace the execution (in the current thread) if the operation is traced."""
+
+        if self.tracer is None:
+            yield
+            return
+
+        with self.tracer.phase('execute'), self.tracer.capture_queries():
+            yield
+
+    def finish(self, result: ExecutionResult) -> ExecutionResult:
+        operation_name = self.ast.name.value if self.ast is not None and self.ast.name else None
+        if self.tracer is not None and (trace := tracing.finish(self.tracer, operation_name)):
+            result.extensions = {**(result.extensions or {}), 'tracing': trace}
+        return result
+
+
+class GraphQLView(BaseGraphQLView):
+    """GraphQL view executing persisted queries and documents parsed and validated once (see `documents.py`) if they
+    are within the cost limits (see `cost.py`). Responses of cacheable queries are served from the response cache
+    (see `response_cache.py`). Extensions of execution results are passed to responses, including traces of sampled
+    operations (see `tracing.py`).
+
+    A JSON array of operations is executed as a batch: operations run one after another within the same request
+    (sharing its DB connection and loaders) and their results are returned as an array in the same order.
+    """
+
+    @staticmethod
+    def get_client(request) -> str:
+        """Identity of the client the cost budget is tracked for."""
+
+        return request.META.get('REMOTE_ADDR', '')
+
+    @staticmethod
+    def get_extensions(request, data) -> dict | None:
+        extensions = request.GET.get('extensions') or data.get('extensions')
+        if extensions and isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(HttpResponseBadRequest('Extensions are invalid JSON.'))
+        return extensions
+
+    def parse_body(self, request):
+        if self.get_content_type(request) != 'application/json':
+            return super().parse_body(request)
+
+        try:
+            data = json.loads(request.body.decode('utf-8'))
+        except (UnicodeDecodeError, ValueError):
+            raise HttpError(HttpResponseBadRequest('POST body sent invalid JSON.'))
+
+        if isinstance(data, dict):
+            return data
+
+        if not isinstance(data, list) or not all(isinstance(entry, dict) for entry in data):
+            raise HttpError(HttpResponseBadRequest('The received data is not a valid JSON query.'))
+        if not data:
+            raise HttpError(HttpResponseBadRequest('Received an empty list in the batch request.'))
+        max_batch_size = getattr(settings, 'GRAPHQL_MAX_BATCH_SIZE', 20)
+        if len(data) > max_batch_size:
+            raise HttpError(HttpResponseBadRequest(f'Batch request cannot have more than {max_batch_size} operations.'))
+
+        # the view is instantiated per request
+        self.batch = True
+        return data
+
+    def get_response(self, request, data, show_graphiql=False):
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        execution_result = self.execute_graphql_request(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+        return self.format_response(request, execution_result, id, show_graphiql)
+
+    def format_response(self, request, execution_result: ExecutionResult | None, id, show_graphiql=False):
+        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+            set_rollback()
+
+        status_code = 200
+        if execution_result:
+            response = {}
+
+            if execution_result.errors:
+                set_rollback()
+                response['errors'] = [self.format_error(e) for e in execution_result.errors]
+
+            if execution_result.errors and any(not getattr(e, 'path', None) for e in execution_result.errors):
+                status_code = 400
+            else:
+                response['data'] = execution_result.data
+
+            if execution_result.extensions:
+                response['extensions'] = execution_result.extensions
+
+            if self.batch:
+                response['id'] = id
+                response['status'] = status_code
+
+            result = self.json_encode(request, response, pretty=show_graphiql)
+        else:
+            result = None
+
+        return result, status_code
+
+    def execute_graphql_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        operation = self.prepare_operation(request, data, query, variables, operation_name, show_graphiql)
+        if not isinstance(operation, Operation):
+            return operation
+
+        with operation.tracing():
+            result = self.execute_operation(request, operation)
+        return operation.finish(result)
+
+    def execute_operation(self, request, operation: 'Operation') -> ExecutionResult:
+        try:
+            if operation.is_mutation:
+                return self.execute_mutation(request, operation)
+
+            key = operation.cache_key()
+            if key is None:
+                return operation.result(execute(operation.schema, operation.document, **operation.options))
+
+            if (data := response_cache.lookup(key)) is not None:
+                return operation.cached(data)
+
+            result = execute(operation.schema, operation.document, **operation.options)
+            if not result.errors:
+                response_cache.store(key, result.data)
+            return operation.result(result, cache='miss')
+        except Exception as ex:
+            return ExecutionResult(errors=[ex], extensions=operation.extensions)
+
+    def prepare_operation(
+            self, request, data, query, variables, operation_name, show_graphiql=False,
+    ) -> 'Operation | ExecutionResult | None':
+        """Operation ready to be executed or the result of the request if it cannot be executed."""
+
+        try:
+            query = documents.persisted_queries.resolve(query, self.get_extensions(request, data))
+        except GraphQLError as ex:
+            return ExecutionResult(errors=[ex])
+
+        if not query:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest('Must provide query string.'))
+
+        schema = self.schema.graphql_schema
+        tracer = tracing.start()
+
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        document, validation_errors = documents.parse_and_validate(schema, query, self.validation_rules, tracer)
+        if document is None:
+            return ExecutionResult(errors=validation_errors)
+
+        operation_ast = get_operation_ast(document, operation_name)
+
+        if (
+            request.method.lower() == 'get'
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+
+            raise HttpError(HttpResponseNotAllowed(
+                ['POST'],
+                f'Can only perform a {operation_ast.operation.value} operation from a POST request.',
+            ))
+
+        if validation_errors:
+            return ExecutionResult(data=None, errors=validation_errors)
+
+        with tracing.phase(tracer, 'cost'):
+            operation_cost = cost.analyze(schema, document, operation_name, variables)
+        extensions = {'cost': operation_cost.as_extension()}
+        if (error := cost.check(operation_cost, self.get_client(request))) is not None:
+            return ExecutionResult(data=None, errors=[error], extensions=extensions)
+
+        options = {
+            'root_value': self.get_root_value(request),
+            'context_value': self.get_context(request),
+            'variable_values': variables,
+            'operation_name': operation_name,
+            'middleware': self.get_middleware(request),
+        }
+        if tracer is not None:
+            # the first middleware is the innermost one, so the tracer times just the resolvers
+            middleware = options['middleware']
+            if isinstance(middleware, MiddlewareManager):
+                middleware = middleware.middlewares
+            options['middleware'] = [tracer, *(middleware or ())]
+        if self.execution_context_class:
+            options['execution_context_class'] = self.execution_context_class
+
+        return Operation(
+            schema=schema,
+            document=document,
+            ast=operation_ast,
+            query=query,
+            variables=variables,
+            options=options,
+            extensions=extensions,
+            tracer=tracer,
+        )
+
+    def execute_mutation(self, request, operation: 'Operation') -> ExecutionResult:
+        try:
+            if _atomic_mutations():
+                with transaction.atomic():
+                    result = execute(operation.schema, operation.document, **operation.options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+                return operation.result(result)
+
+            return operation.result(execute(operation.schema, operation.document, **operation.options))
+        finally:
+            # following operations of the batch must not see objects loaded before the mutation
+            clear_loaders(operation.options['context_value'])
+
+
+class AsyncGraphQLView(GraphQLView):
+    """GraphQL view executing operations on the event loop of the ASGI server (GraphiQL is served by the synchronous
+    view only). Resolvers doing DB work run off the loop (see `blocking.py`), so a single process serves many
+    concurrent (slow) clients without a worker thread pinned to each of them.
+    """
+
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        setattr(request, ASYNC_FLAG, True)
+        try:
+            if request.method.lower() not in ('get', 'post'):
+                raise HttpError(HttpResponseNotAllowed(['GET', 'POST'], 'GraphQL only supports GET and POST requests.'))
+
+            data = self.parse_body(request)
+            if self.batch:
+                responses = [await self.get_async_response(request, entry) for entry in data]
+                result = '[{}]'.format(','.join(response[0] for response in responses))
+                status_code = max(response[1] for response in responses)
+            else:
+                result, status_code = await self.get_async_response(request, data)
+
+            return HttpResponse(status=status_code, content=result, content_type='application/json')
+        except HttpError as e:
+            response = e.response
+            response['Content-Type'] = 'application/json'
+            response.content = self.json_encode(request, {'errors': [self.format_error(e)]})
+            return response
+
+    async def get_async_response(self, request, data):
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+        execution_result = await self.execute_async_graphql_request(request, data, query, variables, operation_name)
+        return self.format_response(request, execution_result, id)
+
+    async def execute_async_graphql_request(self, request, data, query, variables, operation_name):
+        # parsing, validation and cost analysis are CPU-bound (and mostly served by the cache of documents)
+        operation = self.prepare_operation(request, data, query, variables, operation_name)
+        if not isinstance(operation, Operation):
+            return operation
+
+        if (tracer := operation.tracer) is None:
+            return await self.execute_async_operation(request, operation)
+
+        # DB work is done by the thread of the request
+        await run_off_loop(tracer.install)
+        try:
+            with tracer.phase('execute'):
+                result = await self.execute_async_operation(request, operation)
+        finally:
+            await run_off_loop(tracer.uninstall)
+        return operation.finish(result)
+
+    async def execute_async_operation(self, request, operation: 'Operation') -> ExecutionResult:
+        try:
+            if operation.is_mutation:
+                if _atomic_mutations():
+                    # a transaction cannot span awaits, the whole mutation runs synchronously off the loop
+                    return await run_off_loop(self._execute_synchronously, request, operation)
+                try:
+                    return operation.result(await self._execute(operation))
+                finally:
+                    clear_loaders(operation.options['context_value'])
+
+            key, data = await run_off_loop(self._cached, operation)
+            if key is None:
+                return operation.result(await self._execute(operation))
+            if data is not None:
+                return operation.cached(data)
+
+            result = await self._execute(operation)
+            if not result.errors:
+                await run_off_loop(response_cache.store, key, result.data)
+            return operation.result(result, cache='miss')
+        except Exception as ex:
+            return ExecutionResult(errors=[ex], extensions=operation.extensions)
+
+    @staticmethod
+    async def _execute(operation: 'Operation') -> ExecutionResult:
+        result = execute(operation.schema, operation.document, **operation.options)
+        if is_awaitable(result):
+            result = await result
+        return result
+
+    @staticmethod
+    def _cached(operation: 'Operation') -> tuple[str | None, dict | None]:
+        # versions of cached responses may be kept by a shared (blocking) cache
+        if (key := operation.cache_key()) is None:
+            return None, None
+        return key, response_cache.lookup(key)
+
+    def _execute_synchronously(self, request, operation: 'Operation') -> ExecutionResult:
+        setattr(request, ASYNC_FLAG, False)
+        try:
+            return self.execute_mutation(request, operation)
+        finally:
+            setattr(request, ASYNC_FLAG, True)
@@ -0,0 +1,82 @@
+import json
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test.utils import setup_databases, teardown_databases
+from django.utils.timezone import now
+
+from apps.api import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throw-away test database and run concurrent-load benchmarks against it. Results are printed as JSON. '
+        'The database engine is taken from settings (e.g. `RESCARAPI_DB_ENGINE=postgresql` for a local PostgreSQL).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', dest='scenarios', action='append', choices=sorted(benchmark.SCENARIOS),
+            help='scenario to be run (can be repeated), all of them by default',
+        )
+        parser.add_argument('--cars', type=int, default=100, help='number of seeded cars')
+        parser.add_argument('--reservations', type=int, default=1000, help='number of seeded reservations')
+        parser.add_argument('--operations', type=int, default=200, help='number of operations per scenario')
+        parser.add_argument('--workers', type=int, default=4, help='number of concurrent workers')
+        parser.add_argument(
+            '--executor', choices=[benchmark.EXECUTOR_THREAD, benchmark.EXECUTOR_PROCESS],
+            default=benchmark.EXECUTOR_THREAD, help='run workers as threads or as (forked) processes',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='seed of the random generators')
+        parser.add_argument('--output', help='write results into the given file instead of standard output')
+
+    def handle(
+            self,
+            *args,
+            scenarios=None,
+            cars=100,
+            reservations=1000,
+            operations=200,
+            workers=4,
+            executor=benchmark.EXECUTOR_THREAD,
+            seed=0,
+            output=None,
+            **options,
+    ):
+        if cars <= 0 or reservations < 0:
+            raise CommandError('number of cars has to be positive and number of reservations non-negative')
+        if operations <= 0 or workers <= 0:
+            raise CommandError('number of operations and workers has to be positive')
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            test_settings = connections[DEFAULT_DB_ALIAS].settings_dict.setdefault('TEST', {})
+            if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+                # in-memory database cannot be shared by worker processes
+                test_settings['NAME'] = str(Path(tmp_dir) / 'benchmark.sqlite3')
+
+            old_config = setup_databases(verbosity=0, interactive=False, aliases={DEFAULT_DB_ALIAS})
+            try:
+                # the benchmark window starts at the next whole hour
+                start = now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+                fleet = benchmark.seed(cars=cars, reservations=reservations, start=start, seed=seed)
+                results = {
+                    'database': connection.vendor,
+                    'cars': cars,
+                    'reservations': reservations,
+                    'seed': seed,
+                    'scenarios': [
+                        benchmark.run(scenario, fleet, operations, workers=workers, executor=executor, seed=seed)
+                        for scenario in scenarios or benchmark.SCENARIOS
+                    ],
+                }
+            finally:
+                teardown_databases(old_config, verbosity=0)
+
+        if output:
+            with open(output, 'w') as f:
+                json.dump(results, f, indent=2)
+        else:
+            self.stdout.write(json.dumps(results, indent=2))
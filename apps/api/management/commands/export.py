@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.api import export
+
+
+class Command(BaseCommand):
+    help = 'Stream reservations (with their cars) or cars as NDJSON or CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(export.DATASETS), help='what to export')
+        parser.add_argument('--format', choices=sorted(export.CONTENT_TYPES), default=export.NDJSON)
+        parser.add_argument('--from', dest='start', help='start of the time range (ISO 8601)')
+        parser.add_argument('--to', dest='end', help='end of the time range (ISO 8601)')
+        parser.add_argument('--chunk-size', type=int, default=None, help='number of rows fetched at once')
+        parser.add_argument('--output', help='file to write to, standard output by default')
+
+    def handle(
+            self, *args, dataset, format=export.NDJSON, start=None, end=None, chunk_size=None, output=None, **options,
+    ):
+        if chunk_size is not None and chunk_size <= 0:
+            raise CommandError('chunk size has to be positive')
+
+        try:
+            chunks = export.export(
+                dataset, format, start=export.parse_moment(start), end=export.parse_moment(end), chunk_size=chunk_size,
+            )
+        except ValueError as ex:
+            raise CommandError(str(ex))
+
+        if output is None:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        with open(output, 'w', encoding='utf-8', newline='') as file:
+            file.writelines(chunks)
@@ -0,0 +1,22 @@
+"""Metrics of the GraphQL end-point (see `libs.metrics`)."""
+
+from libs.metrics import registry
+
+
+document_cache = registry.counter(
+    'graphql_document_cache_total',
+    'Lookups of parsed and validated GraphQL documents by result (hit or miss).',
+    labels=('result',),
+)
+
+persisted_queries = registry.counter(
+    'graphql_persisted_queries_total',
+    'Requests referring to persisted queries by outcome (found, registered, not_found or rejected).',
+    labels=('outcome',),
+)
+
+response_cache = registry.counter(
+    'graphql_response_cache_total',
+    'Lookups of cached responses of GraphQL queries by result (hit or miss).',
+    labels=('result',),
+)
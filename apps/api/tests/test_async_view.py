@@ -0,0 +1,150 @@
+import json
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory
+from graphene_django.settings import graphene_settings
+
+from apps.api.graphql import blocking, response_cache
+from apps.api.graphql.views import AsyncGraphQLView, GraphQLView
+from apps.carpool.models import Car, CarMake, CarModel
+from apps.reservation import services as reservations
+from apps.reservation.models import Reservation
+
+
+noon = datetime(2030, 1, 1, 12, tzinfo=timezone.utc)
+hour = timedelta(hours=1)
+
+
+@pytest.fixture
+def cars(db) -> list[Car]:
+    make = CarMake.objects.create(name='Skoda', official_name='Skoda')
+    model = CarModel.objects.create(make=make, name='Octavia')
+    cars = [Car.objects.create(car_id=f'C{i}', registration_number=f'{i}AB 0000', model=model) for i in (1, 2)]
+    for i, car in enumerate(cars):
+        Reservation.objects.create(
+            car=car, to_rent_at=noon + i * hour, to_return_at=noon + (i + 1) * hour, request_id=uuid.uuid4(),
+        )
+    return cars
+
+
+def post(body, view=AsyncGraphQLView) -> tuple[int, object]:
+    request = RequestFactory().post('/gql', data=json.dumps(body), content_type='application/json')
+    if view is AsyncGraphQLView:
+        response = async_to_sync(view.as_view())(request)
+    else:
+        response = view.as_view()(request)
+    return response.status_code, json.loads(response.content)
+
+
+QUERY = '''
+    query ($id: UUID!) {
+        cars { carId make model }
+        carsConnection(first: 1) { totalCount edges { node { carId } } }
+        reservations(first: 5) { totalCount edges { node { toRentAt car { carId make model } } } }
+        reservationByRequestId(requestId: $id) { id car { registrationNumber } }
+        availability(from: "2030-01-01T12:00:00Z", to: "2030-01-01T15:00:00Z") {
+            cars { car { carId model } freeSlots { start end } }
+            fleet { start freeCars }
+        }
+    }
+'''
+
+
+def test__async_view__same_results_as_sync_view(cars: list[Car]):
+    body = {'query': QUERY, 'variables': {'id': str(Reservation.objects.first().request_id)}}
+
+    status, result = post(body)
+    assert status == 200
+    assert 'errors' not in result
+    assert result['data'] == post(body, view=GraphQLView)[1]['data']
+    assert result['data']['reservations']['totalCount'] == 2
+    assert result['data']['availability']['fleet'][0]['freeCars'] == 1
+
+
+def test__async_view__db_work_off_the_loop(cars: list[Car], monkeypatch):
+    threads = []
+    fetch = reservations.fetch_reservation_by_request_id
+
+    def recording_fetch(request_id):
+        threads.append(threading.get_ident())
+        return fetch(request_id)
+
+    monkeypatch.setattr(reservations, 'fetch_reservation_by_request_id', recording_fetch)
+    query = 'query ($id: UUID!) { reservationByRequestId(requestId: $id) { car { carId } } }'
+
+    status, result = post({'query': query, 'variables': {'id': str(uuid.uuid4())}})
+    assert status == 200
+    assert result['data'] == {'reservationByRequestId': None}
+    # the event loop of `async_to_sync` runs in another thread, the thread of the request is the calling one
+    assert threads == [threading.get_ident()]
+
+
+def test__async_view__loaded_related_objects_resolved_on_the_loop(cars: list[Car], monkeypatch):
+    resolvers = []
+    run = blocking.run_off_loop
+
+    def recording_run(func, *args, **kwargs):
+        resolvers.append(func.__name__)
+        return run(func, *args, **kwargs)
+
+    monkeypatch.setattr(blocking, 'run_off_loop', recording_run)
+    query = '{ cars { carId make model } reservations(first: 5) { edges { node { car { carId model } } } } }'
+    status, result = post({'query': query})
+    assert status == 200
+    assert [car['make'] for car in result['data']['cars']] == ['Skoda', 'Skoda']
+    # related objects selected together with the rows need no DB work of their own
+    assert resolvers == ['resolve_cars', 'resolve_reservations']
+
+
+def test__async_view__mutations(cars: list[Car]):
+    status, result = post({
+        'query': '''
+            mutation {
+                addCar(input: {make: "Skoda", model: "Fabia", carId: "C3", registrationNumber: "3AB 0000"}) {
+                    payload { carId make model }
+                }
+                reserve(input: {toRentAt: "2030-01-01T12:00:00Z", durationMinutes: 60}) {
+                    payload { car { carId } }
+                }
+            }
+        ''',
+    })
+
+    assert status == 200
+    assert result['data']['addCar']['payload'] == {'carId': 'C3', 'make': 'Skoda', 'model': 'Fabia'}
+    # C1 is reserved at noon, C2 is the first free car
+    assert result['data']['reserve']['payload'] == {'car': {'carId': 'C2'}}
+
+
+def test__async_view__atomic_mutations(cars: list[Car], monkeypatch):
+    monkeypatch.setattr(graphene_settings, 'ATOMIC_MUTATIONS', True)
+
+    status, result = post({'query': 'mutation { deleteCar(input: {carId: "C1"}) { payload { carId make } } }'})
+    assert status == 200
+    assert result['data'] == {'deleteCar': {'payload': {'carId': 'C1', 'make': 'Skoda'}}}
+    assert not Car.objects.filter(car_id='C1').exists()
+
+
+def test__async_view__batch_and_response_cache(cars: list[Car], settings, monkeypatch):
+    monkeypatch.setattr(response_cache, '_backend', None)
+    settings.GRAPHQL_RESPONSE_CACHE = response_cache.BACKEND_IN_PROCESS
+
+    status, result = post([{'query': '{ cars { carId } }'}] * 2 + [{'query': '{ cars { unknownField } }'}])
+    assert status == 400
+    assert [entry['status'] for entry in result] == [200, 200, 400]
+    assert [entry.get('extensions', {}).get('responseCache') for entry in result] == ['miss', 'hit', None]
+    assert result[1]['data'] == {'cars': [{'carId': 'C1'}, {'carId': 'C2'}]}
+
+
+def test__async_view__errors(db):
+    request = RequestFactory().put('/gql')
+    response = async_to_sync(AsyncGraphQLView.as_view())(request)
+    assert response.status_code == 405
+
+    status, result = post({'query': '{ reservations(first: 1) { edges { node { car { make } } } } }'})
+    assert status == 200
+    assert result['data'] == {'reservations': {'edges': []}}
@@ -0,0 +1,99 @@
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.test import RequestFactory
+
+from apps.api.graphql.views import GraphQLView
+from apps.carpool.models import Car, CarMake, CarModel
+from apps.reservation.models import Reservation
+
+
+noon = datetime(2030, 1, 1, 12, tzinfo=timezone.utc)
+hour = timedelta(hours=1)
+
+@pytest.fixture
+def cars(db) -> list[Car]:
+    make = CarMake.objects.create(name='Skoda', official_name='Skoda')
+    model = CarModel.objects.create(make=make, name='Octavia')
+    cars = [Car.objects.create(car_id=f'C{i}', registration_number=f'{i}AB 0000', model=model) for i in (1, 2)]
+    for i, car in enumerate(cars):
+        Reservation.objects.create(car=car, to_rent_at=noon + i * hour, to_return_at=noon + (i + 1) * hour)
+    return cars
+
+
+def post(body) -> tuple[int, object]:
+    request = RequestFactory().post('/gql', data=json.dumps(body), content_type='application/json')
+    response = GraphQLView.as_view()(request)
+    return response.status_code, json.loads(response.content)
+
+
+def test__batch__results_in_order(cars: list[Car]):
+    status, body = post([
+        {'id': 'first', 'query': '{ cars { carId } }'},
+        {'id': 'second', 'query': 'query ($first: Int) { carsConnection(first: $first) { totalCount } }',
+         'variables': {'first': 1}},
+        {'query': '{ cars { unknownField } }'},
+    ])
+
+    assert status == 400
+    assert [(result['id'], result['status']) for result in body] == [('first', 200), ('second', 200), (None, 400)]
+    assert body[0]['data'] == {'cars': [{'carId': 'C1'}, {'carId': 'C2'}]}
+    assert body[1]['data'] == {'carsConnection': {'totalCount': 2}}
+    assert 'unknownField' in body[2]['errors'][0]['message']
+    assert all('cost' in result['extensions'] for result in body[:2])
+
+
+def test__batch__loaders_shared(cars: list[Car], django_assert_num_queries):
+    request_ids = [uuid.uuid4(), uuid.uuid4()]
+    for i, request_id in enumerate(request_ids, start=2):
+        Reservation.objects.create(
+            car=cars[0], to_rent_at=noon + i * hour, to_return_at=noon + (i + 1) * hour, request_id=request_id,
+        )
+    query = 'query ($id: UUID!) { reservationByRequestId(requestId: $id) { car { carId } } }'
+
+    # the second operation finds the car already loaded by the first one
+    with django_assert_num_queries(2 + 1):
+        status, body = post([{'query': query, 'variables': {'id': str(request_id)}} for request_id in request_ids])
+
+    assert status == 200
+    assert [result['data'] for result in body] == [{'reservationByRequestId': {'car': {'carId': 'C1'}}}] * 2
+
+
+def test__batch__loaders_cleared_by_mutation(cars: list[Car]):
+    request_id = uuid.uuid4()
+    Reservation.objects.create(car=cars[0], to_rent_at=noon, to_return_at=noon + hour, request_id=request_id)
+    query = {
+        'query': 'query ($id: UUID!) { reservationByRequestId(requestId: $id) { car { registrationNumber } } }',
+        'variables': {'id': str(request_id)},
+    }
+
+    status, body = post([
+        query,
+        {'query': 'mutation { updateCar(input: {carId: "C1", registrationNumber: "9ZZ 9999"}) { payload { carId } } }'},
+        query,
+    ])
+
+    assert status == 200
+    assert body[0]['data']['reservationByRequestId']['car'] == {'registrationNumber': '1AB 0000'}
+    assert body[2]['data']['reservationByRequestId']['car'] == {'registrationNumber': '9ZZ 9999'}
+
+
+def test__single_operation__not_batched(cars: list[Car]):
+    status, body = post({'query': '{ cars { carId } }'})
+    assert status == 200
+    assert body['data'] == {'cars': [{'carId': 'C1'}, {'carId': 'C2'}]}
+    assert 'id' not in body
+
+
+@pytest.mark.parametrize('body, message', [
+    ([], 'Received an empty list in the batch request.'),
+    ([{'query': '{ cars { carId } }'}, 'query'], 'The received data is not a valid JSON query.'),
+    ('{ cars { carId } }', 'The received data is not a valid JSON query.'),
+    ([{'query': '{ cars { carId } }'}] * 21, 'Batch request cannot have more than 20 operations.'),
+])
+def test__batch__invalid(db, body, message):
+    status, response = post(body)
+    assert status == 400
+    assert response['errors'][0]['message'] == message
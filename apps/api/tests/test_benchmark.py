@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from apps.api import benchmark
+from apps.carpool.models import Car
+from apps.reservation.models import Reservation
+
+
+def test__percentile():
+    values = [float(i) for i in range(1, 101)]
+    assert benchmark.percentile(values, 50) == 50.0
+    assert benchmark.percentile(values, 99) == 99.0
+    assert benchmark.percentile(values, 100) == 100.0
+    assert benchmark.percentile([], 50) == 0.0
+
+
+noon = datetime(2030, 1, 1, 12, tzinfo=timezone.utc)
+hour = timedelta(hours=1)
+
+
+@pytest.fixture
+def fleet(transactional_db) -> benchmark.Fleet:
+    return benchmark.seed(cars=4, reservations=10, start=noon, seed=1)
+
+
+def test__seed(fleet: benchmark.Fleet):
+    assert Car.objects.count() == len(fleet.cars) == 4
+    assert Reservation.objects.count() == 10
+    assert fleet.slots == 2 * 3 + 2
+    # even and odd cars are reserved for the alternating hours
+    assert set(Reservation.objects.filter(car__car_id='C1').values_list('to_rent_at', flat=True)) == {
+        noon, noon + 2 * hour, noon + 4 * hour,
+    }
+
+
+@pytest.mark.parametrize('scenario', sorted(benchmark.SCENARIOS))
+def test__run(fleet: benchmark.Fleet, scenario: str):
+    result = benchmark.run(scenario, fleet, operations=6, workers=1, seed=1)
+    assert result['scenario'] == scenario
+    assert result['operations'] == 6
+    assert result['errors'] == {}
+    assert result['throughput_per_s'] > 0
+    assert result['latency_ms']['p50'] <= result['latency_ms']['p99'] <= result['latency_ms']['max']
+    assert result['queries_per_operation'] >= 1
+    if scenario in ('make_reservation', 'graphql_reserve'):
+        assert result['retry_rate'] is not None
+    else:
+        assert result['retry_rate'] is None
+
+
+def test__run__concurrent_readers(fleet: benchmark.Fleet):
+    result = benchmark.run('all_cars', fleet, operations=8, workers=4)
+    assert result['operations'] == 8
+    assert result['errors'] == {}
+    assert result['queries_per_operation'] == 1
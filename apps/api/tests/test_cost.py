@@ -0,0 +1,141 @@
+import json
+
+from django.test import RequestFactory
+from graphql import parse
+
+from apps.api.graphql import cost
+from apps.api.graphql.cost import CostThrottle, OperationCost
+from apps.api.graphql.schema import schema
+from apps.api.graphql.views import GraphQLView
+
+
+def analyze(query: str, variables: dict | None = None) -> OperationCost:
+    return cost.analyze(schema.graphql_schema, parse(query), variables=variables)
+
+
+def post(query: str, variables: dict | None = None, address: str = '127.0.0.1') -> tuple[int, dict]:
+    request = RequestFactory().post(
+        '/gql',
+        data=json.dumps({'query': query, 'variables': variables or {}}),
+        content_type='application/json',
+        REMOTE_ADDR=address,
+    )
+    response = GraphQLView.as_view()(request)
+    return response.status_code, json.loads(response.content)
+
+
+def test__analyze__scalars_and_objects():
+    assert analyze('{ reservationByRequestId(requestId: "6d9b6f0e-7b4e-4d38-9a41-2d0c0a4f2b11") { id } }') == (
+        OperationCost(cost=1, depth=2)
+    )
+    # the car of the reservation costs one more
+    operation_cost = analyze('''
+        { reservationByRequestId(requestId: "6d9b6f0e-7b4e-4d38-9a41-2d0c0a4f2b11") { id car { carId } } }
+    ''')
+    assert operation_cost == OperationCost(cost=2, depth=3)
+
+
+def test__analyze__connections_multiplied_by_page_size():
+    query = '''
+        query ($first: Int) {
+            reservations(first: $first) {
+                totalCount
+                edges { cursor node { id car { carId make } } }
+                pageInfo { hasNextPage }
+            }
+        }
+    '''
+    # connection + page info + edges * (edge + node + car)
+    assert analyze(query, {'first': 10}).cost == 1 + 1 + 10 * 3
+    assert analyze(query, {'first': 10}).depth == 5
+    # unpaginated connections are limited by RELAY_CONNECTION_MAX_LIMIT (100 by default)
+    assert analyze(query).cost == 1 + 1 + 100 * 3
+    assert analyze(query, {'first': 100_000}).cost == 1 + 1 + 100 * 3
+
+
+def test__analyze__lists_and_hints():
+    # the whole fleet
+    assert analyze('{ cars { carId } }').cost == 1000
+    assert analyze('{ utilization(buckets: 10) { freeCars } }').cost == 10
+    assert analyze('{ utilization { freeCars } }').cost == 30 * 24 * 4
+    assert analyze('''
+        {
+            availability(from: "2030-01-01T12:00:00Z", to: "2030-01-02T12:00:00Z") {
+                cars { car { carId } freeSlots { start } }
+            }
+        }
+    ''').cost == 1 + 100 * (1 + 1 + 10)
+    assert analyze('''
+        {
+            availability(from: "2030-01-01T12:00:00Z", to: "2030-01-02T12:00:00Z") {
+                cars(first: 5) { car { carId } }
+            }
+        }
+    ''').cost == 1 + 5 * (1 + 1)
+
+
+def test__analyze__fragments():
+    assert analyze('''
+        { ...page }
+        fragment page on Query { reservations(first: 5) { edges { ...edge } } }
+        fragment edge on ReservationEdge { node { ... on Reservation { id car { carId } } } }
+    ''') == OperationCost(cost=1 + 5 * 3, depth=5)
+
+
+def test__view__cost_reported(db):
+    status, body = post('{ reservations(first: 2) { edges { node { id } } } }')
+    assert status == 200
+    assert body['data'] == {'reservations': {'edges': []}}
+    assert body['extensions']['cost'] == {'requested': 1 + 2 * 2, 'maximum': 10_000, 'depth': 4, 'maximumDepth': 10}
+
+
+def test__view__over_budget_rejected(db, settings, django_assert_num_queries):
+    settings.GRAPHQL_MAX_COST = 100
+
+    with django_assert_num_queries(0):
+        status, body = post('{ reservations { edges { node { id car { carId } } } } }')
+    assert status == 400
+    assert 'data' not in body
+    assert body['errors'][0]['message'] == 'query cost 301 exceeds the maximum cost 100'
+    assert body['errors'][0]['extensions']['code'] == cost.QUERY_TOO_COMPLEX
+    assert body['extensions']['cost']['requested'] == 301
+
+
+def test__view__too_deep_rejected(db, settings):
+    settings.GRAPHQL_MAX_DEPTH = 3
+
+    status, body = post('{ reservations(first: 1) { edges { node { id } } } }')
+    assert status == 400
+    assert body['errors'][0]['message'] == 'query depth 4 exceeds the maximum depth 3'
+
+
+def test__view__throttled(db, settings):
+    settings.GRAPHQL_COST_THROTTLE_RATE = 0.001
+    settings.GRAPHQL_COST_THROTTLE_BURST = 1500
+    query = '{ cars { carId } }'
+
+    assert post(query, address='10.0.0.1')[0] == 200
+    status, body = post(query, address='10.0.0.1')
+    assert status == 400
+    assert body['errors'][0]['extensions']['code'] == cost.QUERY_THROTTLED
+    # budgets are per client
+    assert post(query, address='10.0.0.2')[0] == 200
+
+
+def test__cost_throttle__refilled(monkeypatch):
+    moment = 100.0
+    monkeypatch.setattr(cost.time, 'monotonic', lambda: moment)
+    throttle = CostThrottle(rate=10, burst=100)
+
+    assert throttle.acquire('a', 80) == 20
+    assert throttle.acquire('a', 30) is None
+
+    moment += 1
+    assert throttle.acquire('a', 30) == 0
+    moment += 100
+    assert throttle.acquire('a', 0) == 100
+
+
+def test__analyze__introspection_not_limited():
+    query = '{ __schema { types { name fields { name type { name ofType { name ofType { name } } } } } } }'
+    assert analyze(query) == OperationCost(cost=0, depth=1)
@@ -0,0 +1,171 @@
+import json
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.test import RequestFactory
+
+from apps.api import metrics
+from apps.api.graphql import documents
+from apps.api.graphql.documents import PersistedQueries, query_hash
+from apps.api.graphql.views import GraphQLView
+from apps.carpool.models import Car, CarMake, CarModel
+
+
+CARS = '{ cars { carId } }'
+
+
+@pytest.fixture
+def car(db) -> Car:
+    make = CarMake.objects.create(name='Skoda', official_name='Skoda')
+    return Car.objects.create(
+        car_id='C1',
+        registration_number='1AB 0000',
+        model=CarModel.objects.create(make=make, name='Octavia'),
+    )
+
+
+@pytest.fixture(autouse=True)
+def clean_caches():
+    documents.documents.clear()
+    metrics.document_cache.reset()
+    metrics.persisted_queries.reset()
+
+
+@pytest.fixture
+def persisted(monkeypatch):
+    def install(queries=None, strict=False) -> PersistedQueries:
+        persisted_queries = PersistedQueries(queries, strict=strict)
+        monkeypatch.setattr(documents, 'persisted_queries', persisted_queries)
+        return persisted_queries
+
+    return install
+
+
+def post(body: dict) -> tuple[int, dict]:
+    request = RequestFactory().post('/gql', data=json.dumps(body), content_type='application/json')
+    response = GraphQLView.as_view()(request)
+    return response.status_code, json.loads(response.content)
+
+
+def persisted_query(query: str) -> dict:
+    return {'persistedQuery': {'version': 1, 'sha256Hash': query_hash(query)}}
+
+
+def test__document_cache__parsed_and_validated_once(car: Car, monkeypatch):
+    validations = []
+    monkeypatch.setattr(documents, 'validate', lambda *args: validations.append(args) or [])
+
+    for _ in range(3):
+        status, body = post({'query': CARS})
+        assert status == 200
+        assert body['data'] == {'cars': [{'carId': 'C1'}]}
+
+    assert len(validations) == 1
+    assert metrics.document_cache.value(result='miss') == 1
+    assert metrics.document_cache.value(result='hit') == 2
+
+
+def test__document_cache__invalid_documents_not_cached(db):
+    for _ in range(2):
+        status, body = post({'query': '{ cars { unknownField } }'})
+        assert status == 400
+        assert 'unknownField' in body['errors'][0]['message']
+
+    status, body = post({'query': '{ cars '})
+    assert status == 400
+    assert 'Syntax Error' in body['errors'][0]['message']
+
+    assert len(documents.documents) == 0
+
+
+def test__document_cache__lru():
+    documents.documents.max_size = 2
+    try:
+        schema = GraphQLView().schema.graphql_schema
+        for query in ('{ cars { carId } }', '{ cars { model } }', '{ cars { carId } }', '{ cars { make } }'):
+            document, errors = documents.parse_and_validate(schema, query)
+            assert document is not None and not errors
+    finally:
+        documents.documents.max_size = 1000
+
+    assert metrics.document_cache.value(result='hit') == 1
+    assert len(documents.documents) == 2
+    assert documents.parse_and_validate(schema, '{ cars { carId } }')[0] is not None
+    assert metrics.document_cache.value(result='hit') == 2
+
+
+def test__persisted_queries__registered_by_client(car: Car, persisted):
+    persisted()
+
+    status, body = post({'extensions': persisted_query(CARS)})
+    assert status == 400
+    assert body['errors'][0]['message'] == 'PersistedQueryNotFound'
+    assert body['errors'][0]['extensions']['code'] == documents.PERSISTED_QUERY_NOT_FOUND
+
+    status, body = post({'query': CARS, 'extensions': persisted_query(CARS)})
+    assert status == 200
+    assert body['data'] == {'cars': [{'carId': 'C1'}]}
+
+    status, body = post({'extensions': persisted_query(CARS)})
+    assert status == 200
+    assert body['data'] == {'cars': [{'carId': 'C1'}]}
+
+    assert metrics.persisted_queries.values() == {('not_found',): 1, ('registered',): 1, ('found',): 1}
+
+
+def test__persisted_queries__hash_mismatch(db, persisted):
+    persisted()
+
+    status, body = post({'query': CARS, 'extensions': persisted_query('{ cars { model } }')})
+    assert status == 400
+    assert body['errors'][0]['extensions']['code'] == documents.PERSISTED_QUERY_INVALID
+
+    status, body = post({'extensions': {'persistedQuery': {'version': 2, 'sha256Hash': query_hash(CARS)}}})
+    assert status == 400
+    assert body['errors'][0]['extensions']['code'] == documents.PERSISTED_QUERY_INVALID
+
+
+def test__persisted_queries__strict(car: Car, persisted):
+    persisted({query_hash(CARS): CARS}, strict=True)
+
+    status, body = post({'extensions': persisted_query(CARS)})
+    assert status == 200
+    assert body['data'] == {'cars': [{'carId': 'C1'}]}
+
+    # full text of a persisted query is fine too
+    status, body = post({'query': CARS})
+    assert status == 200
+
+    other = '{ cars { model } }'
+    for request in ({'extensions': persisted_query(other)}, {'query': other, 'extensions': persisted_query(other)}):
+        status, body = post(request)
+        assert status == 400
+        assert body['errors'][0]['extensions']['code'] == documents.PERSISTED_QUERY_NOT_ALLOWED
+
+    status, body = post({'query': other})
+    assert status == 400
+    assert body['errors'][0]['message'] == 'only persisted queries are allowed'
+
+
+def test__persisted_queries__get_request(car: Car, persisted):
+    persisted({query_hash(CARS): CARS})
+
+    request = RequestFactory().get('/gql', {'extensions': json.dumps(persisted_query(CARS))})
+    response = GraphQLView.as_view()(request)
+    assert response.status_code == 200
+    assert json.loads(response.content)['data'] == {'cars': [{'carId': 'C1'}]}
+
+
+def test__persisted_queries__from_settings(settings, tmp_path):
+    path = tmp_path / 'queries.json'
+    path.write_text(json.dumps({query_hash(CARS): CARS}))
+    settings.GRAPHQL_PERSISTED_QUERIES = path
+    settings.GRAPHQL_PERSISTED_QUERIES_STRICT = True
+
+    persisted_queries = PersistedQueries.from_settings()
+    assert persisted_queries.strict
+    assert persisted_queries.get(query_hash(CARS)) == CARS
+
+    path.write_text(json.dumps({query_hash(CARS): '{ cars { model } }'}))
+    with pytest.raises(ImproperlyConfigured):
+        PersistedQueries.from_settings()
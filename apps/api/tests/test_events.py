@@ -0,0 +1,208 @@
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib import admin
+from django.test import AsyncRequestFactory, RequestFactory
+
+from apps.api import views
+from apps.carpool import services as carpool
+from apps.carpool.models import Car
+from apps.reservation import services as reservations
+from apps.reservation.admin import ReservationAdmin
+from apps.reservation.models import Reservation
+from libs import events
+from libs.events import RESYNC, Broker
+
+
+noon = datetime(2030, 1, 1, 12, tzinfo=timezone.utc)
+hour = timedelta(hours=1)
+
+
+@pytest.fixture
+def broker(monkeypatch) -> Broker:
+    broker = Broker()
+    monkeypatch.setattr(events, 'broker', broker)
+    monkeypatch.setattr(views, 'broker', broker)
+    # publishing helpers of the apps check the broker they imported
+    monkeypatch.setattr('apps.carpool.events.broker', broker)
+    monkeypatch.setattr('apps.reservation.events.broker', broker)
+    return broker
+
+
+def parse(chunk: bytes | str) -> list[tuple[str, dict]]:
+    if isinstance(chunk, bytes):
+        chunk = chunk.decode()
+    result = []
+    for message in chunk.split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in message.splitlines() if not line.startswith(':'))
+        if fields:
+            result.append((fields['event'], json.loads(fields['data'])))
+    return result
+
+
+def test__broker__fan_out(broker: Broker):
+    first, second = broker.subscribe(), broker.subscribe()
+    broker.publish('a', {'x': 1})
+    second.close()
+    broker.publish('b')
+
+    assert [(event.id, event.type, event.data) for event in first.get(timeout=0)] == [(1, 'a', {'x': 1}), (2, 'b', {})]
+    assert [event.type for event in second.get(timeout=0)] == ['a']
+    assert first.get(timeout=0) == []
+    assert len(broker) == 1
+
+
+def test__broker__bounded_queues(broker: Broker):
+    subscription = broker.subscribe(max_size=2)
+    for i in range(5):
+        broker.publish('a', {'i': i})
+
+    # the lost events are replaced by a single resync event
+    assert [(event.id, event.type) for event in subscription.get(timeout=0)] == [(5, RESYNC)]
+    broker.publish('a')
+    assert [event.type for event in subscription.get(timeout=0)] == ['a']
+
+
+def test__broker__max_subscribers(broker: Broker):
+    assert broker.subscribe(max_subscribers=1) is not None
+    assert broker.subscribe(max_subscribers=1) is None
+
+
+def test__broker__woken_up_by_another_thread(broker: Broker):
+    subscription = broker.subscribe()
+
+    async def wait():
+        publisher = threading.Timer(0.05, broker.publish, args=('a',))
+        publisher.start()
+        try:
+            return await subscription.aget(timeout=5)
+        finally:
+            publisher.join()
+
+    assert [event.type for event in async_to_sync(wait)()] == ['a']
+    assert asyncio.run(subscription.aget(timeout=0.01)) == []
+
+
+def test__services__publish_after_commit(broker: Broker, db, django_capture_on_commit_callbacks):
+    subscription = broker.subscribe()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        carpool.get_or_create_car('Skoda', 'Octavia', 'C1', '1AB 0000')
+        reservation = reservations.make_reservation(request_id=None, to_rent_at=noon, duration=hour)
+        carpool.update_car('C1', registration_number='9ZZ 9999')
+
+    assert [(event.type, event.data) for event in subscription.get(timeout=0)] == [
+        ('car.added', {'car_id': 'C1', 'registration_number': '1AB 0000', 'model': 'Octavia', 'make': 'Skoda'}),
+        ('reservation.created', {
+            'id': reservation.pk, 'request_id': None, 'car_id': 'C1', 'to_rent_at': noon, 'to_return_at': noon + hour,
+        }),
+        ('car.updated', {'car_id': 'C1', 'registration_number': '9ZZ 9999', 'model': 'Octavia', 'make': 'Skoda'}),
+    ]
+
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+        carpool.delete_car('C1')
+    # nothing is published until commit
+    assert subscription.get(timeout=0) == []
+    for callback in callbacks:
+        callback()
+
+    assert [(event.type, event.data) for event in subscription.get(timeout=0)] == [
+        ('car.deleted', {'car_id': 'C1', 'reservation_ids': [reservation.pk]}),
+    ]
+    assert not Car.objects.exists()
+
+
+def test__services__nothing_published_without_subscribers(broker: Broker, db, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks() as callbacks:
+        carpool.get_or_create_car('Skoda', 'Octavia', 'C1', '1AB 0000')
+        reservations.make_reservations([(None, noon, hour)])
+    # only the invalidation of cached responses
+    assert len(callbacks) == 1
+
+
+def test__admin__reservations_deleted(broker: Broker, db, django_capture_on_commit_callbacks):
+    carpool.get_or_create_car('Skoda', 'Octavia', 'C1', '1AB 0000')
+    first, second = reservations.make_reservations([(None, noon, hour), (None, noon + hour, hour)])
+    pks = [first.pk, second.pk]
+    subscription = broker.subscribe()
+
+    model_admin = ReservationAdmin(Reservation, admin.site)
+    with django_capture_on_commit_callbacks(execute=True):
+        model_admin.delete_model(None, first)
+        model_admin.delete_queryset(None, Reservation.objects.all())
+
+    assert [(event.type, event.data) for event in subscription.get(timeout=0)] == [
+        ('reservation.deleted', {'id': pks[0], 'car_id': 'C1'}),
+        ('reservation.deleted', {'id': pks[1], 'car_id': 'C1'}),
+    ]
+
+
+def test__view__stream(broker: Broker, db, settings):
+    settings.EVENTS_HEARTBEAT = 0.01
+    response = views.events(RequestFactory().get('/events'))
+
+    assert response['Content-Type'] == 'text/event-stream'
+    assert response['Cache-Control'] == 'no-cache'
+    stream = iter(response.streaming_content)
+    assert next(stream) == b':\n\n'
+
+    broker.publish('car.added', {'car_id': 'C1'})
+    broker.publish('car.deleted', {'car_id': 'C1', 'reservation_ids': []})
+    assert parse(next(stream)) == [
+        ('car.added', {'car_id': 'C1'}),
+        ('car.deleted', {'car_id': 'C1', 'reservation_ids': []}),
+    ]
+    # heartbeat
+    assert next(stream) == b':\n\n'
+
+    response.close()
+    assert not broker.has_subscribers()
+
+
+def test__view__async_stream(broker: Broker, db):
+    response = views.events(AsyncRequestFactory().get('/events'))
+    assert response.is_async
+
+    async def read():
+        stream = aiter(response.streaming_content)
+        chunks = [await anext(stream)]
+        broker.publish('reservation.created', {'id': 1})
+        chunks.append(await anext(stream))
+        await stream.aclose()
+        return chunks
+
+    opening, chunk = async_to_sync(read)()
+    assert opening == b':\n\n'
+    assert parse(chunk) == [('reservation.created', {'id': 1})]
+
+    response.close()
+    assert not broker.has_subscribers()
+
+
+def test__view__sync_stream_closed(broker: Broker, db, settings):
+    settings.EVENTS_HEARTBEAT = 0.01
+    settings.EVENTS_SYNC_MAX_DURATION = 0.05
+    response = views.events(RequestFactory().get('/events'))
+
+    # heartbeats until the stream ends on its own
+    assert set(response.streaming_content) == {b':\n\n'}
+    response.close()
+    assert not broker.has_subscribers()
+
+
+def test__view__remote_subscriber_forbidden(broker: Broker):
+    assert views.events(RequestFactory().get('/events', REMOTE_ADDR='10.0.0.1')).status_code == 403
+    assert not broker.has_subscribers()
+
+
+def test__view__too_many_subscribers(broker: Broker, settings):
+    settings.EVENTS_MAX_SUBSCRIBERS = 1
+
+    assert views.events(RequestFactory().get('/events')).status_code == 200
+    response = views.events(RequestFactory().get('/events'))
+    assert response.status_code == 503
+    assert response['Retry-After'] == '10'
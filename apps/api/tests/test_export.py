@@ -0,0 +1,134 @@
+import csv
+import io
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import AsyncRequestFactory, RequestFactory
+
+from apps.api import export, views
+from apps.carpool.models import Car, CarMake, CarModel
+from apps.reservation.models import Reservation
+
+
+noon = datetime(2030, 1, 1, 12, tzinfo=timezone.utc)
+hour = timedelta(hours=1)
+
+
+@pytest.fixture
+def reservations(db) -> list[Reservation]:
+    make = CarMake.objects.create(name='Skoda', official_name='Skoda')
+    model = CarModel.objects.create(make=make, name='Octavia')
+    cars = [Car.objects.create(car_id=f'C{i}', registration_number=f'{i}AB 0000', model=model) for i in (1, 2)]
+    return [
+        Reservation.objects.create(
+            car=cars[i % 2], to_rent_at=noon + i * hour, to_return_at=noon + (i + 1) * hour,
+            request_id=uuid.UUID(int=i), client_name=f'client {i}',
+        )
+        for i in range(5)
+    ]
+
+
+def test__export__reservations_ndjson(reservations: list[Reservation], django_assert_num_queries):
+    with django_assert_num_queries(1):
+        # a single cursor read in chunks
+        lines = ''.join(export.export('reservations', export.NDJSON, chunk_size=2)).splitlines()
+
+    rows = [json.loads(line) for line in lines]
+    assert [row['client_name'] for row in rows] == [f'client {i}' for i in range(5)]
+    assert rows[1] == {
+        'id': reservations[1].id,
+        'request_id': str(uuid.UUID(int=1)),
+        'client_name': 'client 1',
+        'to_rent_at': '2030-01-01T13:00:00+00:00',
+        'to_return_at': '2030-01-01T14:00:00+00:00',
+        'car_id': 'C2',
+        'registration_number': '2AB 0000',
+        'model': 'Octavia',
+        'make': 'Skoda',
+    }
+
+
+def test__export__reservations_csv_within_time_range(reservations: list[Reservation]):
+    content = ''.join(export.export('reservations', export.CSV, start=noon + hour + hour / 2, end=noon + 3 * hour))
+
+    rows = list(csv.reader(io.StringIO(content)))
+    assert rows[0] == list(export.RESERVATION_COLUMNS)
+    # reservations overlapping the time range
+    assert [(row[2], row[3]) for row in rows[1:]] == [
+        ('client 1', '2030-01-01T13:00:00+00:00'),
+        ('client 2', '2030-01-01T14:00:00+00:00'),
+    ]
+
+
+def test__export__microseconds(reservations: list[Reservation]):
+    Reservation.objects.filter(pk=reservations[0].pk).update(to_rent_at=noon + timedelta(microseconds=123456))
+
+    columns = list(export.RESERVATION_COLUMNS)
+    ndjson_row = json.loads(next(export.render(export.reservations()[:1], columns, export.NDJSON)))
+    csv_row = list(csv.reader(export.render(export.reservations()[:1], columns, export.CSV)))[1]
+    assert ndjson_row['to_rent_at'] == csv_row[3] == '2030-01-01T12:00:00.123456+00:00'
+
+
+def test__export__chunks(reservations: list[Reservation]):
+    chunks = list(export.export('cars', export.CSV, chunk_size=2))
+    # header with the first car, the second car
+    assert [chunk.count('\n') for chunk in chunks] == [2, 1]
+    assert chunks[1].startswith('C2,2AB 0000,Octavia,Skoda,')
+
+
+@pytest.mark.parametrize('dataset, format', [('drivers', export.CSV), ('cars', 'xml')])
+def test__export__invalid(dataset: str, format: str):
+    with pytest.raises(ValueError):
+        export.export(dataset, format)
+
+
+def test__view__streamed(reservations: list[Reservation]):
+    request = RequestFactory().get('/export/reservations', {'format': 'csv', 'from': '2030-01-01T15:30:00Z'})
+    response = views.export(request, 'reservations')
+
+    assert response.status_code == 200
+    assert response.streaming
+    assert response['Content-Type'] == 'text/csv; charset=utf-8'
+    assert response['Content-Disposition'] == 'attachment; filename="reservations.csv"'
+    assert b''.join(response.streaming_content).decode().splitlines()[1].startswith(f'{reservations[3].id},')
+
+
+def test__view__streamed_asynchronously(reservations: list[Reservation]):
+    response = views.export(AsyncRequestFactory().get('/export/cars'), 'cars')
+    assert response.is_async
+
+    async def read():
+        return [chunk async for chunk in response.streaming_content]
+
+    assert [json.loads(line)['car_id'] for line in b''.join(async_to_sync(read)()).splitlines()] == ['C1', 'C2']
+
+
+@pytest.mark.parametrize('query, status', [
+    ({'format': 'xml'}, 400),
+    ({'from': 'yesterday'}, 400),
+])
+def test__view__bad_request(db, query: dict, status: int):
+    assert views.export(RequestFactory().get('/export/cars', query), 'cars').status_code == status
+
+
+def test__view__remote_request_forbidden(db):
+    assert views.export(RequestFactory().get('/export/cars', REMOTE_ADDR='10.0.0.1'), 'cars').status_code == 403
+
+
+def test__command__export(reservations: list[Reservation], tmp_path):
+    out = io.StringIO()
+    call_command('export', 'cars', '--format', 'csv', stdout=out)
+    assert out.getvalue().splitlines()[0] == 'car_id,registration_number,model,make,date_created'
+    assert len(out.getvalue().splitlines()) == 3
+
+    path = tmp_path / 'reservations.ndjson'
+    call_command('export', 'reservations', '--from', '2030-01-01T15:00:00', '--output', str(path))
+    assert [json.loads(line)['client_name'] for line in path.read_text().splitlines()] == ['client 3', 'client 4']
+
+    with pytest.raises(CommandError):
+        call_command('export', 'cars', '--to', 'tomorrow')
@@ -0,0 +1,37 @@
+import pytest
+
+from apps.api.graphql.loaders import Loaders
+from apps.carpool.models import Car, CarMake, CarModel
+
+
+@pytest.fixture
+def fleet(db) -> list[Car]:
+    cars = []
+    for make_name in ('Skoda', 'Toyota', 'Ford'):
+        make = CarMake.objects.create(name=make_name, official_name=make_name)
+        for model_name in ('A', 'B'):
+            model = CarModel.objects.create(make=make, name=model_name)
+            for i in range(2):
+                cars.append(Car.objects.create(
+                    car_id=f'C{len(cars) + 1}',
+                    registration_number=f'{len(cars) + 1}AB 0000',
+                    model=model,
+                ))
+    return cars
+
+
+def test__model_loader__batches_primed_keys(fleet: list[Car], django_assert_num_queries):
+    loaders = Loaders()
+    loaders.cars.prime_keys(car.pk for car in fleet)
+
+    with django_assert_num_queries(3):
+        makes = [loaders.make_of(loaders.cars.load(car.pk)) for car in fleet]
+    assert [make.name for make in makes] == [car.model.make.name for car in fleet]
+
+    with django_assert_num_queries(0):
+        assert loaders.cars.load(fleet[0].pk) is loaders.cars.load(fleet[0].pk)
+
+
+def test__model_loader__missing_key(db):
+    with pytest.raises(Car.DoesNotExist):
+        Loaders().cars.load(1)
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from apps.api.graphql.schema import schema
+from apps.carpool.models import Car, CarMake, CarModel
+from apps.reservation.models import Reservation
+
+
+noon = datetime(2030, 1, 1, 12, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def fleet(db) -> list[Car]:
+    cars = []
+    for make_name in ('Skoda', 'Toyota'):
+        make = CarMake.objects.create(name=make_name, official_name=f'{make_name} Ltd.')
+        for model_name in ('A', 'B'):
+            model = CarModel.objects.create(make=make, name=model_name)
+            cars.append(Car.objects.create(
+                car_id=f'C{len(cars) + 1}',
+                registration_number=f'{len(cars) + 1}AB 0000',
+                model=model,
+            ))
+    return cars
+
+
+def execute(query: str) -> tuple[dict, list[str]]:
+    with CaptureQueriesContext(connection) as queries:
+        result = schema.execute(query, context_value=RequestFactory().post('/gql'))
+    assert result.errors is None
+    return result.data, [query['sql'] for query in queries]
+
+
+def test__cars__only_selected_columns(fleet: list[Car]):
+    data, queries = execute('{ cars { carId } }')
+    assert data['cars'] == [{'carId': car.car_id} for car in fleet]
+    assert len(queries) == 1
+    assert '"car_id"' in queries[0]
+    assert 'registration_number' not in queries[0]
+    assert 'JOIN' not in queries[0]
+
+
+def test__cars__joins_make_and_model(fleet: list[Car]):
+    data, queries = execute('{ cars { ...car } } fragment car on Car { carId make model }')
+    assert data['cars'][-1] == {'carId': 'C4', 'make': 'Toyota', 'model': 'B'}
+    assert len(queries) == 1
+    assert queries[0].count('JOIN') == 2
+    assert 'official_name' not in queries[0]
+
+
+def test__reservations__joins_selected_relations(fleet: list[Car]):
+    for i, car in enumerate(fleet):
+        Reservation.objects.create(car=car, to_rent_at=noon, to_return_at=noon + timedelta(hours=i + 1))
+
+    data, queries = execute('''{
+        reservations {
+            totalCount
+            edges { node { toRentAt durationMinutes car { carId model } } }
+        }
+    }''')
+    assert data['reservations']['totalCount'] == len(fleet)
+    assert [edge['node']['durationMinutes'] for edge in data['reservations']['edges']] == [60, 120, 180, 240]
+    assert data['reservations']['edges'][0]['node']['toRentAt'] == noon.isoformat()
+    # page of reservations and their total count
+    assert len(queries) == 2
+    assert queries[0].count('JOIN') == 2
+    assert 'request_id' not in queries[0]
+    assert 'registration_number' not in queries[0]
+
+
+def test__reservations__count_only(fleet: list[Car]):
+    Reservation.objects.create(car=fleet[0], to_rent_at=noon, to_return_at=noon + timedelta(hours=1))
+
+    data, queries = execute('{ reservations { totalCount } }')
+    assert data['reservations']['totalCount'] == 1
+    assert len(queries) == 2
+    # only the keys of cursors are fetched for the page
+    assert 'to_return_at' not in queries[0]
+    assert 'request_id' not in queries[0]
+    assert queries[1].startswith('SELECT COUNT(*)')
@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.test import RequestFactory
+
+from apps.api.graphql.schema import schema
+from apps.carpool.models import Car, CarMake, CarModel
+from apps.reservation.models import Reservation
+
+
+noon = datetime(2030, 1, 1, 12, tzinfo=timezone.utc)
+hour = timedelta(hours=1)
+
+RESERVATIONS_PAGE = '''
+query ($first: Int, $after: String, $last: Int, $before: String) {
+    reservations(first: $first, after: $after, last: $last, before: $before) {
+        edges { cursor node { id toRentAt } }
+        pageInfo { hasNextPage hasPreviousPage startCursor endCursor }
+    }
+}
+'''
+
+
+@pytest.fixture
+def car(db) -> Car:
+    make = CarMake.objects.create(name='Skoda', official_name='Skoda')
+    return Car.objects.create(
+        car_id='C1',
+        registration_number='1AB 0000',
+        model=CarModel.objects.create(make=make, name='Octavia'),
+    )
+
+
+@pytest.fixture
+def reservations(car: Car) -> list[Reservation]:
+    # pairs of reservations starting at the same time are ordered by ID
+    return [
+        Reservation.objects.create(car=car, to_rent_at=noon + (i // 2) * hour, to_return_at=noon + 10 * hour)
+        for i in range(7)
+    ]
+
+
+def execute(query: str, **variables) -> dict:
+    result = schema.execute(query, variable_values=variables, context_value=RequestFactory().post('/gql'))
+    assert result.errors is None, result.errors
+    return result.data
+
+
+def ids(connection: dict) -> list[int]:
+    return [int(edge['node']['id']) for edge in connection['edges']]
+
+
+def test__reservations__forward_pages(reservations: list[Reservation]):
+    pages = []
+    after = None
+    while True:
+        connection = execute(RESERVATIONS_PAGE, first=3, after=after)['reservations']
+        pages.append(ids(connection))
+        if not connection['pageInfo']['hasNextPage']:
+            break
+        after = connection['pageInfo']['endCursor']
+        assert connection['edges'][-1]['cursor'] == after
+
+    assert pages == [[r.pk for r in reservations[i:i + 3]] for i in range(0, 7, 3)]
+
+
+def test__reservations__microsecond_pages(car: Car):
+    reservations = [
+        Reservation.objects.create(
+            car=car, to_rent_at=noon + timedelta(microseconds=123456 + i), to_return_at=noon + hour,
+        )
+        for i in range(3)
+    ]
+
+    pages = []
+    after = None
+    for _ in range(len(reservations)):
+        connection = execute(RESERVATIONS_PAGE, first=1, after=after)['reservations']
+        pages.append(ids(connection))
+        after = connection['pageInfo']['endCursor']
+
+    assert pages == [[r.pk] for r in reservations]
+    assert connection['pageInfo']['hasNextPage'] is False
+
+
+def test__reservations__backward_page(reservations: list[Reservation]):
+    last_page = execute(RESERVATIONS_PAGE, last=2)['reservations']
+    assert ids(last_page) == [reservations[5].pk, reservations[6].pk]
+    assert last_page['pageInfo']['hasPreviousPage'] is True
+
+    previous_page = execute(RESERVATIONS_PAGE, last=4, before=last_page['pageInfo']['startCursor'])['reservations']
+    assert ids(previous_page) == [r.pk for r in reservations[1:5]]
+    assert previous_page['pageInfo']['hasNextPage'] is True
+
+
+def test__reservations__invalid_cursor(reservations: list[Reservation]):
+    result = schema.execute(RESERVATIONS_PAGE, variable_values={'after': 'nonsense'})
+    assert result.errors[0].message == "invalid cursor 'nonsense'"
+
+
+def test__reservations__total_count(reservations: list[Reservation]):
+    data = execute('{ reservations(first: 1) { totalCount estimated: totalCount(estimate: true) } }')
+    assert data['reservations'] == {'totalCount': 7, 'estimated': 7}
+
+
+def test__cars_connection__descending_pages(car: Car):
+    for i in range(2, 6):
+        Car.objects.create(car_id=f'C{i}', registration_number=f'{i}AB 0000', model=car.model)
+
+    query = '''
+    query ($after: String) {
+        carsConnection(first: 2, after: $after, order: DESCENDING) {
+            totalCount
+            edges { node { carId make } }
+            pageInfo { hasNextPage endCursor }
+        }
+    }
+    '''
+    first_page = execute(query)['carsConnection']
+    assert first_page['totalCount'] == 5
+    assert [edge['node'] for edge in first_page['edges']] == [
+        {'carId': 'C5', 'make': 'Skoda'}, {'carId': 'C4', 'make': 'Skoda'},
+    ]
+
+    second_page = execute(query, after=first_page['pageInfo']['endCursor'])['carsConnection']
+    assert [edge['node']['carId'] for edge in second_page['edges']] == ['C3', 'C2']
+    assert second_page['pageInfo']['hasNextPage'] is True
@@ -0,0 +1,134 @@
+import json
+
+import pytest
+from django.test import RequestFactory
+
+from apps.api import metrics
+from apps.api.graphql import response_cache
+from apps.api.graphql.views import GraphQLView
+from apps.carpool import services as carpool
+from apps.carpool.models import Car
+
+
+CARS = 'query ($order: OrderDirection) { cars(order: $order) { carId registrationNumber } }'
+
+
+@pytest.fixture
+def shared(settings, tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, '_backend', None)
+    metrics.response_cache.reset()
+
+    settings.GRAPHQL_RESPONSE_CACHE = response_cache.BACKEND_SHARED
+    settings.GRAPHQL_RESPONSE_CACHE_ALIAS = 'graphql-responses'
+    settings.CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'graphql-responses': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(tmp_path / 'responses'),
+        },
+    }
+
+
+@pytest.fixture(params=[response_cache.BACKEND_IN_PROCESS, response_cache.BACKEND_SHARED])
+def backend(request, shared, settings):
+    settings.GRAPHQL_RESPONSE_CACHE = request.param
+
+
+@pytest.fixture
+def cars(db) -> list[Car]:
+    return [carpool.get_or_create_car('Skoda', 'Octavia', f'C{i}', f'{i}AB 0000') for i in (1, 2)]
+
+
+def post(query: str, variables: dict | None = None) -> dict:
+    request = RequestFactory().post(
+        '/gql',
+        data=json.dumps({'query': query, 'variables': variables or {}}),
+        content_type='application/json',
+    )
+    response = GraphQLView.as_view()(request)
+    return json.loads(response.content)
+
+
+def car_ids(body: dict) -> list[str]:
+    return [car['carId'] for car in body['data']['cars']]
+
+
+def test__response_cache__hit(backend, cars: list[Car], django_assert_num_queries):
+    body = post(CARS)
+    assert car_ids(body) == ['C1', 'C2']
+    assert body['extensions']['responseCache'] == 'miss'
+
+    with django_assert_num_queries(0):
+        cached = post(CARS)
+    assert cached['data'] == body['data']
+    assert cached['extensions']['responseCache'] == 'hit'
+
+    assert metrics.response_cache.values() == {('miss',): 1, ('hit',): 1}
+
+
+def test__response_cache__keyed_by_variables(backend, cars: list[Car]):
+    assert car_ids(post(CARS, {'order': 'ASCENDING'})) == ['C1', 'C2']
+    assert car_ids(post(CARS, {'order': 'DESCENDING'})) == ['C2', 'C1']
+    assert car_ids(post(CARS, {'order': 'DESCENDING'})) == ['C2', 'C1']
+
+    assert metrics.response_cache.values() == {('miss',): 2, ('hit',): 1}
+
+
+def test__response_cache__invalidated_by_carpool_services(
+        backend, cars: list[Car], django_capture_on_commit_callbacks,
+):
+    post(CARS)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        carpool.get_or_create_car('Skoda', 'Octavia', 'C3', '3AB 0000')
+    assert car_ids(post(CARS)) == ['C1', 'C2', 'C3']
+
+    # existing car does not change anything
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        carpool.get_or_create_car('Skoda', 'Octavia', 'C3', '3AB 0000')
+    assert not callbacks
+    assert post(CARS)['extensions']['responseCache'] == 'hit'
+
+    with django_capture_on_commit_callbacks(execute=True):
+        carpool.update_car('C1', registration_number='9ZZ 9999')
+    assert post(CARS)['data']['cars'][0] == {'carId': 'C1', 'registrationNumber': '9ZZ 9999'}
+
+    with django_capture_on_commit_callbacks(execute=True):
+        carpool.delete_car('C2')
+    assert car_ids(post(CARS)) == ['C1', 'C3']
+
+    assert metrics.response_cache.values() == {('miss',): 4, ('hit',): 1}
+
+
+def test__response_cache__not_committed_changes(backend, cars: list[Car], django_capture_on_commit_callbacks):
+    post(CARS)
+
+    # cached responses are invalidated only once the change is committed
+    with django_capture_on_commit_callbacks(execute=False):
+        carpool.delete_car('C2')
+    assert post(CARS)['extensions']['responseCache'] == 'hit'
+
+
+def test__response_cache__uncacheable_operations(backend, cars: list[Car]):
+    # reservations are not cached, so neither is the whole query
+    query = '{ cars { carId } reservations(first: 1) { edges { cursor } } }'
+    for _ in range(2):
+        assert 'responseCache' not in post(query)['extensions']
+
+    body = post('mutation { deleteCar(input: {carId: "C1"}) { payload { carId } } }')
+    assert 'responseCache' not in body['extensions']
+    assert metrics.response_cache.values() == {}
+
+
+def test__response_cache__disabled(settings, cars: list[Car]):
+    settings.GRAPHQL_RESPONSE_CACHE = None
+
+    assert 'responseCache' not in post(CARS)['extensions']
+
+
+def test__shared_backend__evicted_version(shared, cars: list[Car]):
+    post(CARS)
+    response_cache.backend()._cache.delete('graphql:version:carpool')
+
+    # the version restarts at a value never used before, so the stale response is unreachable
+    assert post(CARS)['extensions']['responseCache'] == 'miss'
@@ -0,0 +1,106 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory
+from structlog.testing import capture_logs
+
+from apps.api.graphql import documents, tracing
+from apps.api.graphql.views import AsyncGraphQLView, GraphQLView
+from apps.carpool.models import Car, CarMake, CarModel
+from apps.reservation.models import Reservation
+
+
+noon = datetime(2030, 1, 1, 12, tzinfo=timezone.utc)
+hour = timedelta(hours=1)
+
+QUERY = '{ reservations(first: 5) { totalCount edges { node { id car { carId make } } } } }'
+
+
+@pytest.fixture
+def reservations(db, settings) -> list[Reservation]:
+    settings.GRAPHQL_TRACING = True
+    documents.documents.clear()
+    make = CarMake.objects.create(name='Skoda', official_name='Skoda')
+    model = CarModel.objects.create(make=make, name='Octavia')
+    cars = [Car.objects.create(car_id=f'C{i}', registration_number=f'{i}AB 0000', model=model) for i in (1, 2)]
+    return [
+        Reservation.objects.create(car=cars[i % 2], to_rent_at=noon + i * hour, to_return_at=noon + (i + 1) * hour)
+        for i in range(3)
+    ]
+
+
+def post(query: str, view=GraphQLView) -> dict:
+    request = RequestFactory().post('/gql', data=json.dumps({'query': query}), content_type='application/json')
+    if view is AsyncGraphQLView:
+        response = async_to_sync(view.as_view())(request)
+    else:
+        response = view.as_view()(request)
+    return json.loads(response.content)
+
+
+def resolvers(trace: dict) -> dict[str, dict]:
+    return {resolver['path']: resolver for resolver in trace['resolvers']}
+
+
+@pytest.mark.parametrize('view', [GraphQLView, AsyncGraphQLView])
+def test__tracing__extension(reservations: list[Reservation], view):
+    trace = post(QUERY, view)['extensions']['tracing']
+
+    assert set(trace['phases']) == {'parse', 'validate', 'cost', 'execute'}
+    assert trace['duration'] >= trace['phases']['execute'] > 0
+
+    by_path = resolvers(trace)
+    assert by_path['reservations'] | {'duration': None, 'maxDuration': None, 'queriesDuration': None} == {
+        'path': 'reservations',
+        'parentType': 'Query',
+        'fieldName': 'reservations',
+        'returnType': 'ReservationConnection!',
+        'count': 1,
+        'duration': None,
+        'maxDuration': None,
+        # the page of reservations with their cars and makes (by the optimizer)
+        'queries': 1,
+        'queriesDuration': None,
+    }
+    # list items are aggregated
+    assert by_path['reservations.edges.*.node.car.make']['count'] == 3
+    assert by_path['reservations.totalCount']['queries'] == 1
+    assert trace['queries'] == 2
+    assert trace['queriesDuration'] > 0
+
+
+def test__tracing__cached_document(reservations: list[Reservation]):
+    post(QUERY)
+    # parsed and validated document is reused
+    assert set(post(QUERY)['extensions']['tracing']['phases']) == {'cost', 'execute'}
+
+
+def test__tracing__sampled(reservations: list[Reservation], settings, monkeypatch):
+    settings.GRAPHQL_TRACING_SAMPLE_RATE = 0.25
+
+    monkeypatch.setattr(tracing.random, 'random', lambda: 0.3)
+    assert 'tracing' not in post(QUERY)['extensions']
+    monkeypatch.setattr(tracing.random, 'random', lambda: 0.2)
+    assert 'tracing' in post(QUERY)['extensions']
+
+
+def test__tracing__logged(reservations: list[Reservation], settings):
+    settings.GRAPHQL_TRACING_LOG = True
+    settings.GRAPHQL_TRACING_EXTENSION = False
+
+    with capture_logs() as logs:
+        body = post('query Page { reservations(first: 1) { edges { cursor } } }')
+
+    assert 'tracing' not in body['extensions']
+    [entry] = [entry for entry in logs if entry['event'] == 'graphql_trace']
+    assert entry['operation_name'] == 'Page'
+    assert [resolver['path'] for resolver in entry['resolvers']] == [
+        'reservations', 'reservations.edges', 'reservations.edges.*.cursor',
+    ]
+
+
+def test__tracing__disabled(reservations: list[Reservation], settings):
+    settings.GRAPHQL_TRACING = False
+    assert 'tracing' not in post(QUERY)['extensions']
@@ -0,0 +1,21 @@
+from django.test import RequestFactory
+
+from apps.api import views
+from apps.reservation import metrics
+
+
+def test__metrics__local_request():
+    metrics.requests.inc(mode='optimistic', strategy='default', outcome='reserved')
+
+    response = views.metrics(RequestFactory().get('/metrics', REMOTE_ADDR='127.0.0.1'))
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+
+    body = response.content.decode()
+    assert '# TYPE reservation_requests_total counter' in body
+    assert 'reservation_requests_total{mode="optimistic",strategy="default",outcome="reserved"}' in body
+
+
+def test__metrics__remote_request_forbidden():
+    response = views.metrics(RequestFactory().get('/metrics', REMOTE_ADDR='10.0.0.1'))
+    assert response.status_code == 403
@@ -3,13 +3,23 @@
 
 from django.conf import settings
 from django.urls import path
-from graphene_django.views import GraphQLView
+from . import views
+from .graphql.views import AsyncGraphQLView, GraphQLView
 
 app_name = 'api'
 
 urlpatterns = [
-    # GraphQL
-    path('gql', GraphQLView.as_view(graphiql=False)),
+    # GraphQL (executed on the event loop if served by an ASGI server)
+    path('gql', (AsyncGraphQLView if getattr(settings, 'GRAPHQL_ASYNC', False) else GraphQLView).as_view()),
+
+    # streaming export (e.g. `export/reservations?format=csv&from=2030-01-01`)
+    path('export/<str:dataset>', views.export),
+
+    # server-sent events about reservations and cars
+    path('events', views.events),
+
+    # monitoring
+    path('metrics', views.metrics),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,142 @@
+"""Views of the API app other than the GraphQL end-point(s)."""
+
+import json
+import time
+from collections.abc import AsyncIterator, Iterator
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    StreamingHttpResponse,
+)
+from django.views.decorators.http import require_GET
+
+from libs.events import Event, Subscription, broker
+from libs.metrics import registry
+from . import export as exports
+
+
+def metrics(request: HttpRequest) -> HttpResponse:
+    """Expose in-process metrics in Prometheus text format to local scrapers only."""
+
+    allowed_addresses = getattr(settings, 'METRICS_ALLOWED_ADDRESSES', ['127.0.0.1', '::1'])
+    if request.META.get('REMOTE_ADDR') not in allowed_addresses:
+        return HttpResponseForbidden()
+
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+async def _async_chunks(chunks: Iterator[str]) -> AsyncIterator[str]:
+    # ASGI handler would read a synchronous iterator into memory at once, chunks are fetched one by one off the loop
+    fetch = sync_to_async(lambda: next(chunks, None), thread_sensitive=True)
+    while (chunk := await fetch()) is not None:
+        yield chunk
+
+
+@require_GET
+def export(request: HttpRequest, dataset: str) -> HttpResponse:
+    """Stream reservations or cars (optionally within the time range given by `from` and `to`) as NDJSON or CSV."""
+
+    allowed_addresses = getattr(settings, 'EXPORT_ALLOWED_ADDRESSES', ['127.0.0.1', '::1'])
+    if request.META.get('REMOTE_ADDR') not in allowed_addresses:
+        return HttpResponseForbidden()
+
+    format = request.GET.get('format', exports.NDJSON)
+    try:
+        chunks = exports.export(
+            dataset,
+            format,
+            start=exports.parse_moment(request.GET.get('from')),
+            end=exports.parse_moment(request.GET.get('to')),
+        )
+    except ValueError as ex:
+        return HttpResponseBadRequest(str(ex))
+
+    response = StreamingHttpResponse(
+        _async_chunks(chunks) if isinstance(request, ASGIRequest) else chunks,
+        content_type=exports.CONTENT_TYPES[format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{dataset}.{format}"'
+    return response
+
+
+def _server_sent_event(event: Event) -> str:
+    return f'id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event.data, cls=DjangoJSONEncoder)}\n\n'
+
+
+class _EventStream:
+    """Server-sent events of the subscription, the subscription is closed together with the response."""
+
+    def __init__(self, subscription: Subscription, heartbeat: float):
+        self.subscription = subscription
+        self.heartbeat = heartbeat
+
+    @staticmethod
+    def _chunk(events: list[Event]) -> str:
+        # comments keep the connection alive (and let the server find out about disconnected clients)
+        return ''.join(map(_server_sent_event, events)) or ':\n\n'
+
+    def close(self):
+        self.subscription.close()
+
+
+class _SyncEventStream(_EventStream):
+    """Stream of a synchronous (WSGI) server holding a worker thread, so it ends after the given time (clients of
+    server-sent events reconnect on their own).
+    """
+
+    def __init__(self, subscription: Subscription, heartbeat: float, max_duration: float):
+        super().__init__(subscription, heartbeat)
+        self.max_duration = max_duration
+
+    def __iter__(self) -> Iterator[str]:
+        deadline = time.monotonic() + self.max_duration
+        # the comment opening the stream
+        yield ':\n\n'
+        while (remaining := deadline - time.monotonic()) > 0:
+            yield self._chunk(self.subscription.get(min(self.heartbeat, remaining)))
+
+
+class _AsyncEventStream(_EventStream):
+    async def __aiter__(self) -> AsyncIterator[str]:
+        yield ':\n\n'
+        while True:
+            yield self._chunk(await self.subscription.aget(self.heartbeat))
+
+
+@require_GET
+def events(request: HttpRequest) -> HttpResponse:
+    """Stream events about reservations and cars (see `events.py` of the reservation and carpool apps) published by
+    this process as server-sent events to local subscribers only. Streams of a synchronous server are closed after
+    `EVENTS_SYNC_MAX_DURATION` seconds.
+    """
+
+    allowed_addresses = getattr(settings, 'EVENTS_ALLOWED_ADDRESSES', ['127.0.0.1', '::1'])
+    if request.META.get('REMOTE_ADDR') not in allowed_addresses:
+        return HttpResponseForbidden()
+
+    subscription = broker.subscribe(
+        max_size=getattr(settings, 'EVENTS_QUEUE_SIZE', 100),
+        max_subscribers=getattr(settings, 'EVENTS_MAX_SUBSCRIBERS', 100),
+    )
+    if subscription is None:
+        return HttpResponse('Too many subscribers.', status=503, headers={'Retry-After': '10'})
+
+    heartbeat = getattr(settings, 'EVENTS_HEARTBEAT', 15)
+    if isinstance(request, ASGIRequest):
+        stream = _AsyncEventStream(subscription, heartbeat=heartbeat)
+    else:
+        stream = _SyncEventStream(
+            subscription, heartbeat=heartbeat, max_duration=getattr(settings, 'EVENTS_SYNC_MAX_DURATION', 60),
+        )
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # proxies must not buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
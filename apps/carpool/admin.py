@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
 
+from apps.counters.paginators import CountersPaginator
 from .models import CarMake, CarModel, Car
 
 
@@ -25,6 +26,7 @@ class CarModelAdmin(admin.ModelAdmin):
 @admin.register(Car)
 class CarAdmin(admin.ModelAdmin):
     model = Car
+    paginator = CountersPaginator
 
     list_display = (
         'id', 'car_id', 'model', 'registration_number',
@@ -1,6 +1,10 @@
 import graphene as g
+from django.conf import settings
 
+from apps.api.graphql.blocking import blocking
 from apps.carpool import services as api
+from apps.carpool.errors import error_message
+from apps.carpool.models import Car
 from .types import CarType
 
 
@@ -21,6 +25,7 @@ class AddCarMutation(g.Mutation):
     payload = g.Field(CarType)
 
     @classmethod
+    @blocking
     def mutate(cls, root, info, input: AddCarInput):
         car = api.get_or_create_car(
             make=str(input.make),
@@ -45,6 +50,7 @@ class DeleteCarMutation(g.Mutation):
     payload = g.Field(CarType)
 
     @classmethod
+    @blocking
     def mutate(cls, root, info, input: DeleteCarInput):
         car = api.delete_car(input.car_id)
         return cls(payload=car)
@@ -67,6 +73,7 @@ class UpdateCarMutation(g.Mutation):
     payload = g.Field(CarType)
 
     @classmethod
+    @blocking
     def mutate(cls, root, info, input: UpdateCarInput):
         kwargs = {
             k: v
@@ -81,7 +88,41 @@ class UpdateCarMutation(g.Mutation):
         return cls(payload=car)
 
 
+class ImportCarsInput(g.InputObjectType):
+    cars = g.List(g.NonNull(AddCarInput), required=True)
+
+
+class ImportCarsResultType(g.ObjectType):
+    class Meta:
+        name = 'ImportCarsResult'
+
+    car = g.Field(CarType, required=False)
+    error = g.String(required=False)
+
+
+class ImportCarsMutation(g.Mutation):
+    class Meta:
+        name = 'ImportCarsPayload'
+
+    class Arguments:
+        input = ImportCarsInput(required=True)
+
+    payload = g.List(g.NonNull(ImportCarsResultType), required=True)
+
+    @classmethod
+    @blocking
+    def mutate(cls, root, info, input: ImportCarsInput):
+        results = api.import_cars(input.cars, chunk_size=getattr(settings, 'CARPOOL_IMPORT_CHUNK_SIZE', 1000))
+        return cls(payload=[
+            ImportCarsResultType(car=result)
+            if isinstance(result, Car) else
+            ImportCarsResultType(error=error_message(result))
+            for result in results
+        ])
+
+
 class Mutation(g.ObjectType):
     add_car = AddCarMutation.Field()
     delete_car = DeleteCarMutation.Field()
     update_car = UpdateCarMutation.Field()
+    import_cars = ImportCarsMutation.Field()
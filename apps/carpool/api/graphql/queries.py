@@ -1,20 +1,72 @@
 import graphene as g
 
+from apps.api.graphql.blocking import blocking
+from apps.api.graphql.cost import Cost
+from apps.api.graphql.loaders import loaders_for
+from apps.api.graphql.optimizer import optimize
+from apps.api.graphql.pagination import CountableConnection, keyset_connection
+from apps.api.graphql.response_cache import CARPOOL
 from apps.api.graphql.utils import OrderDirection
 from apps.carpool import services as api
 
 from .types import CarType
 
 
+class CarConnection(CountableConnection):
+    class Meta:
+        node = g.NonNull(CarType)
+
+    class CarEdge(g.ObjectType):
+        node = g.Field(CarType, required=True)
+        cursor = g.String(required=True)
+
+    edges = g.List(g.NonNull(CarEdge), required=True)
+
+    def resolve_edges(root, info):
+        loaders_for(info).prime_cars(edge.node for edge in root.edges)
+        return root.edges
+
+
 class Query(g.ObjectType):
+    cost_hints = {
+        # the whole fleet at once
+        'cars': Cost(size=1000),
+    }
+    response_cache_namespaces = {
+        'cars': CARPOOL,
+        'cars_connection': CARPOOL,
+    }
+
     cars = g.List(
         g.NonNull(CarType),
         required=True,
-        description='Simply query for getting all the cars at once. No pagination is currently possible.',
+        description='Simply query for getting all the cars at once.',
         order=OrderDirection(required=False),
+        deprecation_reason='Use `carsConnection` to get cars page by page.',
     )
 
     @staticmethod
+    @blocking
     def resolve_cars(root, info, order=None):
         ascending_order = order is None or order == OrderDirection.ASCENDING
-        return api.all_cars(ascending_order)
+        return loaders_for(info).prime_cars(optimize(api.all_cars(ascending_order), info))
+
+    cars_connection = g.ConnectionField(
+        CarConnection,
+        required=True,
+        description='Retrieve cars ordered by car ID, page by page.',
+        order=OrderDirection(required=False),
+    )
+
+    @staticmethod
+    @blocking
+    def resolve_cars_connection(root, info, order=None, **kwargs):
+        # car ID is unique, so it is a sufficient key of cursors (served by its unique index)
+        ordering = ('-car_id',) if order == OrderDirection.DESCENDING else ('car_id',)
+        return keyset_connection(
+            CarConnection,
+            optimize(api.all_cars(), info, required=('car_id',)),
+            ordering,
+            edge_type=CarConnection.CarEdge,
+            **kwargs,
+        )
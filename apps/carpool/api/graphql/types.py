@@ -1,6 +1,9 @@
 import graphene as g
 from graphene_django import DjangoObjectType
 
+from apps.api.graphql.blocking import blocking
+from apps.api.graphql.loaders import loaders_for
+from apps.api.graphql.optimizer import Hint
 from apps.carpool.models import Car
 
 
@@ -13,10 +16,17 @@ class CarType(DjangoObjectType):
     make = g.String(required=True)
     model = g.String(required=True)
 
+    optimizer_hints = {
+        'make': Hint(only=('model__make__name',), select_related=('model__make',)),
+        'model': Hint(only=('model__name',), select_related=('model',)),
+    }
+
     @staticmethod
+    @blocking(unless=lambda parent, info: loaders_for(info).cached_make_of(parent) is not None)
     def resolve_make(parent: Car, info) -> str:
-        return parent.model.make.name
+        return loaders_for(info).make_of(parent).name
 
     @staticmethod
+    @blocking(unless=lambda parent, info: loaders_for(info).cached_model_of(parent) is not None)
     def resolve_model(parent: Car, info) -> str:
-        return parent.model.name
+        return loaders_for(info).model_of(parent).name
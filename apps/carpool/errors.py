@@ -1,3 +1,6 @@
+from django.core.exceptions import ValidationError
+
+
 class CarpoolError(ValueError):
     """Base exception/error type for carpool app."""
 
@@ -31,3 +34,11 @@ class CarpoolInconsistentError(CarpoolError):
         self.expected = expected
         self.found = found
         super().__init__(message)
+
+
+def error_message(error: Exception) -> str:
+    """Human-readable message of an error (without the list formatting of validation errors)."""
+
+    if isinstance(error, ValidationError):
+        return '; '.join(error.messages)
+    return str(error)
@@ -0,0 +1,53 @@
+"""Events about cars of the fleet published (after commit) by the carpool services."""
+
+from collections.abc import Iterable
+
+from libs.events import broker, publish_on_commit
+from .models import Car
+
+
+CAR_ADDED = 'car.added'
+CAR_UPDATED = 'car.updated'
+CAR_DELETED = 'car.deleted'
+
+
+def _car(car: Car) -> dict:
+    return {
+        'car_id': car.car_id,
+        'registration_number': car.registration_number,
+        'model': car.model.name,
+        'make': car.model.make.name,
+    }
+
+
+def car_added(car: Car):
+    if broker.has_subscribers():
+        publish_on_commit(CAR_ADDED, _car(car))
+
+
+def cars_added(cars: Iterable[Car]):
+    if not broker.has_subscribers():
+        return
+
+    for car in cars:
+        publish_on_commit(CAR_ADDED, _car(car))
+
+
+def car_updated(car: Car):
+    if broker.has_subscribers():
+        publish_on_commit(CAR_UPDATED, _car(car))
+
+
+def reservations_of(car: Car) -> list[int] | None:
+    """Primary keys of reservations of the car about to be deleted (None if nobody would be told about them)."""
+
+    if broker.has_subscribers():
+        return list(car.reservations.values_list('pk', flat=True))
+    return None
+
+
+def car_deleted(car_id: str, reservation_ids: list[int] | None):
+    """Publish deletion of the car together with its reservations deleted by cascade."""
+
+    if reservation_ids is not None:
+        publish_on_commit(CAR_DELETED, {'car_id': car_id, 'reservation_ids': reservation_ids})
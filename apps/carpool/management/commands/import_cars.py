@@ -0,0 +1,87 @@
+import csv
+import json
+import sys
+from collections import deque
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.carpool import services
+from apps.carpool.errors import error_message
+from apps.carpool.models import Car
+
+
+NDJSON = 'ndjson'
+CSV = 'csv'
+
+
+def _ndjson_rows(file):
+    for line, text in enumerate(file, 1):
+        if not text.strip():
+            continue
+        try:
+            yield line, json.loads(text)
+        except ValueError:
+            # reported as an invalid row by the import
+            yield line, None
+
+
+def _csv_rows(file):
+    reader = csv.DictReader(file)
+    if missing := set(services.IMPORT_FIELDS) - set(reader.fieldnames or ()):
+        raise CommandError(f'missing columns: {", ".join(sorted(missing))}')
+    for row in reader:
+        yield reader.line_num, row
+
+
+class Command(BaseCommand):
+    help = 'Import cars (creating their makes and models on demand) from CSV or NDJSON, reporting rows not imported.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='file to read from, "-" for standard input')
+        parser.add_argument(
+            '--format', choices=(NDJSON, CSV), default=None,
+            help='format of the input, by the file extension by default (NDJSON for standard input)',
+        )
+        parser.add_argument('--chunk-size', type=int, default=None, help='number of rows inserted at once')
+
+    def handle(self, *args, input, format=None, chunk_size=None, **options):
+        if chunk_size is None:
+            chunk_size = getattr(settings, 'CARPOOL_IMPORT_CHUNK_SIZE', 1000)
+        if chunk_size <= 0:
+            raise CommandError('chunk size has to be positive')
+        if format is None:
+            format = CSV if input != '-' and Path(input).suffix.lower() == '.csv' else NDJSON
+
+        if input == '-':
+            self.import_cars(sys.stdin, format, chunk_size)
+            return
+
+        try:
+            with open(input, encoding='utf-8', newline='') as file:
+                self.import_cars(file, format, chunk_size)
+        except OSError as ex:
+            raise CommandError(str(ex))
+
+    def import_cars(self, file, format: str, chunk_size: int):
+        # line numbers of the rows whose results are still to come
+        lines = deque()
+
+        def rows():
+            for line, row in (_csv_rows if format == CSV else _ndjson_rows)(file):
+                lines.append(line)
+                yield row
+
+        imported = failed = 0
+        for result in services.import_cars(rows(), chunk_size=chunk_size):
+            line = lines.popleft()
+            if isinstance(result, Car):
+                imported += 1
+            else:
+                failed += 1
+                self.stderr.write(f'line {line}: {error_message(result)}')
+
+        self.stdout.write(f'{imported} cars imported, {failed} rows failed')
+        if failed:
+            raise CommandError(f'{failed} rows not imported')
@@ -1,11 +1,18 @@
+from collections.abc import Iterable, Iterator, Mapping
+from itertools import islice
+
 import structlog
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 from django.db.models import Q
 from django.utils.timezone import now
 
 from libs.models.abstract import date_updated
 from libs.text_utils import preprocess_for_comparison
-from .errors import CarpoolAlreadyExistsError, CarpoolInconsistentError, CarpoolNotFoundError
+from .errors import CarpoolAlreadyExistsError, CarpoolError, CarpoolInconsistentError, CarpoolNotFoundError
 from .models import CarMake, CarModel, Car
+from . import events
+from .signals import cars_bulk_created, notify_fleet_changed
 from .validators import validate_car_id
 
 
@@ -67,6 +74,23 @@ def get_or_create_car_model(
     )
 
 
+def _check_existing_car(car: Car, make: CarMake, model: CarModel, registration_number: str):
+    """Raise if the already existing car does not match the given attributes."""
+
+    if registration_number != car.registration_number:
+        raise CarpoolInconsistentError(
+            'wrong registration number',
+            expected=registration_number,
+            found=car.registration_number,
+        )
+
+    if model != car.model:
+        raise CarpoolInconsistentError('wrong model', expected=model, found=car.model)
+
+    if make != car.model.make:
+        raise CarpoolInconsistentError('wrong make', expected=make, found=car.model.make)
+
+
 def get_or_create_car(
         make: CarMake | str,
         model: CarModel | str,
@@ -90,27 +114,165 @@ def get_or_create_car(
             raise CarpoolAlreadyExistsError(car_id=car_id)
 
         car = qs.get()
-
-        if registration_number != car.registration_number:
-            raise CarpoolInconsistentError(
-                'wrong registration number',
-                expected=registration_number,
-                found=car.registration_number,
-            )
-
-        if model != car.model:
-            raise CarpoolInconsistentError('wrong model', expected=model, found=car.model)
-
-        if make != car.model.make:
-            raise CarpoolInconsistentError('wrong make', expected=make, found=car.model.make)
-
+        _check_existing_car(car, make, model, registration_number)
         return car
 
-    return Car.objects.create(
+    car = Car.objects.create(
         model=model,
         car_id=car_id,
         registration_number=registration_number,
     )
+    notify_fleet_changed()
+    events.car_added(car)
+    return car
+
+
+IMPORT_FIELDS = ('make', 'model', 'car_id', 'registration_number')
+# model field of every imported column, values are validated by them before anything is written
+_IMPORT_MODEL_FIELDS = {
+    'make': CarMake._meta.get_field('name'),
+    'model': CarModel._meta.get_field('name'),
+    'car_id': Car._meta.get_field('car_id'),
+    'registration_number': Car._meta.get_field('registration_number'),
+}
+
+
+class _Catalog:
+    """Makes and models (loaded at once) looked up by their names preprocessed for comparison, missing ones are
+    created on demand.
+    """
+
+    def __init__(self):
+        self.makes: dict[str, CarMake] = {}
+        makes_by_pk = {}
+        for make in CarMake.objects.order_by('pk'):
+            self.makes.setdefault(preprocess_for_comparison(make.name), make)
+            makes_by_pk[make.pk] = make
+
+        self.models: dict[tuple[int, str], CarModel] = {}
+        for model in CarModel.objects.order_by('pk'):
+            model.make = makes_by_pk[model.make_id]
+            self.models.setdefault((model.make_id, preprocess_for_comparison(model.name)), model)
+
+    def model(self, make_name: str, model_name: str) -> CarModel:
+        key = preprocess_for_comparison(make_name)
+        if (make := self.makes.get(key)) is None:
+            make = self.makes[key] = CarMake.objects.create(name=make_name, official_name=make_name)
+
+        key = (make.pk, preprocess_for_comparison(model_name))
+        if (model := self.models.get(key)) is None:
+            model = self.models[key] = CarModel.objects.create(make=make, name=model_name)
+        return model
+
+
+def _import_row(row: Mapping[str, str] | None) -> tuple[str, str, str, str]:
+    if not isinstance(row, Mapping):
+        raise ValueError('invalid row')
+
+    values = tuple(str(row.get(name) or '').strip() for name in IMPORT_FIELDS)
+    if missing := [name for name, value in zip(IMPORT_FIELDS, values) if not value]:
+        raise ValueError(f'missing {", ".join(missing)}')
+
+    # e.g. too long values would fail the whole chunk in DB
+    errors = []
+    for name, value in zip(IMPORT_FIELDS, values):
+        try:
+            _IMPORT_MODEL_FIELDS[name].run_validators(value)
+        except ValidationError as ex:
+            errors.extend(ex.error_list)
+    if errors:
+        raise ValidationError(errors)
+    return values
+
+
+def _insert_one_by_one(cars: list[Car]) -> list[Car | CarpoolError]:
+    results = []
+    for car in cars:
+        car.pk = None
+        try:
+            with transaction.atomic():
+                car.save(force_insert=True)
+        except IntegrityError:
+            results.append(CarpoolAlreadyExistsError(car_id=car.car_id))
+        else:
+            events.car_added(car)
+            results.append(car)
+    return results
+
+
+def _import_chunk(rows: list, catalog: _Catalog, seen: set[str]) -> tuple[list[Car | Exception], int]:
+    results: list[Car | Exception] = []
+    for row in rows:
+        try:
+            make_name, model_name, car_id, registration_number = _import_row(row)
+            if car_id in seen:
+                raise CarpoolAlreadyExistsError(car_id=car_id)
+            seen.add(car_id)
+            model = catalog.model(make_name, model_name)
+        except (ValidationError, ValueError) as ex:
+            results.append(ex)
+            continue
+        results.append(Car(model=model, car_id=car_id, registration_number=registration_number))
+
+    # row index of every car not inserted yet
+    new = {result.car_id: i for i, result in enumerate(results) if isinstance(result, Car)}
+    for car in Car.objects.filter(car_id__in=list(new)).select_related('model__make'):
+        i = new.pop(car.car_id)
+        try:
+            _check_existing_car(car, results[i].model.make, results[i].model, results[i].registration_number)
+        except CarpoolInconsistentError as ex:
+            results[i] = ex
+        else:
+            results[i] = car
+
+    cars = [results[i] for i in new.values()]
+    if not cars:
+        return results, 0
+
+    try:
+        with transaction.atomic():
+            Car.objects.bulk_create(cars)
+    except IntegrityError:
+        # some of the cars have been inserted concurrently in the meanwhile
+        for i, result in zip(new.values(), _insert_one_by_one(cars)):
+            results[i] = result
+        inserted = sum(isinstance(results[i], Car) for i in new.values())
+    else:
+        # bulk insert does not send any signal
+        cars_bulk_created.send(sender=Car, cars=cars)
+        events.cars_added(cars)
+        inserted = len(cars)
+
+    if inserted:
+        notify_fleet_changed()
+    return results, inserted
+
+
+def import_cars(rows: Iterable[Mapping[str, str] | None], chunk_size: int = 1000) -> Iterator[Car | Exception]:
+    """Import cars given by rows (mappings of make, model, car_id and registration_number) read and inserted by chunks
+    of the given size. Result of every row is yielded in the order of rows: either the car (already existing one if it
+    matches the row) or the error of the row (`ValidationError`, `ValueError` or `CarpoolError`), so invalid rows do
+    not abort the import. Makes and models are looked up in memory by names preprocessed for comparison.
+    """
+
+    if chunk_size <= 0:
+        raise ValueError('chunk size has to be positive')
+
+    _log = log.bind(chunk_size=chunk_size)
+    _log.info('requested cars import', ts=now())
+
+    catalog = _Catalog()
+    seen: set[str] = set()
+    count = inserted = errors = 0
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        results, chunk_inserted = _import_chunk(chunk, catalog, seen)
+        count += len(results)
+        inserted += chunk_inserted
+        errors += sum(not isinstance(result, Car) for result in results)
+        yield from results
+
+    _log.info('cars imported', count=count, inserted=inserted, errors=errors, ts=now())
 
 
 def all_cars(ascending_order: bool = True):
@@ -144,7 +306,10 @@ def delete_car(car_id: str) -> Car:
         _log.error('not found car for deletion')
         raise
 
+    reservation_ids = events.reservations_of(car)
     car.delete()
+    notify_fleet_changed()
+    events.car_deleted(car_id, reservation_ids)
     _log.info('successfully deleted car', ts=now())
 
     car.pk = None
@@ -182,5 +347,8 @@ def update_car(
 
     attrs_to_update.append(date_updated)
     car.save(update_fields=attrs_to_update)
+    notify_fleet_changed()
 
-    return _get_car_by_car_id(car_id)
+    car = _get_car_by_car_id(car_id)
+    events.car_updated(car)
+    return car
@@ -0,0 +1,16 @@
+"""Signals of the carpool app."""
+
+from django.db import transaction
+from django.dispatch import Signal
+
+
+# sent (after commit) whenever the carpool services change cars of the fleet
+fleet_changed = Signal()
+
+
+def notify_fleet_changed():
+    transaction.on_commit(lambda: fleet_changed.send(sender=None))
+
+# sent (right after inserting) by the carpool services with `cars` inserted by `bulk_create` (that sends no
+# `post_save` signals), so in-memory structures and counters can be kept in sync
+cars_bulk_created = Signal()
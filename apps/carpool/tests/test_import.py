@@ -0,0 +1,155 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError
+
+from apps.api.graphql.schema import schema
+from apps.carpool import services as api
+from apps.carpool.errors import CarpoolAlreadyExistsError, CarpoolInconsistentError
+from apps.carpool.models import CarMake, CarModel, Car
+from apps.counters import services as counters
+from apps.reservation import utilization
+
+
+def row(car_id: str, make: str = 'Skoda', model: str = 'Octavia', registration_number: str = '1AB 0000') -> dict:
+    return {'make': make, 'model': model, 'car_id': car_id, 'registration_number': registration_number}
+
+
+@pytest.fixture
+def car_C1(db) -> Car:
+    make = CarMake.objects.create(name='Škoda', official_name='Škoda Auto a.s.')
+    model = CarModel.objects.create(make=make, name='Octavia')
+    return Car.objects.create(car_id='C1', registration_number='1AB 0000', model=model)
+
+
+def test__import_cars__makes_and_models_resolved_once(car_C1: Car, django_assert_num_queries):
+    rows = [row(f'C{i}', make=make, model=model) for i, (make, model) in enumerate([
+        ('skoda', 'OCTAVIA'), ('Škoda ', 'Fabia'), ('VW', 'Golf'), ('vw', 'golf'), ('SKODA', 'fabia'),
+    ], 2)]
+
+    # makes and models loaded, VW, Golf and Fabia created, existing cars looked up and cars inserted (in a savepoint)
+    with django_assert_num_queries(2 + 3 + 1 + 3):
+        results = list(api.import_cars(rows))
+
+    assert [car.car_id for car in results] == ['C2', 'C3', 'C4', 'C5', 'C6']
+    assert [str(car.model) for car in results] == [
+        'Škoda Octavia', 'Škoda Fabia', 'VW Golf', 'VW Golf', 'Škoda Fabia',
+    ]
+    assert all(car.pk for car in results)
+    assert CarMake.objects.count() == 2
+    assert CarModel.objects.count() == 3
+    assert Car.objects.count() == 6
+
+
+def test__import_cars__row_errors(car_C1: Car):
+    car_C9 = Car.objects.create(car_id='C9', registration_number='9AB 0000', model=car_C1.model)
+    results = list(api.import_cars([
+        row('C2'),
+        row('X3'),
+        {'make': 'Skoda', 'car_id': 'C4'},
+        None,
+        row('C2'),
+        row('C1', registration_number='9ZZ 9999'),
+        row('C9', make='skoda', registration_number='9AB 0000'),
+        row('C5', make='VW'),
+        row('C6', registration_number='6AB 00000'),
+        row('C7', model='O' * 51),
+    ], chunk_size=3))
+
+    assert [type(result) for result in results] == [
+        Car, ValidationError, ValueError, ValueError, CarpoolAlreadyExistsError, CarpoolInconsistentError, Car, Car,
+        ValidationError, ValidationError,
+    ]
+    assert str(results[2]) == 'missing model, registration_number'
+    # too long values are reported before anything is written
+    assert [error.code for error in results[8].error_list] == ['max_length']
+    assert not CarModel.objects.filter(name__startswith='OOO').exists()
+    assert str(results[3]) == 'invalid row'
+    # already existing car matching its row
+    assert results[6] == car_C9
+    assert sorted(Car.objects.values_list('car_id', flat=True)) == ['C1', 'C2', 'C5', 'C9']
+
+
+def test__import_cars__kept_in_sync(db, settings, monkeypatch, django_capture_on_commit_callbacks):
+    settings.COUNTERS = True
+    added = []
+    monkeypatch.setattr(utilization.MatrixCache, 'active', True)
+    monkeypatch.setattr(utilization.matrices, 'add_car', added.append)
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        cars = list(api.import_cars([row(f'C{i}') for i in range(1, 6)], chunk_size=2))
+
+    # bulk insert sends no `post_save` signals
+    assert counters.car_count() == 5
+    assert added == [car.pk for car in cars]
+    # cached responses invalidated once per chunk (besides matrices updated per car)
+    assert len(callbacks) == 3 + 5
+
+
+def test__import_cars__inserted_concurrently(car_C1: Car, settings, monkeypatch):
+    settings.COUNTERS = True
+    counters.rebuild()
+
+    def bulk_create(cars, *args, **kwargs):
+        raise IntegrityError('UNIQUE constraint failed: carpool_car.car_id')
+
+    # C1 inserted after existing cars were looked up
+    monkeypatch.setattr(Car.objects, 'filter', lambda *args, **kwargs: Car.objects.none())
+    monkeypatch.setattr(Car.objects, 'bulk_create', bulk_create)
+    results = list(api.import_cars([row('C1'), row('C2'), row('C3')]))
+
+    # inserted one by one instead
+    assert [type(result) for result in results] == [CarpoolAlreadyExistsError, Car, Car]
+    assert counters.car_count() == Car.objects.count() == 3
+
+
+def test__import_cars__command(db, tmp_path):
+    path = tmp_path / 'cars.csv'
+    path.write_text(
+        'car_id,make,model,registration_number\n'
+        'C1,Skoda,Octavia,1AB 0000\n'
+        'C2,Skoda,Octavia,\n'
+        'C3,VW,Golf,3AB 0000\n'
+    )
+    stdout, stderr = StringIO(), StringIO()
+
+    with pytest.raises(CommandError, match='1 rows not imported'):
+        call_command('import_cars', str(path), '--chunk-size', '2', stdout=stdout, stderr=stderr)
+
+    assert stdout.getvalue() == '2 cars imported, 1 rows failed\n'
+    assert stderr.getvalue() == 'line 3: missing registration_number\n'
+    assert sorted(Car.objects.values_list('car_id', flat=True)) == ['C1', 'C3']
+
+    path = tmp_path / 'cars.ndjson'
+    path.write_text('\n'.join([json.dumps(row('C4')), '', '{"car_id": ', json.dumps(row('C1'))]) + '\n')
+    stderr = StringIO()
+
+    with pytest.raises(CommandError):
+        call_command('import_cars', str(path), stdout=StringIO(), stderr=stderr)
+    assert stderr.getvalue() == 'line 3: invalid row\n'
+    assert Car.objects.count() == 3
+
+
+def test__import_cars__mutation(car_C1: Car):
+    result = schema.execute(
+        '''
+        mutation ($input: ImportCarsInput!) {
+            importCars(input: $input) { payload { error car { carId make model } } }
+        }
+        ''',
+        variable_values={'input': {'cars': [
+            {'make': 'skoda', 'model': 'Fabia', 'carId': 'C2', 'registrationNumber': '2AB 0000'},
+            {'make': 'Skoda', 'model': 'Octavia', 'carId': 'C1', 'registrationNumber': '9ZZ 9999'},
+            {'make': 'Skoda', 'model': 'Octavia', 'carId': 'C-3', 'registrationNumber': '3AB 0000'},
+        ]}},
+    )
+
+    assert result.errors is None
+    assert result.data['importCars']['payload'] == [
+        {'error': None, 'car': {'carId': 'C2', 'make': 'Škoda', 'model': 'Fabia'}},
+        {'error': 'wrong registration number', 'car': None},
+        {'error': 'invalid car id (C-3)', 'car': None},
+    ]
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.translation import gettext_lazy as _
+
+
+class CountersConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.counters'
+    verbose_name = _('counters')
+
+    def ready(self):
+        from . import signals  # noqa: F401
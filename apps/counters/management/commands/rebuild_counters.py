@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from apps.counters import services
+
+
+class Command(BaseCommand):
+    help = 'Recompute counters of cars and reservations from scratch (meant to be run while writes are paused).'
+
+    def handle(self, *args, **options):
+        rebuilt = services.rebuild()
+        self.stdout.write(
+            f'{rebuilt["cars"]} cars and {rebuilt["reservations"]} reservations '
+            f'(of {rebuilt["cars_with_reservations"]} cars) counted'
+        )
+        if not services.is_enabled():
+            self.stdout.write('counters are disabled by the COUNTERS setting, they are not maintained')
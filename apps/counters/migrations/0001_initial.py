@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('date_updated', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(help_text='Name of the counted quantity (e.g. number of all reservations or reservations of a car).', max_length=100, verbose_name='counter name')),
+                ('shard', models.PositiveSmallIntegerField(default=0, help_text='Part of the counter (concurrent updates of a frequently updated counter are spread among parts).', verbose_name='shard')),
+                ('value', models.BigIntegerField(default=0, help_text='Value of the counter part (the counter is the sum of all its parts).', verbose_name='value')),
+            ],
+            options={
+                'verbose_name': 'counter',
+                'verbose_name_plural': 'counters',
+                'constraints': [models.UniqueConstraint(fields=('name', 'shard'), name='counter_name_shard_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import models as m
+from django.utils.translation import gettext_lazy as _
+
+from libs.models import BaseModel
+
+
+class Counter(BaseModel):
+    name = m.CharField(
+        null=False,
+        max_length=100,
+        verbose_name=_('counter name'),
+        help_text=_('Name of the counted quantity (e.g. number of all reservations or reservations of a car).'),
+    )
+
+    shard = m.PositiveSmallIntegerField(
+        null=False,
+        default=0,
+        verbose_name=_('shard'),
+        help_text=_('Part of the counter (concurrent updates of a frequently updated counter are spread among parts).'),
+    )
+
+    value = m.BigIntegerField(
+        null=False,
+        default=0,
+        verbose_name=_('value'),
+        help_text=_('Value of the counter part (the counter is the sum of all its parts).'),
+    )
+
+    class Meta:
+        verbose_name = _('counter')
+        verbose_name_plural = _('counters')
+        constraints = [
+            m.UniqueConstraint(fields=['name', 'shard'], name='counter_name_shard_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.name}#{self.shard}={self.value}'
@@ -0,0 +1,14 @@
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+from . import services
+
+
+class CountersPaginator(Paginator):
+    """Paginator taking the total count from the maintained counters if they know it (falling back to `COUNT(*)`)."""
+
+    @cached_property
+    def count(self) -> int:
+        if (count := services.count(self.object_list)) is not None:
+            return count
+        return super().count
@@ -0,0 +1,150 @@
+"""Maintained counters of cars and reservations (global and per car), so that totals need no `COUNT(*)` scans.
+
+Counters are updated on creation and deletion of cars and reservations when the `COUNTERS` setting is enabled.
+Global counters are split into `COUNTERS_SHARDS` rows updated at random, so that concurrent writers do not queue
+on a single hot row; readers sum the shards. Updates are statements of their own (not bound to the transaction of
+the counted change if there is none), hence counters can drift after crashes or writes bypassing the services and
+model signals (e.g. raw SQL or `bulk_create`) -- the `rebuild_counters` management command recomputes them.
+"""
+
+import random
+from collections import Counter as Tally
+from collections.abc import Iterable
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, QuerySet, Sum
+from django.db.models.lookups import Exact
+from django.utils.timezone import now
+
+from apps.carpool.models import Car
+from apps.reservation.models import Reservation
+from .models import Counter
+
+
+CARS = 'cars'
+RESERVATIONS = 'reservations'
+
+
+def is_enabled() -> bool:
+    return getattr(settings, 'COUNTERS', False)
+
+
+def _shards() -> int:
+    return max(getattr(settings, 'COUNTERS_SHARDS', 8), 1)
+
+
+def car_reservations(car_pk: int) -> str:
+    """Name of the counter of reservations of a single car."""
+
+    return f'{RESERVATIONS}:car:{car_pk}'
+
+
+def add(name: str, delta: int, shard: int = 0):
+    """Atomically add `delta` to the given part of the counter (created on demand)."""
+
+    if not delta:
+        return
+
+    qs = Counter.objects.filter(name=name, shard=shard)
+    if qs.update(value=F('value') + delta, date_updated=now()):
+        return
+
+    try:
+        with transaction.atomic():
+            Counter.objects.create(name=name, shard=shard, value=delta)
+    except IntegrityError:
+        # created by a concurrent writer in the meanwhile
+        qs.update(value=F('value') + delta, date_updated=now())
+
+
+def add_sharded(name: str, delta: int):
+    add(name, delta, shard=random.randrange(_shards()))
+
+
+def value(name: str) -> int:
+    """Value of the counter (sum of all its parts)."""
+
+    return Counter.objects.filter(name=name).aggregate(total=Sum('value'))['total'] or 0
+
+
+def car_count() -> int:
+    return value(CARS)
+
+
+def reservation_count(car_pk: int | None = None) -> int:
+    return value(RESERVATIONS if car_pk is None else car_reservations(car_pk))
+
+
+def cars_created(count: int = 1):
+    add_sharded(CARS, count)
+
+
+def car_deleted(car_pk: int):
+    add_sharded(CARS, -1)
+    Counter.objects.filter(name=car_reservations(car_pk)).delete()
+
+
+def reservations_created(reservations: Iterable[Reservation]):
+    per_car = Tally(reservation.car_id for reservation in reservations)
+    for car_pk, count in sorted(per_car.items()):
+        add(car_reservations(car_pk), count)
+    add_sharded(RESERVATIONS, sum(per_car.values()))
+
+
+def reservation_deleted(reservation: Reservation):
+    add(car_reservations(reservation.car_id), -1)
+    add_sharded(RESERVATIONS, -1)
+
+
+def _filtered_car(queryset: QuerySet) -> int | None:
+    """Primary key of the car if the queryset of reservations is filtered just by a single car."""
+
+    where = queryset.query.where
+    if len(where.children) != 1 or where.negated:
+        return None
+
+    lookup = where.children[0]
+    if (
+        isinstance(lookup, Exact)
+        and getattr(lookup.lhs, 'target', None) == Reservation._meta.get_field('car')
+        and isinstance(lookup.rhs, int)
+    ):
+        return lookup.rhs
+    return None
+
+
+def count(queryset: QuerySet) -> int | None:
+    """Maintained count of all the rows of the queryset if it is a queryset of all the cars, all the reservations
+    or all the reservations of a single car. None if the count is not maintained (or counters are disabled).
+    """
+
+    query = queryset.query
+    if not is_enabled() or query.is_sliced or query.distinct or query.combinator:
+        return None
+
+    if queryset.model is Car and not query.where:
+        return car_count()
+    if queryset.model is Reservation:
+        if not query.where:
+            return reservation_count()
+        if (car_pk := _filtered_car(queryset)) is not None:
+            return reservation_count(car_pk)
+    return None
+
+
+def rebuild() -> dict[str, int]:
+    """Recompute all the counters from scratch. Changes made concurrently may be missed, hence it is meant to be run
+    while writes are paused (e.g. after enabling the counters or after bulk inserts).
+    """
+
+    with transaction.atomic():
+        Counter.objects.all().delete()
+
+        per_car = dict(Reservation.objects.order_by().values_list('car').annotate(count=Count('pk')))
+        counters = [Counter(name=CARS, value=Car.objects.count())]
+        counters.append(Counter(name=RESERVATIONS, value=sum(per_car.values())))
+        counters.extend(Counter(name=car_reservations(car_pk), value=count) for car_pk, count in per_car.items())
+        Counter.objects.bulk_create(counters, batch_size=5000)
+
+    return {'cars': counters[0].value, 'reservations': counters[1].value, 'cars_with_reservations': len(per_car)}
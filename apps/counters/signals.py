@@ -0,0 +1,43 @@
+"""Signal receivers keeping the counters in sync with cars and reservations created and deleted one by one.
+
+Cascade deletes (of reservations of a deleted car) send the signals too, reservations inserted by `bulk_create`
+are counted by the services inserting them and cars inserted by `bulk_create` are announced by `cars_bulk_created`.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.carpool.models import Car
+from apps.carpool.signals import cars_bulk_created
+from apps.reservation.models import Reservation
+from . import services
+
+
+@receiver(post_save, sender=Reservation)
+def _reservation_saved(sender, instance: Reservation, created: bool, **kwargs):
+    if created and services.is_enabled():
+        services.reservations_created([instance])
+
+
+@receiver(post_delete, sender=Reservation)
+def _reservation_deleted(sender, instance: Reservation, **kwargs):
+    if services.is_enabled():
+        services.reservation_deleted(instance)
+
+
+@receiver(post_save, sender=Car)
+def _car_saved(sender, instance: Car, created: bool, **kwargs):
+    if created and services.is_enabled():
+        services.cars_created()
+
+
+@receiver(cars_bulk_created)
+def _cars_bulk_created(sender, cars: list[Car], **kwargs):
+    if services.is_enabled():
+        services.cars_created(len(cars))
+
+
+@receiver(post_delete, sender=Car)
+def _car_deleted(sender, instance: Car, **kwargs):
+    if services.is_enabled():
+        services.car_deleted(instance.pk)
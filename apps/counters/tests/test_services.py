@@ -0,0 +1,133 @@
+import io
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.contrib.admin.sites import site
+from django.core.management import call_command
+from django.test import RequestFactory
+
+from apps.api.graphql.schema import schema
+from apps.carpool import services as carpool
+from apps.carpool.models import Car
+from apps.counters import services as counters
+from apps.counters.models import Counter
+from apps.counters.paginators import CountersPaginator
+from apps.reservation import services as reservation
+from apps.reservation.models import Reservation
+
+
+noon = datetime(2030, 1, 1, 12, tzinfo=timezone.utc)
+hour = timedelta(hours=1)
+
+
+@pytest.fixture
+def enabled(settings):
+    settings.COUNTERS = True
+    settings.COUNTERS_SHARDS = 4
+
+
+@pytest.fixture
+def cars(db, enabled) -> list[Car]:
+    return [carpool.get_or_create_car('Skoda', 'Octavia', f'C{i}', f'{i}AB 0000') for i in range(1, 4)]
+
+
+def assert_consistent():
+    assert counters.car_count() == Car.objects.count()
+    assert counters.reservation_count() == Reservation.objects.count()
+    for car in Car.objects.all():
+        assert counters.reservation_count(car.pk) == car.reservations.count()
+
+
+def test__counters__maintained_by_services(cars: list[Car]):
+    assert counters.car_count() == 3
+
+    for i in range(5):
+        reservation.make_reservation(request_id=uuid.uuid4(), to_rent_at=noon + i * hour, duration=2 * hour)
+    results = reservation.make_reservations([(uuid.uuid4(), noon + 10 * hour, hour) for _ in range(4)])
+    assert sum(isinstance(result, Reservation) for result in results) == 3
+    assert_consistent()
+    assert counters.reservation_count() == 8
+
+    # reservations of the car are deleted by cascade
+    carpool.delete_car('C1')
+    assert_consistent()
+    assert not Counter.objects.filter(name=counters.car_reservations(cars[0].pk)).exists()
+
+    reservation.fetch_reservations().first().delete()
+    assert_consistent()
+
+
+def test__counters__sharded(cars: list[Car]):
+    for i in range(20):
+        carpool.get_or_create_car('Skoda', 'Octavia', f'C{10 + i}', f'{i}XY 0000')
+
+    assert counters.car_count() == 23
+    assert set(Counter.objects.filter(name=counters.CARS).values_list('shard', flat=True)) <= {0, 1, 2, 3}
+
+
+def test__counters__disabled(db, settings):
+    settings.COUNTERS = False
+    carpool.get_or_create_car('Skoda', 'Octavia', 'C1', '1AB 0000')
+
+    assert not Counter.objects.exists()
+    assert counters.count(Car.objects.all()) is None
+
+
+def test__count__querysets(cars: list[Car], django_assert_num_queries):
+    Reservation.objects.create(car=cars[0], to_rent_at=noon, to_return_at=noon + hour)
+    Reservation.objects.create(car=cars[0], to_rent_at=noon + hour, to_return_at=noon + 2 * hour)
+
+    with django_assert_num_queries(1):
+        assert counters.count(Reservation.objects.order_by('-pk')) == 2
+    assert counters.count(Car.objects.all()) == 3
+    assert counters.count(Reservation.objects.filter(car=cars[0])) == 2
+    assert counters.count(Reservation.objects.filter(car__id__exact=str(cars[1].pk))) == 0
+
+    # not maintained
+    assert counters.count(Reservation.objects.filter(to_rent_at__gte=noon)) is None
+    assert counters.count(Reservation.objects.filter(car=cars[0], to_rent_at__gte=noon)) is None
+    assert counters.count(Reservation.objects.exclude(car=cars[0])) is None
+    assert counters.count(Car.objects.filter(car_id='C1')) is None
+    assert counters.count(Car.objects.all()[:1]) is None
+
+
+def test__rebuild(cars: list[Car]):
+    Reservation.objects.bulk_create([
+        Reservation(car=cars[1], to_rent_at=noon + i * hour, to_return_at=noon + (i + 1) * hour) for i in range(3)
+    ])
+    Counter.objects.filter(name=counters.CARS).update(value=42)
+    assert counters.reservation_count() == 0
+
+    out = io.StringIO()
+    call_command('rebuild_counters', stdout=out)
+    assert out.getvalue().startswith('3 cars and 3 reservations (of 1 cars) counted')
+
+    assert_consistent()
+    assert counters.reservation_count() == 3
+
+
+def test__paginator(cars: list[Car], django_assert_num_queries):
+    Counter.objects.filter(name=counters.CARS).delete()
+    counters.add(counters.CARS, 1000)
+
+    with django_assert_num_queries(1):
+        assert CountersPaginator(Car.objects.order_by('pk'), 10).num_pages == 100
+    assert CountersPaginator(Car.objects.filter(car_id='C1').order_by('pk'), 10).count == 1
+
+
+def test__admin_changelist(cars: list[Car], admin_user):
+    request = RequestFactory().get('/admin/carpool/car/')
+    request.user = admin_user
+    counters.add(counters.CARS, 997)
+
+    response = site._registry[Car].changelist_view(request)
+    assert response.context_data['cl'].result_count == 1000
+
+
+def test__total_count(cars: list[Car]):
+    counters.add(counters.CARS, 7)
+
+    result = schema.execute('{ carsConnection(first: 1) { totalCount } }', context_value=RequestFactory().get('/'))
+    assert not result.errors
+    assert result.data['carsConnection']['totalCount'] == 10
@@ -3,7 +3,9 @@ from django.db.models import F
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
 
+from apps.counters.paginators import CountersPaginator
 from libs.admin.filters import TimeIntervalFilter
+from . import events
 from .models import Reservation
 
 
@@ -64,6 +66,9 @@ class ReservationToReturnAtFilter(TimeIntervalFilter):
 @admin.register(Reservation)
 class ReservationAdmin(admin.ModelAdmin):
     model = Reservation
+    paginator = CountersPaginator
+    # total count of unfiltered reservations would be counted by `COUNT(*)` on each filtered page
+    show_full_result_count = False
 
     list_display = (
         'id', 'request_id', 'car', 'get_model', 'to_rent_at', 'to_return_at', 'get_duration', 'client_name',
@@ -77,6 +82,16 @@ class ReservationAdmin(admin.ModelAdmin):
         ReservationDuration,
     )
 
+    def delete_model(self, request, obj: Reservation):
+        deleted = [(obj.pk, obj.car.car_id)]
+        super().delete_model(request, obj)
+        events.reservations_deleted(deleted)
+
+    def delete_queryset(self, request, queryset):
+        deleted = list(queryset.values_list('pk', 'car__car_id'))
+        super().delete_queryset(request, queryset)
+        events.reservations_deleted(deleted)
+
     @admin.display(description=_('duration'))
     def get_duration(self, obj: Reservation):
         return obj.duration()
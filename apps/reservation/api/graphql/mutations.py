@@ -1,14 +1,22 @@
 import graphene as g
 from datetime import datetime, timedelta
-from uuid import uuid4
+from uuid import UUID, uuid4
 
-from apps.reservation import services as api
+from django.conf import settings
+
+from apps.api.graphql.blocking import blocking, is_async
+from apps.reservation import coalescing, services as api
+from apps.reservation.errors import ReservationError
 from .types import ReservationType
 
 
 class ReserveInput(g.InputObjectType):
     to_rent_at = g.DateTime(require=True)
     duration_minutes = g.Int(required=True)
+    idempotency_key = g.UUID(
+        required=False,
+        description='Client-supplied request ID, retried request with the same key returns the same reservation.',
+    )
 
 
 class ReserveMutation(g.Mutation):
@@ -23,15 +31,97 @@ class ReserveMutation(g.Mutation):
     @classmethod
     def mutate(cls, root, info, input: ReserveInput):
         to_rent_at = input.to_rent_at
-        request_id = uuid4()
+        idempotent = input.idempotency_key is not None
+        request_id = input.idempotency_key if idempotent else uuid4()
+        duration = timedelta(minutes=float(input.duration_minutes))
+
+        # batches do not look up already existing reservations, so retried requests are not coalesced
+        if coalescing.is_enabled() and not idempotent:
+            # batched together with other requests arriving at about the same time
+            timeout = getattr(settings, 'RESERVATION_COALESCING_TIMEOUT', 30)
+            if is_async(info):
+                # awaited on the event loop, so no thread is held for the coalescing window and the batch
+                return cls._reserve_coalesced_async(request_id, to_rent_at, duration, timeout)
+
+            reservation = coalescing.coalescer.reserve(
+                request_id=request_id,
+                to_rent_at=to_rent_at,
+                duration=duration,
+                timeout=timeout,
+            )
+            return cls(payload=reservation)
+
+        return cls._make_reservation(info, request_id, to_rent_at, duration, idempotent)
+
+    @classmethod
+    async def _reserve_coalesced_async(
+            cls,
+            request_id: UUID,
+            to_rent_at: datetime,
+            duration: timedelta,
+            timeout: float,
+    ):
+        reservation = await coalescing.coalescer.reserve_async(
+            request_id=request_id,
+            to_rent_at=to_rent_at,
+            duration=duration,
+            timeout=timeout,
+        )
+        return cls(payload=reservation)
+
+    @classmethod
+    @blocking
+    def _make_reservation(cls, info, request_id: UUID, to_rent_at: datetime, duration: timedelta, idempotent: bool):
         reservation = api.make_reservation(
             request_id=request_id,
             to_rent_at=to_rent_at,
-            duration=timedelta(minutes=float(input.duration_minutes)),
+            duration=duration,
             dry_run=False,
+            idempotent=idempotent,
         )
         return cls(payload=reservation)
 
 
+class ReserveManyInput(g.InputObjectType):
+    items = g.List(g.NonNull(ReserveInput), required=True)
+
+
+class ReserveManyResultType(g.ObjectType):
+    class Meta:
+        name = 'ReserveManyResult'
+
+    reservation = g.Field(ReservationType, required=False)
+    error = g.String(required=False)
+
+
+class ReserveManyMutation(g.Mutation):
+    class Meta:
+        name = 'ReserveManyPayload'
+
+    class Arguments:
+        input = ReserveManyInput(required=True)
+
+    payload = g.List(g.NonNull(ReserveManyResultType), required=True)
+
+    @classmethod
+    @blocking
+    def mutate(cls, root, info, input: ReserveManyInput):
+        # retried batch gets the already made reservations of its idempotency keys
+        results = api.make_reservations(
+            [
+                (item.idempotency_key or uuid4(), item.to_rent_at, timedelta(minutes=float(item.duration_minutes)))
+                for item in input.items
+            ],
+            idempotent=any(item.idempotency_key is not None for item in input.items),
+        )
+        return cls(payload=[
+            ReserveManyResultType(error=str(result))
+            if isinstance(result, ReservationError) else
+            ReserveManyResultType(reservation=result)
+            for result in results
+        ])
+
+
 class Mutation(g.ObjectType):
     reserve = ReserveMutation.Field()
+    reserve_many = ReserveManyMutation.Field()
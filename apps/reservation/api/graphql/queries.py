@@ -1,11 +1,19 @@
 import graphene as g
+from datetime import timedelta
+from django.utils.timezone import now
+from types import SimpleNamespace
 
-from apps.reservation import services as api
+from apps.api.graphql.blocking import blocking
+from apps.api.graphql.cost import Cost
+from apps.api.graphql.loaders import loaders_for
+from apps.api.graphql.optimizer import optimize
+from apps.api.graphql.pagination import CountableConnection, keyset_connection
+from apps.reservation import services as api, utilization
 
-from .types import ReservationType
+from .types import AvailabilityType, ReservationType, UtilizationBucketType
 
 
-class ReservationConnection(g.Connection):
+class ReservationConnection(CountableConnection):
     class Meta:
         node = g.NonNull(ReservationType)
 
@@ -14,15 +22,20 @@ class ReservationConnection(g.Connection):
         cursor = g.String(required=True)
 
     edges = g.List(g.NonNull(ReservationEdge), required=True)
-    total_count = g.Int(required=True)
 
-    def resolve_total_count(root, info):
-        """Total count of reservations."""
+    # cursors are keys of the index `reservation_keyset_idx`
+    ordering = ('to_rent_at', 'id')
 
-        return len(root.iterable)
+    def resolve_edges(root, info):
+        loaders_for(info).prime_reservations(edge.node for edge in root.edges)
+        return root.edges
 
 
 class Query(g.ObjectType):
+    cost_hints = {
+        'utilization': Cost(size_argument='buckets'),
+    }
+
     reservation_by_request_id = g.Field(
         ReservationType,
         required=False,
@@ -31,18 +44,65 @@ class Query(g.ObjectType):
     )
 
     @staticmethod
+    @blocking
     def resolve_reservation_by_request_id(root, info, request_id):
         return api.fetch_reservation_by_request_id(request_id)
 
     reservations = g.ConnectionField(
         ReservationConnection,
         required=True,
-        description='Retrieve all reservations at once.',
+        description='Retrieve reservations ordered by the time of renting, page by page.',
     )
 
     @staticmethod
+    @blocking
     def resolve_reservations(root, info, **kwargs):
-        # kwargs handles
-        return api.fetch_reservations()
+        ordering = ReservationConnection.ordering
+        return keyset_connection(
+            ReservationConnection,
+            optimize(api.fetch_reservations(), info, required=ordering),
+            ordering,
+            edge_type=ReservationConnection.ReservationEdge,
+            **kwargs,
+        )
+
+    availability = g.Field(
+        AvailabilityType,
+        required=True,
+        description='Free time slots within the given time window (per car and/or aggregated for the whole fleet).',
+        from_=g.DateTime(name='from', required=True),
+        to=g.DateTime(required=True),
+        min_duration_minutes=g.Int(required=False),
+    )
+
+    @staticmethod
+    def resolve_availability(root, info, from_, to, min_duration_minutes=None):
+        min_duration = None
+        if min_duration_minutes is not None:
+            min_duration = timedelta(minutes=min_duration_minutes)
 
+        # slots are computed lazily by the selected fields of availability
+        return SimpleNamespace(start=from_, end=to, min_duration=min_duration)
+
+    utilization = g.List(
+        g.NonNull(UtilizationBucketType),
+        required=True,
+        description='Number of free and occupied cars in each time bucket (by default in 15-minute buckets over '
+                    'the next 30 days).',
+        from_=g.DateTime(name='from', required=False),
+        bucket_minutes=g.Int(required=False, default_value=15),
+        buckets=g.Int(required=False, default_value=30 * 24 * 4),
+    )
+
+    @staticmethod
+    @blocking
+    def resolve_utilization(root, info, bucket_minutes, buckets, from_=None):
+        if not 0 < buckets <= utilization.MAX_BUCKETS:
+            raise ValueError(f'number of buckets has to be between 1 and {utilization.MAX_BUCKETS}')
 
+        bucket = timedelta(minutes=bucket_minutes)
+        start = utilization.align(from_ or now(), bucket)
+        return [
+            UtilizationBucketType(start=bucket_start, free_cars=free_cars, occupied_cars=occupied_cars)
+            for bucket_start, free_cars, occupied_cars in utilization.free_cars_per_bucket(start, bucket, buckets)
+        ]
@@ -1,6 +1,15 @@
 import graphene as g
+from graphene_django.settings import graphene_settings
+from graphql import GraphQLError
 
+from apps.api.graphql.blocking import blocking
+from apps.api.graphql.cost import Cost
+from apps.api.graphql.loaders import loaders_for
+from apps.api.graphql.optimizer import Hint
+from apps.api.graphql.pagination import decode_cursor, encode_cursor
 from apps.carpool.api.graphql.types import CarType
+from apps.carpool.models import Car
+from apps.reservation import services as api
 from apps.reservation.models import Reservation
 
 
@@ -20,11 +29,15 @@ class ReservationType(g.ObjectType):
         required=True,
     )
 
+    optimizer_hints = {
+        'duration_minutes': Hint(only=('to_rent_at', 'to_return_at')),
+    }
+
     def resolve_id(root: Reservation, info):
         return root.id
 
     def resolve_to_rent_at(root: Reservation, info):
-        return root.to_return_at
+        return root.to_rent_at
 
     def resolve_to_return_at(root: Reservation, info):
         return root.to_return_at
@@ -37,3 +50,106 @@ class ReservationType(g.ObjectType):
 
     def resolve_client_name(root: Reservation, info):
         return root.client_name
+
+    @blocking(unless=lambda root, info: loaders_for(info).cached_car_of(root) is not None)
+    def resolve_car(root: Reservation, info):
+        return loaders_for(info).car_of(root)
+
+
+class TimeSlotType(g.ObjectType):
+    class Meta:
+        name = 'TimeSlot'
+
+    start = g.DateTime(required=True)
+    end = g.DateTime(required=True)
+    duration_minutes = g.Int(required=True)
+
+    def resolve_duration_minutes(root, info):
+        return (root.end - root.start).total_seconds() // 60
+
+
+class CarAvailabilityType(g.ObjectType):
+    class Meta:
+        name = 'CarAvailability'
+
+    car = g.Field(CarType, required=True)
+    free_slots = g.List(g.NonNull(TimeSlotType), required=True)
+    cursor = g.String(required=True, description='Cursor of the car for `after` argument of the next page.')
+
+    cost_hints = {
+        # just a few gaps between reservations of a car within the time window
+        'free_slots': Cost(size=10),
+    }
+
+
+class FleetSlotType(TimeSlotType):
+    class Meta:
+        name = 'FleetSlot'
+
+    free_cars = g.Int(
+        required=True,
+        description='The lowest number of free cars during the time slot.',
+    )
+
+
+class AvailabilityType(g.ObjectType):
+    class Meta:
+        name = 'Availability'
+
+    cost_hints = {
+        'cars': Cost(size_argument='first'),
+    }
+
+    # cursors of cars are their primary keys
+    car_ordering = ('pk',)
+
+    cars = g.List(
+        g.NonNull(CarAvailabilityType),
+        required=True,
+        description='Free time slots of cars (ordered by car) page by page, the page following the given cursor '
+                    '(of the last car of the previous page) is at most `first` (and `RELAY_CONNECTION_MAX_LIMIT`) '
+                    'cars long.',
+        first=g.Int(required=False, default_value=100),
+        after=g.String(required=False),
+    )
+    fleet = g.List(
+        g.NonNull(FleetSlotType),
+        required=True,
+        description='Time slots when at least one car of the whole fleet is free.',
+    )
+
+    @blocking
+    def resolve_cars(root, info, first, after=None):
+        if first < 0:
+            raise GraphQLError('first cannot be negative')
+        if max_limit := graphene_settings.RELAY_CONNECTION_MAX_LIMIT:
+            first = min(first, max_limit)
+
+        ordering = AvailabilityType.car_ordering
+        after_pk = None if after is None else decode_cursor(after, Car.objects.all(), ordering)[0]
+        return [
+            CarAvailabilityType(
+                car=car,
+                free_slots=[TimeSlotType(start=start, end=end) for start, end in slots],
+                cursor=encode_cursor(car, ordering),
+            )
+            for car, slots in api.free_slots_per_car(
+                root.start, root.end, root.min_duration, after_pk=after_pk, limit=first,
+            )
+        ]
+
+    @blocking
+    def resolve_fleet(root, info):
+        return [
+            FleetSlotType(start=start, end=end, free_cars=free_cars)
+            for start, end, free_cars in api.free_slots_of_fleet(root.start, root.end, root.min_duration)
+        ]
+
+
+class UtilizationBucketType(g.ObjectType):
+    class Meta:
+        name = 'UtilizationBucket'
+
+    start = g.DateTime(required=True)
+    free_cars = g.Int(required=True, description='Number of cars free during the whole bucket.')
+    occupied_cars = g.Int(required=True, description='Number of cars reserved at least for a part of the bucket.')
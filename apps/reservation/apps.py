@@ -6,3 +6,6 @@ class ReservationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.reservation'
     verbose_name = _('reservation')
+
+    def ready(self):
+        from . import signals  # noqa: F401
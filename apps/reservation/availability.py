@@ -0,0 +1,309 @@
+"""In-memory availability engine keeping sorted reservation intervals per car.
+
+The index is an optional accelerator for `services.make_reservation` -- it is asked for candidate cars instead of
+the database and the database is used only for the final confirmation of the chosen car. It is loaded lazily from
+`Reservation` on the first use and kept up to date by model signals (see `signals.py`) applied once their transaction
+is committed, so rows rolled back (e.g. failed reservation attempts) never get into the index.
+"""
+
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timedelta
+from heapq import heappop, heappush
+from itertools import chain, islice
+
+from django.conf import settings
+
+
+class CarSchedule:
+    """Reservation intervals of a single car sorted by their start.
+
+    Intervals are kept in parallel lists of starts, ends and reservation primary keys. Reservations of a single car
+    shall not overlap, but the index has to stay correct even for transiently overlapping rows (e.g. provisional
+    reservations of concurrent requests), so the lookup relies on the longest interval seen rather than on ends
+    being sorted too.
+    """
+
+    def __init__(self):
+        self._starts: list[datetime] = []
+        self._ends: list[datetime] = []
+        self._pks: list[int] = []
+        # start of every interval by its primary key (to find it without scanning)
+        self._starts_by_pk: dict[int, datetime] = {}
+        self._max_duration = timedelta(0)
+
+    def __len__(self):
+        return len(self._pks)
+
+    def __iter__(self):
+        return zip(self._starts, self._ends, self._pks)
+
+    def add(self, start: datetime, end: datetime, pk: int):
+        if pk in self._starts_by_pk:
+            self.remove(pk)
+
+        index = bisect_left(self._starts, start)
+        self._starts.insert(index, start)
+        self._ends.insert(index, end)
+        self._pks.insert(index, pk)
+        self._starts_by_pk[pk] = start
+        self._max_duration = max(self._max_duration, end - start)
+
+    def remove(self, pk: int) -> bool:
+        start = self._starts_by_pk.pop(pk, None)
+        if start is None:
+            return False
+
+        # only intervals of the same start have to be skipped
+        index = bisect_left(self._starts, start)
+        while self._pks[index] != pk:
+            index += 1
+
+        del self._starts[index]
+        del self._ends[index]
+        del self._pks[index]
+        return True
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        """Check that no interval overlaps `[start, end)`."""
+
+        # only intervals starting before the requested end can collide and those starting before
+        # `start - max_duration` cannot reach the requested start anymore
+        index = bisect_left(self._starts, end) - 1
+        lowest_start = start - self._max_duration
+        while index >= 0 and self._starts[index] >= lowest_start:
+            if self._ends[index] > start:
+                return False
+            index -= 1
+
+        return True
+
+
+class AvailabilityIndex:
+    """Thread-safe per-car index of reservation intervals."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._schedules: dict[int, CarSchedule] = {}
+        self._ordered_car_pks: list[int] | None = None
+        self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self):
+        """(Re)load the whole index from DB in a single ordered pass over reservations."""
+
+        from apps.carpool.models import Car
+        from .models import Reservation
+
+        schedules = {pk: CarSchedule() for pk in Car.objects.values_list('pk', flat=True).iterator()}
+        rows = Reservation.objects.order_by('car_id', 'to_rent_at').values_list(
+            'car_id', 'to_rent_at', 'to_return_at', 'pk',
+        )
+        for car_pk, to_rent_at, to_return_at, pk in rows.iterator(chunk_size=2000):
+            schedules.setdefault(car_pk, CarSchedule()).add(to_rent_at, to_return_at, pk)
+
+        with self._lock:
+            self._schedules = schedules
+            self._ordered_car_pks = None
+            self._loaded = True
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.load()
+
+    def clear(self):
+        with self._lock:
+            self._schedules = {}
+            self._ordered_car_pks = None
+            self._loaded = False
+
+    def _schedule(self, car_pk: int) -> CarSchedule:
+        if car_pk not in self._schedules:
+            self._schedules[car_pk] = CarSchedule()
+            self._ordered_car_pks = None
+        return self._schedules[car_pk]
+
+    def add_car(self, car_pk: int):
+        with self._lock:
+            self._schedule(car_pk)
+
+    def remove_car(self, car_pk: int):
+        with self._lock:
+            if self._schedules.pop(car_pk, None) is not None:
+                self._ordered_car_pks = None
+
+    def reload_car(self, car_pk: int):
+        """Reload reservations of the car from DB (e.g. after the index turned out to be missing some of them)."""
+
+        from .models import Reservation
+
+        schedule = CarSchedule()
+        rows = Reservation.objects.filter(car_id=car_pk).order_by('to_rent_at').values_list(
+            'to_rent_at', 'to_return_at', 'pk',
+        )
+        for to_rent_at, to_return_at, pk in rows:
+            schedule.add(to_rent_at, to_return_at, pk)
+
+        with self._lock:
+            if car_pk in self._schedules:
+                self._schedules[car_pk] = schedule
+
+    def add(self, car_pk: int, to_rent_at: datetime, to_return_at: datetime, pk: int):
+        with self._lock:
+            self._schedule(car_pk).add(to_rent_at, to_return_at, pk)
+
+    def remove(self, car_pk: int, pk: int):
+        with self._lock:
+            if schedule := self._schedules.get(car_pk):
+                schedule.remove(pk)
+
+    def is_free(self, car_pk: int, to_rent_at: datetime, to_return_at: datetime) -> bool:
+        with self._lock:
+            schedule = self._schedules.get(car_pk)
+            return schedule is None or schedule.is_free(to_rent_at, to_return_at)
+
+    def free_cars(
+            self,
+            to_rent_at: datetime,
+            to_return_at: datetime,
+            limit: int | None = None,
+            start_at: float = 0.0,
+    ) -> list[int]:
+        """Primary keys of cars without any reservation in the given interval ordered by primary key (starting at
+        the given fraction of the fleet and wrapping around).
+        """
+
+        self.ensure_loaded()
+
+        found = []
+        with self._lock:
+            if self._ordered_car_pks is None:
+                self._ordered_car_pks = sorted(self._schedules)
+
+            car_pks = self._ordered_car_pks
+            offset = int(start_at * len(car_pks))
+            for car_pk in chain(islice(car_pks, offset, None), islice(car_pks, offset)):
+                if self._schedules[car_pk].is_free(to_rent_at, to_return_at):
+                    found.append(car_pk)
+                    if limit is not None and len(found) >= limit:
+                        break
+
+        return found
+
+
+index = AvailabilityIndex()
+
+
+def free_gaps(
+        intervals: Iterable[tuple[datetime, datetime]],
+        start: datetime,
+        end: datetime,
+        min_duration: timedelta = timedelta(0),
+) -> Iterator[tuple[datetime, datetime]]:
+    """Gaps within `[start, end)` not covered by any of the given intervals (sorted by their start) that are at least
+    `min_duration` long.
+    """
+
+    cursor = start
+    for interval_start, interval_end in intervals:
+        if cursor >= end:
+            return
+
+        gap_end = min(interval_start, end)
+        if gap_end > cursor and gap_end - cursor >= min_duration:
+            yield cursor, gap_end
+
+        cursor = max(cursor, interval_end)
+
+    if end > cursor and end - cursor >= min_duration:
+        yield cursor, end
+
+
+def _free_car_segments(
+        car_count: int,
+        intervals: Iterable[tuple[int, datetime, datetime]],
+        start: datetime,
+        end: datetime,
+) -> Iterator[tuple[datetime, datetime, int]]:
+    """Sweep `(car_pk, start, end)` intervals (sorted by their start) and yield consecutive segments of `[start, end)`
+    with the number of free cars in each of them. Only intervals currently in progress are kept in memory.
+    """
+
+    in_progress: list[tuple[datetime, int]] = []  # heap of (end, car_pk)
+    reservations_per_car = defaultdict(int)
+    busy_cars = 0
+    cursor = start
+
+    def release_until(moment: datetime | None):
+        nonlocal busy_cars, cursor
+        while in_progress and (moment is None or in_progress[0][0] <= moment):
+            interval_end, car_pk = heappop(in_progress)
+            if interval_end > cursor:
+                yield cursor, interval_end, car_count - busy_cars
+                cursor = interval_end
+
+            reservations_per_car[car_pk] -= 1
+            if not reservations_per_car[car_pk]:
+                busy_cars -= 1
+
+    for car_pk, interval_start, interval_end in intervals:
+        interval_start = max(interval_start, start)
+        yield from release_until(interval_start)
+
+        if interval_start > cursor:
+            yield cursor, interval_start, car_count - busy_cars
+            cursor = interval_start
+
+        reservations_per_car[car_pk] += 1
+        if reservations_per_car[car_pk] == 1:
+            busy_cars += 1
+        heappush(in_progress, (interval_end, car_pk))
+
+    yield from release_until(None)
+
+    if end > cursor:
+        yield cursor, end, car_count - busy_cars
+
+
+def fleet_free_ranges(
+        car_count: int,
+        intervals: Iterable[tuple[int, datetime, datetime]],
+        start: datetime,
+        end: datetime,
+        min_duration: timedelta = timedelta(0),
+) -> Iterator[tuple[datetime, datetime, int]]:
+    """Ranges within `[start, end)` with at least one free car (of `car_count` cars in total) that are at least
+    `min_duration` long, together with the lowest number of free cars during each range. Intervals are
+    `(car_pk, start, end)` tuples sorted by their start.
+    """
+
+    range_start, range_end, range_free_cars = None, None, 0
+    for segment_start, segment_end, free_cars in _free_car_segments(car_count, intervals, start, end):
+        segment_end = min(segment_end, end)
+        if segment_start >= segment_end:
+            continue
+
+        if free_cars > 0:
+            if range_start is None:
+                range_start, range_free_cars = segment_start, free_cars
+            range_end = segment_end
+            range_free_cars = min(range_free_cars, free_cars)
+            continue
+
+        if range_start is not None and range_end - range_start >= min_duration:
+            yield range_start, range_end, range_free_cars
+        range_start = None
+
+    if range_start is not None and range_end - range_start >= min_duration:
+        yield range_start, range_end, range_free_cars
+
+
+def is_enabled() -> bool:
+    return getattr(settings, 'RESERVATION_AVAILABILITY_INDEX', False)
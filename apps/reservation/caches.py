@@ -0,0 +1,13 @@
+"""In-process caches of reservation lookups (invalidated by signal receivers in `signals.py`)."""
+
+from django.conf import settings
+
+from libs.cache import TTLCache
+
+
+# request ID -> reservation (or `None` for unknown request ID)
+reservation_by_request_id = TTLCache(
+    ttl=getattr(settings, 'RESERVATION_LOOKUP_CACHE_TTL', 5),
+    negative_ttl=getattr(settings, 'RESERVATION_LOOKUP_CACHE_NEGATIVE_TTL', 1),
+    max_size=getattr(settings, 'RESERVATION_LOOKUP_CACHE_SIZE', 10_000),
+)
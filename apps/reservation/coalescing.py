@@ -0,0 +1,172 @@
+"""Coalescing of concurrent reservation requests into batches.
+
+Reservation requests arriving within a short window are collected by an asyncio event loop running in a background
+thread and handed over to `services.make_reservations` at once, so the availability is computed once per batch and
+cars are assigned deterministically (by the start of the reservation, then by the arrival order). Batches are
+processed one by one by a single DB worker thread. Each caller gets its own reservation or error.
+
+Candidate cars of batches are ordered by the configured car selection strategy, but batches do not follow
+`RESERVATION_MODE` -- cars picked for a batch are always locked and the inserted reservations are confirmed
+afterward (see `services.make_reservations`).
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import structlog
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import services
+from .errors import ReservationError
+from .models import Reservation
+
+
+log = structlog.get_logger()
+
+
+class ReservationCoalescer:
+    def __init__(self, window: float | None = None, max_batch: int = services.MAX_BATCH_SIZE):
+        self._window = window
+        self._max_batch = max_batch
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._executor: concurrent.futures.ThreadPoolExecutor | None = None
+        self._pending: list[tuple[tuple[uuid.UUID, datetime, timedelta], concurrent.futures.Future]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+
+    @property
+    def window(self) -> float:
+        """Time (in seconds) to wait for other requests after the first request of a batch arrives."""
+
+        if self._window is not None:
+            return self._window
+        return getattr(settings, 'RESERVATION_COALESCING_WINDOW_MS', 5) / 1000
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._loop is not None:
+                return
+
+            self._loop = asyncio.new_event_loop()
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='reservations')
+            self._thread = threading.Thread(target=self._loop.run_forever, name='reservation-coalescer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Process requests collected so far and stop the background threads."""
+
+        with self._lock:
+            if self._loop is None:
+                return
+
+            asyncio.run_coroutine_threadsafe(self._drain(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._executor.shutdown(wait=True)
+            self._loop = self._thread = self._executor = None
+
+    async def _drain(self):
+        self._flush()
+
+    def submit(self, request_id: uuid.UUID, to_rent_at: datetime, duration: timedelta) -> concurrent.futures.Future:
+        """Enqueue a reservation request (thread-safe), the returned future resolves to the reservation."""
+
+        self._ensure_started()
+        future = concurrent.futures.Future()
+        self._loop.call_soon_threadsafe(self._enqueue, (request_id, to_rent_at, duration), future)
+        return future
+
+    def reserve(
+            self,
+            request_id: uuid.UUID,
+            to_rent_at: datetime,
+            duration: timedelta,
+            timeout: float | None = None,
+    ) -> Reservation:
+        """Blocking variant for synchronous callers (e.g. WSGI views). Request still waiting for its batch is withdrawn
+        on timeout, the outcome of a request already being processed is awaited regardless of the timeout.
+        """
+
+        future = self.submit(request_id, to_rent_at, duration)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            if future.cancel():
+                raise
+            # the batch of the request is being processed, so the caller has to learn the outcome
+            return future.result()
+
+    async def reserve_async(
+            self,
+            request_id: uuid.UUID,
+            to_rent_at: datetime,
+            duration: timedelta,
+            timeout: float | None = None,
+    ) -> Reservation:
+        """Variant for callers running within their own event loop (e.g. ASGI views), no thread is held while the
+        request waits for its batch. Timeout is handled like by `reserve`.
+        """
+
+        future = self.submit(request_id, to_rent_at, duration)
+        try:
+            # shielded, so the request is withdrawn below (if still possible) rather than by cancelling the wrapper
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except TimeoutError:
+            if future.cancel():
+                raise
+            return await asyncio.wrap_future(future)
+
+    def _enqueue(self, request: tuple[uuid.UUID, datetime, timedelta], future: concurrent.futures.Future):
+        self._pending.append((request, future))
+
+        if len(self._pending) >= self._max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = self._loop.call_later(self.window, self._flush)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            self._executor.submit(self._process, batch)
+
+    @staticmethod
+    def _process(batch: list[tuple[tuple[uuid.UUID, datetime, timedelta], concurrent.futures.Future]]):
+        # requests withdrawn by their callers are dropped, the others cannot be withdrawn anymore
+        batch = [(request, future) for request, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        close_old_connections()
+        try:
+            results = services.make_reservations([request for request, _ in batch])
+        except Exception as ex:
+            log.error('coalesced reservations failed', count=len(batch), error=str(ex))
+            for _, future in batch:
+                future.set_exception(ex)
+            return
+        finally:
+            close_old_connections()
+
+        log.info('coalesced reservations', count=len(batch))
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, ReservationError):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+coalescer = ReservationCoalescer()
+
+
+def is_enabled() -> bool:
+    return getattr(settings, 'RESERVATION_COALESCING', False)
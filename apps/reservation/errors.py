@@ -30,3 +30,13 @@ class ReservationInternalError(ReservationError):
             super().__init__(*args)
 
         super().__init__('internal error during reservation')
+
+
+class ReservationRequestIdConflictError(ReservationError):
+    """Reservation error - the request ID (idempotency key) has been already used for a different reservation."""
+
+    def __init__(self, *args):
+        if len(args):
+            super().__init__(*args)
+
+        super().__init__('request ID already used for a different reservation')
@@ -0,0 +1,36 @@
+"""Events about reservations published (after commit) by the reservation services."""
+
+from collections.abc import Iterable
+
+from libs.events import broker, publish_on_commit
+from .models import Reservation
+
+
+RESERVATION_CREATED = 'reservation.created'
+RESERVATION_DELETED = 'reservation.deleted'
+
+
+def reservations_created(reservations: Iterable[Reservation]):
+    if not broker.has_subscribers():
+        return
+
+    for reservation in reservations:
+        publish_on_commit(RESERVATION_CREATED, {
+            'id': reservation.pk,
+            'request_id': reservation.request_id,
+            'car_id': reservation.car.car_id,
+            'to_rent_at': reservation.to_rent_at,
+            'to_return_at': reservation.to_return_at,
+        })
+
+
+def reservations_deleted(reservations: Iterable[tuple[int, str]]):
+    """Publish deletions of reservations given as `(primary key, car ID)` pairs (reservations of deleted cars are
+    reported by `car.deleted` events).
+    """
+
+    if not broker.has_subscribers():
+        return
+
+    for pk, car_id in reservations:
+        publish_on_commit(RESERVATION_DELETED, {'id': pk, 'car_id': car_id})
@@ -0,0 +1,212 @@
+"""Generator of synthetic large fleets (car makes, models, cars and their reservations) for local performance work.
+
+Rows are generated by a seeded random generator and written by `bulk_create` in chunks, so the memory used does
+not depend on the size of the generated fleet. Reservations of each car are generated one after another along
+the time axis (with random gaps in between), hence they never overlap. Model signals are not sent by bulk inserts,
+so in-process caches (see `signals.py`) of an already running server are not aware of the generated rows (maintained
+counters are rebuilt at the end if enabled). The whole fleet is generated in a single transaction, so a failed run
+leaves no rows behind, and makes and models already present (compared by their preprocessed names) are reused.
+"""
+
+import math
+import random
+import string
+import uuid
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from django.db import transaction
+
+from apps.carpool.models import Car, CarMake, CarModel
+from apps.counters import services as counters
+from libs.text_utils import preprocess_for_comparison
+from .models import Reservation
+
+
+DISTRIBUTION_FIXED = 'fixed'
+DISTRIBUTION_UNIFORM = 'uniform'
+DISTRIBUTION_EXPONENTIAL = 'exponential'
+DISTRIBUTION_LOGNORMAL = 'lognormal'
+
+DISTRIBUTIONS = (DISTRIBUTION_FIXED, DISTRIBUTION_UNIFORM, DISTRIBUTION_EXPONENTIAL, DISTRIBUTION_LOGNORMAL)
+
+_MAKE_NAMES = (
+    'Skoda', 'Volkswagen', 'Toyota', 'Ford', 'Renault', 'Peugeot', 'Hyundai', 'Kia', 'Dacia', 'Opel', 'Fiat',
+    'Seat', 'Citroen', 'Mazda', 'Honda', 'Nissan', 'Volvo', 'BMW', 'Audi', 'Mercedes-Benz',
+)
+
+
+@dataclass(frozen=True)
+class DurationDistribution:
+    """Distribution of reservation durations (whole minutes clipped into `[minimum, maximum]`)."""
+
+    kind: str = DISTRIBUTION_LOGNORMAL
+    mean: timedelta = timedelta(hours=4)
+    minimum: timedelta = timedelta(minutes=30)
+    maximum: timedelta = timedelta(days=14)
+
+    def __post_init__(self):
+        if self.kind not in DISTRIBUTIONS:
+            raise ValueError(f'unknown duration distribution {self.kind!r}')
+        if not timedelta(minutes=1) <= self.minimum <= self.mean <= self.maximum:
+            raise ValueError('durations have to satisfy 1 minute <= minimum <= mean <= maximum')
+
+    def sample(self, rng: random.Random) -> timedelta:
+        mean = self.mean.total_seconds() / 60
+        if self.kind == DISTRIBUTION_FIXED:
+            minutes = mean
+        elif self.kind == DISTRIBUTION_UNIFORM:
+            minutes = rng.uniform(self.minimum.total_seconds() / 60, self.maximum.total_seconds() / 60)
+        elif self.kind == DISTRIBUTION_EXPONENTIAL:
+            minutes = rng.expovariate(1 / mean)
+        else:
+            # long tail of multi-day rentals, `sigma = 1` keeps the median at about 60 % of the mean
+            sigma = 1.0
+            minutes = rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+
+        return min(max(timedelta(minutes=round(minutes)), self.minimum), self.maximum)
+
+
+@dataclass
+class GeneratedFleet:
+    makes: int = 0
+    models: int = 0
+    cars: int = 0
+    reservations: int = 0
+
+
+def _registration_number(rng: random.Random) -> str:
+    letters = ''.join(rng.choices(string.ascii_uppercase, k=2))
+    return f'{rng.randrange(1, 10)}{letters} {rng.randrange(10000):04d}'
+
+
+def _next_car_number() -> int:
+    """First number of a car ID not colliding with any existing car."""
+
+    highest = 0
+    for car_id in Car.objects.values_list('car_id', flat=True).iterator(chunk_size=10000):
+        if car_id[1:].isdigit():
+            highest = max(highest, int(car_id[1:]))
+    return highest + 1
+
+
+def _catalog(makes: int, models_per_make: int, generated: GeneratedFleet) -> list[CarModel]:
+    """Models of generated makes, missing makes and models are created (and counted as generated)."""
+
+    names = [_MAKE_NAMES[i] if i < len(_MAKE_NAMES) else f'Make {i + 1}' for i in range(makes)]
+    existing_makes = {}
+    for make in CarMake.objects.order_by('pk'):
+        existing_makes.setdefault(preprocess_for_comparison(make.name), make)
+    new_makes = CarMake.objects.bulk_create([
+        CarMake(name=name, official_name=name)
+        for name in names if preprocess_for_comparison(name) not in existing_makes
+    ])
+    existing_makes.update((preprocess_for_comparison(make.name), make) for make in new_makes)
+    make_objects = [existing_makes[preprocess_for_comparison(name)] for name in names]
+
+    existing_models = {}
+    for model in CarModel.objects.filter(make__in=make_objects).order_by('pk'):
+        existing_models.setdefault((model.make_id, preprocess_for_comparison(model.name)), model)
+    keys = [(make, f'Model {i + 1}') for make in make_objects for i in range(models_per_make)]
+    new_models = CarModel.objects.bulk_create([
+        CarModel(make=make, name=name) for make, name in keys
+        if (make.pk, preprocess_for_comparison(name)) not in existing_models
+    ])
+    existing_models.update(((model.make_id, preprocess_for_comparison(model.name)), model) for model in new_models)
+
+    generated.makes, generated.models = len(new_makes), len(new_models)
+    return [existing_models[make.pk, preprocess_for_comparison(name)] for make, name in keys]
+
+
+def _car_reservations(
+        car: Car,
+        count: int,
+        start: datetime,
+        density: float,
+        durations: DurationDistribution,
+        rng: random.Random,
+) -> Iterator[Reservation]:
+    """Non-overlapping reservations of a single car following each other since `start`.
+
+    Gaps are exponentially distributed with the mean chosen so that the car is booked for about `density` of time.
+    """
+
+    mean_gap = durations.mean.total_seconds() * (1 - density) / density
+    moment = start
+    for _ in range(count):
+        moment += timedelta(minutes=round(rng.expovariate(1 / mean_gap) / 60) if mean_gap else 0)
+        to_return_at = moment + durations.sample(rng)
+        yield Reservation(
+            car=car,
+            to_rent_at=moment,
+            to_return_at=to_return_at,
+            request_id=uuid.uuid4(),
+        )
+        moment = to_return_at
+
+
+def generate_fleet(
+        makes: int,
+        models_per_make: int,
+        cars: int,
+        reservations: int,
+        start: datetime,
+        density: float = 0.5,
+        durations: DurationDistribution = DurationDistribution(),
+        seed: int = 0,
+        chunk_size: int = 5000,
+        progress: Callable[[GeneratedFleet], None] | None = None,
+) -> GeneratedFleet:
+    """Generate the whole fleet with about `reservations // cars` reservations per car (the remainder is spread
+    among the first cars). The same seed (and arguments) leads to the same data, apart from primary keys, request
+    IDs of reservations and IDs of cars that have to avoid existing ones.
+    """
+
+    if makes <= 0 or models_per_make <= 0 or cars <= 0:
+        raise ValueError('number of makes, models per make and cars has to be positive')
+    if reservations < 0:
+        raise ValueError('number of reservations cannot be negative')
+    if not 0 < density <= 1:
+        raise ValueError('density has to be within (0, 1]')
+    if chunk_size <= 0:
+        raise ValueError('chunk size has to be positive')
+
+    rng = random.Random(seed)
+    generated = GeneratedFleet()
+
+    with transaction.atomic():
+        model_objects = _catalog(makes, models_per_make, generated)
+
+        first_car_number = _next_car_number()
+        per_car, remainder = divmod(reservations, cars)
+        for chunk_start in range(0, cars, chunk_size):
+            car_chunk = Car.objects.bulk_create([
+                Car(
+                    car_id=f'C{first_car_number + i}',
+                    registration_number=_registration_number(rng),
+                    model=rng.choice(model_objects),
+                )
+                for i in range(chunk_start, min(chunk_start + chunk_size, cars))
+            ])
+            generated.cars += len(car_chunk)
+
+            buffer = []
+            for i, car in enumerate(car_chunk, start=chunk_start):
+                count = per_car + (i < remainder)
+                for reservation in _car_reservations(car, count, start, density, durations, rng):
+                    buffer.append(reservation)
+                    if len(buffer) >= chunk_size:
+                        Reservation.objects.bulk_create(buffer)
+                        generated.reservations += len(buffer)
+                        buffer = []
+            Reservation.objects.bulk_create(buffer)
+            generated.reservations += len(buffer)
+
+            if progress is not None:
+                progress(generated)
+
+    if counters.is_enabled():
+        counters.rebuild()
+
+    return generated
@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive, make_aware, now
+
+from apps.reservation import generator
+
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic fleet of car makes, models, cars and their non-overlapping reservations.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--makes', type=int, default=10, help='number of car makes')
+        parser.add_argument('--models-per-make', type=int, default=5, help='number of car models of each make')
+        parser.add_argument('--cars', type=int, default=10_000, help='number of cars')
+        parser.add_argument('--reservations', type=int, default=1_000_000, help='total number of reservations')
+        parser.add_argument('--from', dest='start', help='start of the first reservations (ISO 8601), now by default')
+        parser.add_argument(
+            '--density', type=float, default=0.5,
+            help='fraction of time the cars are booked for (0 < density <= 1)',
+        )
+        parser.add_argument(
+            '--duration-distribution', choices=generator.DISTRIBUTIONS, default=generator.DISTRIBUTION_LOGNORMAL,
+            help='distribution of reservation durations',
+        )
+        parser.add_argument('--mean-duration-minutes', type=int, default=240, help='mean reservation duration')
+        parser.add_argument('--min-duration-minutes', type=int, default=30, help='minimal reservation duration')
+        parser.add_argument('--max-duration-minutes', type=int, default=14 * 24 * 60, help='maximal duration')
+        parser.add_argument('--seed', type=int, default=0, help='seed of the random generator')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='number of rows per bulk insert')
+
+    def handle(
+            self,
+            *args,
+            makes=10,
+            models_per_make=5,
+            cars=10_000,
+            reservations=1_000_000,
+            start=None,
+            density=0.5,
+            duration_distribution=generator.DISTRIBUTION_LOGNORMAL,
+            mean_duration_minutes=240,
+            min_duration_minutes=30,
+            max_duration_minutes=14 * 24 * 60,
+            seed=0,
+            chunk_size=5000,
+            **options,
+    ):
+        moment = now().replace(second=0, microsecond=0)
+        if start:
+            if (moment := parse_datetime(start)) is None:
+                raise CommandError(f'invalid start {start!r}')
+            if is_naive(moment):
+                moment = make_aware(moment)
+
+        try:
+            durations = generator.DurationDistribution(
+                kind=duration_distribution,
+                mean=timedelta(minutes=mean_duration_minutes),
+                minimum=timedelta(minutes=min_duration_minutes),
+                maximum=timedelta(minutes=max_duration_minutes),
+            )
+        except ValueError as ex:
+            raise CommandError(str(ex))
+
+        def progress(generated: generator.GeneratedFleet):
+            if options['verbosity'] > 1:
+                self.stderr.write(f'{generated.cars} cars and {generated.reservations} reservations generated')
+
+        try:
+            generated = generator.generate_fleet(
+                makes=makes,
+                models_per_make=models_per_make,
+                cars=cars,
+                reservations=reservations,
+                start=moment,
+                density=density,
+                durations=durations,
+                seed=seed,
+                chunk_size=chunk_size,
+                progress=progress,
+            )
+        except ValueError as ex:
+            raise CommandError(str(ex))
+
+        self.stdout.write(
+            f'Generated {generated.makes} makes, {generated.models} models, {generated.cars} cars '
+            f'and {generated.reservations} reservations.'
+        )
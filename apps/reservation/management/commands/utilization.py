@@ -0,0 +1,38 @@
+import csv
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive, make_aware, now
+
+from apps.reservation import utilization
+
+
+class Command(BaseCommand):
+    help = 'Print number of free and occupied cars in each time bucket as CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='start of the first bucket (ISO 8601), now by default')
+        parser.add_argument('--bucket-minutes', type=int, default=15, help='size of a single bucket in minutes')
+        parser.add_argument('--buckets', type=int, default=30 * 24 * 4, help='number of buckets')
+
+    def handle(self, *args, start=None, bucket_minutes=15, buckets=30 * 24 * 4, **options):
+        if not 0 < buckets <= utilization.MAX_BUCKETS:
+            raise CommandError(f'number of buckets has to be between 1 and {utilization.MAX_BUCKETS}')
+        if bucket_minutes <= 0:
+            raise CommandError('bucket size has to be positive')
+
+        moment = now()
+        if start:
+            if (moment := parse_datetime(start)) is None:
+                raise CommandError(f'invalid start {start!r}')
+            if is_naive(moment):
+                moment = make_aware(moment)
+
+        bucket = timedelta(minutes=bucket_minutes)
+        matrix = utilization.build(utilization.align(moment, bucket), bucket, buckets)
+
+        writer = csv.writer(self.stdout, lineterminator='\n')
+        writer.writerow(['start', 'free_cars', 'occupied_cars'])
+        for row in zip(matrix.bucket_starts(), matrix.free_cars().tolist(), matrix.occupied_cars().tolist()):
+            writer.writerow([row[0].isoformat(), row[1], row[2]])
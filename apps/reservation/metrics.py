@@ -0,0 +1,44 @@
+"""Metrics of making reservations (see `libs.metrics`)."""
+
+from libs.metrics import TIME_BUCKETS, registry
+
+
+requests = registry.counter(
+    'reservation_requests_total',
+    'Reservation requests by mode, car selection strategy and outcome.',
+    labels=('mode', 'strategy', 'outcome'),
+)
+
+trials = registry.histogram(
+    'reservation_trials',
+    'Cars tried per reservation request.',
+    buckets=(1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11),
+    labels=('mode', 'strategy'),
+)
+
+candidates = registry.histogram(
+    'reservation_candidates',
+    'Size of the pool of candidate cars fetched by optimistic reservation requests.',
+    buckets=(0, 1, 2, 5, 10, 11),
+)
+
+phase_seconds = registry.histogram(
+    'reservation_phase_seconds',
+    'DB time spent by reservation phases.',
+    buckets=TIME_BUCKETS,
+    labels=('phase',),
+)
+
+collisions = registry.counter(
+    'reservation_collisions_total',
+    'Collisions with concurrent reservations by the hour of the day (UTC) when the car is to be rented.',
+    labels=('rent_hour',),
+)
+
+
+OUTCOME_RESERVED = 'reserved'
+OUTCOME_EXISTING = 'existing'
+OUTCOME_DRY_RUN = 'dry_run'
+OUTCOME_NO_CAR_AVAILABLE = 'no_car_available'
+OUTCOME_FAILED_ATTEMPTS = 'failed_attempts'
+OUTCOME_INTERNAL_ERROR = 'internal_error'
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carpool', '0001_initial'),
+        ('reservation', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['car', 'to_rent_at', 'to_return_at'], name='reservation_car_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['to_rent_at', 'to_return_at'], name='reservation_period_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservation', '0002_reservation_period_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reservation',
+            name='request_id',
+            field=models.UUIDField(help_text='ID of request that is internally generated as soon as reservation request is pending.', null=True, unique=True, verbose_name='request ID'),
+        ),
+    ]
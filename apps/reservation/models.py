@@ -30,6 +30,7 @@ class Reservation(BaseModel):
 
     request_id = m.UUIDField(
         null=True,
+        unique=True,
         verbose_name=_('request ID'),
         help_text=_('ID of request that is internally generated as soon as reservation request is pending.'),
     )
@@ -44,6 +45,13 @@ class Reservation(BaseModel):
     class Meta:
         verbose_name = _('reservation')
         verbose_name_plural = _('reservations')
+        indexes = [
+            # overlap lookups of a single car (availability checks)
+            m.Index(fields=['car', 'to_rent_at', 'to_return_at'], name='reservation_car_period_idx'),
+            # overlap lookups across the whole fleet and keyset pagination ordered by `(to_rent_at, id)` (the end of
+            # the interval is still checked within the index)
+            m.Index(fields=['to_rent_at', 'id', 'to_return_at'], name='reservation_period_idx'),
+        ]
 
     def duration(self) -> timedelta:
         return self.to_return_at - self.to_rent_at
@@ -0,0 +1,108 @@
+"""Strategies for ordering candidate cars of a reservation.
+
+With the default ordering all concurrent requests for the same time slot race for the very same first car and walk
+the same list of candidates on collisions. The other strategies spread concurrent requests across the fleet. They
+do not order the whole fleet -- candidates are taken from a bounded pool of free cars following a position in the
+fleet (ordered by primary key) chosen by the strategy (see `pool_start`) and only the pool is ordered.
+"""
+
+import random
+import zlib
+from uuid import UUID
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import F, OuterRef, QuerySet, Subquery
+from django.db.models.functions import Mod
+
+from . import metrics
+from .models import Reservation
+
+
+STRATEGY_DEFAULT = 'default'
+STRATEGY_RANDOM = 'random'
+STRATEGY_SHARDED = 'sharded'
+STRATEGY_LEAST_RECENTLY_RESERVED = 'least_recently_reserved'
+
+
+def _order_default(queryset: QuerySet, request_id: UUID) -> QuerySet:
+    return queryset.order_by('pk')
+
+
+def _order_random(queryset: QuerySet, request_id: UUID) -> QuerySet:
+    return queryset.order_by('?')
+
+
+def _shard(request_id: UUID) -> tuple[int, int]:
+    """Shard selected by hash of the request ID and the number of shards."""
+
+    shards = getattr(settings, 'RESERVATION_CAR_SELECTION_SHARDS', 16)
+    return zlib.crc32(str(request_id).encode()) % shards, shards
+
+
+def _order_sharded(queryset: QuerySet, request_id: UUID) -> QuerySet:
+    """Split cars into shards by primary key and start with the shard selected by hash of the request ID."""
+
+    offset, shards = _shard(request_id)
+    return queryset.annotate(_shard=Mod(F('pk') + offset, shards)).order_by('_shard', 'pk')
+
+
+def _order_least_recently_reserved(queryset: QuerySet, request_id: UUID) -> QuerySet:
+    # subquery (instead of aggregation) keeps the queryset usable with `select_for_update`
+    last_reserved = Reservation.objects.filter(car=OuterRef('pk')).order_by('-date_created').values('date_created')
+    return queryset.annotate(_last_reserved=Subquery(last_reserved[:1])).order_by(
+        F('_last_reserved').asc(nulls_first=True), 'pk',
+    )
+
+
+_strategies = {
+    STRATEGY_DEFAULT: _order_default,
+    STRATEGY_RANDOM: _order_random,
+    STRATEGY_SHARDED: _order_sharded,
+    STRATEGY_LEAST_RECENTLY_RESERVED: _order_least_recently_reserved,
+}
+
+
+def current_strategy() -> str:
+    strategy = getattr(settings, 'RESERVATION_CAR_SELECTION', STRATEGY_DEFAULT)
+    if strategy not in _strategies:
+        raise ImproperlyConfigured(f'unknown car selection strategy {strategy!r}')
+
+    return strategy
+
+
+def order_candidates(queryset: QuerySet, request_id: UUID, strategy: str | None = None) -> QuerySet:
+    """Order candidate cars according to the given (or configured) strategy."""
+
+    return _strategies[strategy or current_strategy()](queryset, request_id)
+
+
+def pool_size(limit: int | None = None) -> int:
+    """Number of free cars the strategies other than the default one choose from (at least `limit`)."""
+
+    return max(getattr(settings, 'RESERVATION_CAR_SELECTION_POOL', 100), limit or 0)
+
+
+def pool_start(request_id: UUID, strategy: str) -> float:
+    """Position (as a fraction of the fleet ordered by primary key) the pool of candidate cars starts at."""
+
+    if strategy == STRATEGY_DEFAULT:
+        return 0.0
+    if strategy == STRATEGY_SHARDED:
+        shard, shards = _shard(request_id)
+        return shard / shards
+    return random.random()
+
+
+def retry_rate(strategy: str) -> float:
+    """Average number of retries (trials beyond the first one) per reservation request of the given strategy."""
+
+    requests = trials = 0
+    for (_, key_strategy), (counts, total) in metrics.trials.values().items():
+        if key_strategy == strategy:
+            requests += sum(counts)
+            trials += total
+
+    if not requests:
+        return 0.0
+    return (trials - requests) / requests
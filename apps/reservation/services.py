@@ -1,28 +1,45 @@
 import structlog
 import uuid
-from django.db.models import Q, OuterRef, Exists
-from django.utils.timezone import now, datetime, timedelta
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from heapq import heappop, heappush
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q, OuterRef, Exists, Max, QuerySet
+from django.utils.timezone import now, datetime, timedelta, timezone
 
 from apps.carpool.models import Car
+from apps.counters import services as counters
 from libs.models.abstract import date_updated
-from .errors import ReservationInternalError, ReservationFailedAttemptError, ReservationNoCarAvailableError
+from libs.cache import MISSING
+from . import availability, caches, events, metrics, selection, signals
+from .errors import (
+    ReservationError,
+    ReservationFailedAttemptError,
+    ReservationInternalError,
+    ReservationNoCarAvailableError,
+    ReservationRequestIdConflictError,
+)
 from .models import Reservation
 
 
 log = structlog.get_logger()
 
 
+RESERVATION_MODE_OPTIMISTIC = 'optimistic'
+RESERVATION_MODE_LOCKING = 'locking'
+
+
 def _during_that_time_filter(to_rent_at: datetime, to_return_at: datetime) -> Q:
-    """Construct filter for checking that any reservation in that time already exists."""
-
-    return (
-        # reservations that are completely within requested reservation (or equals)
-        Q(to_rent_at__gte=to_rent_at, to_return_at__lte=to_return_at) |
-        # reservations that collide with requested reservations start
-        Q(to_rent_at__lt=to_rent_at, to_return_at__gt=to_rent_at) |
-        # reservations that collide with requested reservation end
-        Q(to_rent_at__lt=to_return_at, to_return_at__gt=to_return_at)
-    )
+    """Construct filter for checking that any reservation in that time already exists.
+
+    Two half-open intervals overlap iff each one starts before the other one ends. The single range condition
+    (instead of enumerating the particular kinds of collisions) can be served by the composite index
+    `(car, to_rent_at, to_return_at)`.
+    """
+
+    return Q(to_rent_at__lt=to_return_at, to_return_at__gt=to_rent_at)
 
 
 def count_reservations_for_car(
@@ -36,30 +53,130 @@ def count_reservations_for_car(
     return Reservation.objects.filter(time_filter, car=car).count()
 
 
+def _free_car_pool(free_cars: QuerySet, size: int, start_at: float) -> list[int]:
+    """Primary keys of (at most) `size` free cars following the given fraction of the fleet (wrapping around),
+    fetched by range scans of the primary key instead of ordering the whole fleet.
+    """
+
+    highest_pk = Car.objects.aggregate(highest=Max('pk'))['highest'] or 0
+    pivot = int(start_at * highest_pk)
+    pks = list(free_cars.filter(pk__gt=pivot).order_by('pk').values_list('pk', flat=True)[:size])
+    if len(pks) < size and pivot:
+        pks += free_cars.filter(pk__lte=pivot).order_by('pk').values_list('pk', flat=True)[:size - len(pks)]
+    return pks
+
+
+def _available_cars(
+        to_rent_at: datetime,
+        to_return_at: datetime,
+        limit: int,
+        request_id: uuid.UUID,
+        strategy: str,
+) -> QuerySet:
+    """Cars without any reservation in the given interval ordered according to the car selection strategy. The
+    in-memory availability index (if enabled) selects at most `limit` candidates on its own for the default strategy,
+    otherwise the caller is expected to slice the result. The other strategies order just a pool of free cars (see
+    `selection.pool_size`), so they never sort the whole fleet nor pass it to DB.
+    """
+
+    no_reservation_filter = ~Exists(
+        Reservation.objects.filter(
+            _during_that_time_filter(to_rent_at=to_rent_at, to_return_at=to_return_at),
+            car=OuterRef('pk'),
+        )
+    )
+    start_at = selection.pool_start(request_id, strategy)
+
+    if availability.is_enabled():
+        # in-memory index replaces the search, DB is only confirming the selected car afterward
+        if strategy != selection.STRATEGY_DEFAULT:
+            limit = selection.pool_size(limit)
+        free_car_pks = availability.index.free_cars(to_rent_at, to_return_at, limit=limit, start_at=start_at)
+        queryset = Car.objects.filter(pk__in=free_car_pks)
+    elif strategy != selection.STRATEGY_DEFAULT:
+        pool = _free_car_pool(Car.objects.filter(no_reservation_filter), selection.pool_size(limit), start_at)
+        # cars of the pool are checked again (they might have been reserved in the meanwhile)
+        queryset = Car.objects.filter(no_reservation_filter, pk__in=pool)
+    else:
+        queryset = Car.objects.filter(no_reservation_filter)
+
+    return selection.order_candidates(queryset, request_id=request_id, strategy=strategy)
+
+
+def _reservation_mode() -> str:
+    mode = getattr(settings, 'RESERVATION_MODE', RESERVATION_MODE_OPTIMISTIC)
+    if mode not in (RESERVATION_MODE_OPTIMISTIC, RESERVATION_MODE_LOCKING):
+        raise ImproperlyConfigured(f'unknown reservation mode {mode!r}')
+
+    return mode
+
+
+def _existing_reservation(request_id: uuid.UUID, to_rent_at: datetime, to_return_at: datetime) -> Reservation | None:
+    """Reservation already made for the given request ID (that has to be made for the same time interval)."""
+
+    existing = Reservation.objects.filter(request_id=request_id).first()
+    if existing is not None and (existing.to_rent_at, existing.to_return_at) != (to_rent_at, to_return_at):
+        raise ReservationRequestIdConflictError
+
+    return existing
+
+
+def _record_outcome(mode: str, strategy: str, outcome: str, trials: int = 0):
+    metrics.requests.inc(mode=mode, strategy=strategy, outcome=outcome)
+    if trials:
+        metrics.trials.observe(trials, mode=mode, strategy=strategy)
+
+
+def _record_collision(to_rent_at: datetime):
+    metrics.collisions.inc(rent_hour=to_rent_at.astimezone(timezone.utc).hour)
+
+
 def make_reservation(
         request_id: uuid.UUID,
         to_rent_at: datetime,
         duration: timedelta,
         dry_run: bool = False,
+        idempotent: bool = False,
 ) -> Reservation:
-    """Try to make a reservation."""
+    """Try to make a reservation. Idempotent request returns already existing reservation of the same request ID
+    (e.g. client-supplied idempotency key of a retried request) instead of making a new one.
+    """
 
     limit = 10
     to_return_at = to_rent_at + duration
+    mode = _reservation_mode()
+    strategy = selection.current_strategy()
 
     _log = log.bind(ts=now(), request_id=request_id)
     _log.info('request_reservation', to_rent_at=to_rent_at, to_return_at=to_return_at, duration=duration)
 
-    no_reservation_filter = ~Exists(
-        Reservation.objects.filter(
-            _during_that_time_filter(to_rent_at=to_rent_at, to_return_at=to_return_at),
-            car=OuterRef('pk'),
+    if idempotent and (existing := _existing_reservation(request_id, to_rent_at, to_return_at)) is not None:
+        _log.info('reservation already exists', reservation_id=existing.pk)
+        _record_outcome(mode, strategy, metrics.OUTCOME_EXISTING)
+        return existing
+
+    candidates = _available_cars(to_rent_at, to_return_at, limit=limit + 1, request_id=request_id, strategy=strategy)
+
+    if mode == RESERVATION_MODE_LOCKING:
+        return _make_reservation_locking(
+            request_id=request_id,
+            to_rent_at=to_rent_at,
+            to_return_at=to_return_at,
+            candidates=candidates,
+            dry_run=dry_run,
+            idempotent=idempotent,
+            strategy=strategy,
+            limit=limit,
+            _log=_log,
         )
-    )
-    available_cars = list(Car.objects.filter(no_reservation_filter).all()[:limit + 1])
+
+    with metrics.phase_seconds.time(phase='candidates'):
+        available_cars = list(candidates[:limit + 1])
+    metrics.candidates.observe(len(available_cars))
 
     if not len(available_cars):
         _log.warn('no car available')
+        _record_outcome(mode, strategy, metrics.OUTCOME_NO_CAR_AVAILABLE)
         raise ReservationNoCarAvailableError
 
     for trial, available_car in enumerate(available_cars, start=1):
@@ -70,43 +187,482 @@ def make_reservation(
         )
 
         if dry_run:
+            _record_outcome(mode, strategy, metrics.OUTCOME_DRY_RUN)
             return reservation
 
-        reservation.save()
+        with metrics.phase_seconds.time(phase='insert'):
+            reservation.save()
 
         # check that no other reservation was done for the same in the meanwhile
-        count = count_reservations_for_car(car=available_car, to_rent_at=to_rent_at, to_return_at=to_return_at)
+        with metrics.phase_seconds.time(phase='confirm'):
+            count = count_reservations_for_car(car=available_car, to_rent_at=to_rent_at, to_return_at=to_return_at)
         match count:
             case 0:
                 _log.error('not able to find own temporary reservation', trial=trial, count=len(available_cars))
+                _record_outcome(mode, strategy, metrics.OUTCOME_INTERNAL_ERROR, trials=trial)
                 raise ReservationInternalError
 
             case 1:
                 # finish the reservation by saving its request ID
                 try:
                     reservation.request_id = request_id
-                    reservation.save(update_fields=['request_id', date_updated])
+                    with metrics.phase_seconds.time(phase='finalize'), transaction.atomic():
+                        reservation.save(update_fields=['request_id', date_updated])
+                except IntegrityError:
+                    # the same request ID has been used by a concurrent request in the meanwhile
+                    reservation.delete()
+                    if idempotent and (existing := _existing_reservation(request_id, to_rent_at, to_return_at)):
+                        _record_outcome(mode, strategy, metrics.OUTCOME_EXISTING, trials=trial)
+                        return existing
+                    _record_outcome(mode, strategy, metrics.OUTCOME_INTERNAL_ERROR, trials=trial)
+                    raise ReservationInternalError
                 except Exception:
+                    _record_outcome(mode, strategy, metrics.OUTCOME_INTERNAL_ERROR, trials=trial)
                     raise ReservationInternalError
                 else:
+                    _record_outcome(mode, strategy, metrics.OUTCOME_RESERVED, trials=trial)
+                    _log.info('reservation done', trials=trial, strategy=strategy)
+                    events.reservations_created([reservation])
                     return reservation
 
             case _:
-                reservation.delete()
+                _record_collision(to_rent_at)
+                with metrics.phase_seconds.time(phase='rollback'):
+                    reservation.delete()
+
+    _record_outcome(mode, strategy, metrics.OUTCOME_FAILED_ATTEMPTS, trials=len(available_cars))
 
     count = len(available_cars)
     if count > limit:
         count = f'>{count}'
-    _log.warn(f'failed to reserve with {count} available cars')
+    _log.warn(f'failed to reserve with {count} available cars', strategy=strategy)
+    raise ReservationFailedAttemptError
+
+
+def _make_reservation_locking(
+        request_id: uuid.UUID,
+        to_rent_at: datetime,
+        to_return_at: datetime,
+        candidates: QuerySet,
+        dry_run: bool,
+        idempotent: bool,
+        strategy: str,
+        limit: int,
+        _log,
+) -> Reservation:
+    """Claim a free car by locking its row and reserve it within a single transaction.
+
+    Number of statements of a trial is constant -- lock the first free car not locked by a concurrent request,
+    confirm under the lock that it is still free and insert the final reservation. Concurrent requests skip cars
+    locked by others (where the DB supports `SKIP LOCKED`), so they do not queue up on the same car. A car found
+    reserved under the lock (e.g. offered by a stale availability index) is skipped and the next candidate is tried
+    (at most `limit` trials). SQLite ignores row locks, but it serializes writing transactions on its own
+    (preferably with `"transaction_mode": "IMMEDIATE"`).
+    """
+
+    mode = RESERVATION_MODE_LOCKING
+
+    if dry_run:
+        with metrics.phase_seconds.time(phase='candidates'):
+            car = candidates.first()
+
+        if car is None:
+            _log.warn('no car available')
+            _record_outcome(mode, strategy, metrics.OUTCOME_NO_CAR_AVAILABLE)
+            raise ReservationNoCarAvailableError
+
+        _record_outcome(mode, strategy, metrics.OUTCOME_DRY_RUN)
+        return Reservation(to_rent_at=to_rent_at, to_return_at=to_return_at, car=car)
+
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    reserved_car_pks = []
+    for trial in range(1, limit + 1):
+        try:
+            with transaction.atomic():
+                with metrics.phase_seconds.time(phase='lock'):
+                    car = candidates.exclude(pk__in=reserved_car_pks).select_for_update(skip_locked=skip_locked).first()
+
+                if car is None:
+                    if reserved_car_pks:
+                        break
+
+                    if skip_locked and candidates.exists():
+                        _record_collision(to_rent_at)
+                        _record_outcome(mode, strategy, metrics.OUTCOME_FAILED_ATTEMPTS, trials=1)
+                        _log.warn('all available cars are being reserved concurrently', strategy=strategy)
+                        raise ReservationFailedAttemptError
+
+                    _log.warn('no car available')
+                    _record_outcome(mode, strategy, metrics.OUTCOME_NO_CAR_AVAILABLE)
+                    raise ReservationNoCarAvailableError
+
+                # reservations of the locked car committed before the lock was granted are visible now
+                with metrics.phase_seconds.time(phase='confirm'):
+                    count = count_reservations_for_car(car=car, to_rent_at=to_rent_at, to_return_at=to_return_at)
+                if count:
+                    _record_collision(to_rent_at)
+                    _log.warn('car reserved concurrently', car_id=car.car_id, trial=trial, strategy=strategy)
+                    reserved_car_pks.append(car.pk)
+                    if availability.is_enabled() and availability.index.loaded:
+                        # the index has been missing the reservation of the car
+                        availability.index.reload_car(car.pk)
+                    continue
+
+                with metrics.phase_seconds.time(phase='insert'):
+                    reservation = Reservation.objects.create(
+                        to_rent_at=to_rent_at,
+                        to_return_at=to_return_at,
+                        car=car,
+                        request_id=request_id,
+                    )
+        except IntegrityError:
+            # the same request ID has been used by a concurrent request in the meanwhile
+            if idempotent and (existing := _existing_reservation(request_id, to_rent_at, to_return_at)):
+                _record_outcome(mode, strategy, metrics.OUTCOME_EXISTING, trials=trial)
+                return existing
+            _record_outcome(mode, strategy, metrics.OUTCOME_INTERNAL_ERROR, trials=trial)
+            raise ReservationInternalError
+
+        _record_outcome(mode, strategy, metrics.OUTCOME_RESERVED, trials=trial)
+        _log.info('reservation done', trials=trial, strategy=strategy)
+        events.reservations_created([reservation])
+        return reservation
+
+    trials = len(reserved_car_pks)
+    _record_outcome(mode, strategy, metrics.OUTCOME_FAILED_ATTEMPTS, trials=trials)
+    _log.warn(f'failed to reserve, {trials} candidate cars reserved concurrently', strategy=strategy)
     raise ReservationFailedAttemptError
 
 
+MAX_BATCH_SIZE = 1000
+# rounds of a batch: requests whose cars turned out to be reserved concurrently are assigned other cars
+MAX_BATCH_ROUNDS = 3
+
+
+def _window_schedules(
+        start: datetime,
+        end: datetime,
+        car_pks: Iterable[int] | None = None,
+) -> dict[int, availability.CarSchedule]:
+    """Schedules of the (given) cars having any reservation within `[start, end)`."""
+
+    rows = Reservation.objects.filter(_during_that_time_filter(to_rent_at=start, to_return_at=end))
+    if car_pks is not None:
+        rows = rows.filter(car_id__in=car_pks)
+
+    schedules = defaultdict(availability.CarSchedule)
+    rows = rows.order_by('car_id', 'to_rent_at').values_list('car_id', 'to_rent_at', 'to_return_at', 'pk')
+    for car_pk, to_rent_at, to_return_at, pk in rows.iterator(chunk_size=2000):
+        schedules[car_pk].add(to_rent_at, to_return_at, pk)
+    return schedules
+
+
+def _assign_cars(
+        pending: list[int],
+        intervals: list[tuple[datetime, datetime]],
+        batch_id: uuid.UUID,
+        strategy: str,
+) -> dict[int, int]:
+    """Pick candidate cars (primary keys) for the pending requests (indices into `intervals`) without locking them.
+
+    Cars free during the whole window of the pending requests are interchangeable, so at most one per request is
+    selected (ordered by the car selection strategy) and they are assigned by greedy interval partitioning -- earliest
+    start first, reusing the car released the earliest. Only requests not served by them are fitted into schedules
+    of cars partially reserved within the window.
+    """
+
+    order = sorted(pending, key=lambda i: (intervals[i][0], i))
+    window_start = min(intervals[i][0] for i in pending)
+    window_end = max(intervals[i][1] for i in pending)
+    free_car_pks = iter(
+        _available_cars(window_start, window_end, limit=len(pending), request_id=batch_id, strategy=strategy)
+        .values_list('pk', flat=True)[:len(pending)]
+    )
+
+    assigned: dict[int, int] = {}
+    leftovers = []
+    released: list[tuple[datetime, int]] = []  # heap of (end of the last assigned request, car primary key)
+    for i in order:
+        start, end = intervals[i]
+        if released and released[0][0] <= start:
+            car_pk = heappop(released)[1]
+        elif (car_pk := next(free_car_pks, None)) is None:
+            leftovers.append(i)
+            continue
+        assigned[i] = car_pk
+        heappush(released, (end, car_pk))
+
+    if leftovers:
+        # any car reserved within the whole window (not just within the leftovers) may be free for some of them
+        schedules = _window_schedules(window_start, window_end)
+        # negative keys of not yet inserted reservations cannot clash with the real ones
+        for i, car_pk in assigned.items():
+            schedules[car_pk].add(*intervals[i], -(i + 1))
+        car_pks = sorted(schedules)
+        for i in leftovers:
+            for car_pk in car_pks:
+                if schedules[car_pk].is_free(*intervals[i]):
+                    schedules[car_pk].add(*intervals[i], -(i + 1))
+                    assigned[i] = car_pk
+                    break
+
+    return assigned
+
+
+def _used_request_ids(
+        requests: list[tuple[uuid.UUID, datetime, timedelta]],
+        intervals: list[tuple[datetime, datetime]],
+        indices: Iterable[int],
+        results: list[Reservation | ReservationError],
+        idempotent: bool,
+) -> set[int]:
+    """Resolve the requests (of the given indices) whose request IDs have been used already: by the existing
+    reservation of the same time interval (if idempotent) or by an error. Return indices of the resolved requests.
+    """
+
+    by_request_id = {requests[i][0]: i for i in indices if requests[i][0] is not None}
+    resolved = set()
+    for existing in Reservation.objects.filter(request_id__in=list(by_request_id)).select_related('car'):
+        i = by_request_id[existing.request_id]
+        if not idempotent:
+            results[i] = ReservationInternalError()
+        elif (existing.to_rent_at, existing.to_return_at) != intervals[i]:
+            results[i] = ReservationRequestIdConflictError()
+        else:
+            results[i] = existing
+        resolved.add(i)
+    return resolved
+
+
+def make_reservations(
+        requests: list[tuple[uuid.UUID, datetime, timedelta]],
+        idempotent: bool = False,
+) -> list[Reservation | ReservationError]:
+    """Make reservations for many `(request_id, to_rent_at, duration)` requests at once. Idempotent requests (e.g.
+    of a retried batch) get the already existing reservations of their request IDs instead of new ones. Request ID
+    used by more than a single request of the batch is rejected.
+
+    Candidate cars are picked without any lock (see `_assign_cars`), so that requests of the batch do not collide
+    with each other. Then only the picked cars are locked (ordered by primary key), their reservations made in the
+    meanwhile are re-checked and the reservations are written by a single bulk insert. Finally, the inserted
+    reservations are confirmed against concurrent reservations not locking cars, the same way as in
+    `make_reservation`. Requests colliding with concurrent ones are assigned other cars (at most `MAX_BATCH_ROUNDS`
+    rounds). Result for each request (in the original order) is either the reservation or the error explaining why
+    the request failed.
+    """
+
+    if len(requests) > MAX_BATCH_SIZE:
+        raise ValueError(f'too many reservations requested at once (max. {MAX_BATCH_SIZE})')
+
+    if not requests:
+        return []
+
+    intervals = [(to_rent_at, to_rent_at + duration) for _, to_rent_at, duration in requests]
+    strategy = selection.current_strategy()
+    # candidate cars of all the rounds are ordered as those of a single request
+    batch_id = uuid.uuid4()
+
+    _log = log.bind(ts=now())
+    _log.info(
+        'request_reservations',
+        count=len(requests),
+        window_start=min(start for start, _ in intervals),
+        window_end=max(end for _, end in intervals),
+    )
+
+    results: list[Reservation | ReservationError] = [ReservationNoCarAvailableError() for _ in requests]
+    reserved: list[Reservation] = []
+    pending = []
+    seen_request_ids = set()
+    for i, (request_id, _, _) in enumerate(requests):
+        if request_id is not None and request_id in seen_request_ids:
+            results[i] = ReservationRequestIdConflictError()
+            continue
+        seen_request_ids.add(request_id)
+        pending.append(i)
+    if idempotent:
+        existing = _used_request_ids(requests, intervals, pending, results, idempotent)
+        pending = [i for i in pending if i not in existing]
+
+    collisions = 0
+    for _ in range(MAX_BATCH_ROUNDS):
+        if not pending:
+            break
+        with metrics.phase_seconds.time(phase='batch_load'):
+            assigned = _assign_cars(pending, intervals, batch_id, strategy)
+        if not assigned:
+            break
+
+        pending = []
+        try:
+            with transaction.atomic():
+                with metrics.phase_seconds.time(phase='batch_lock'):
+                    cars = Car.objects.select_for_update().filter(pk__in=set(assigned.values())).order_by('pk')
+                    cars = {car.pk: car for car in cars}
+                    # reservations made since the candidates were picked
+                    schedules = _window_schedules(
+                        min(intervals[i][0] for i in assigned), max(intervals[i][1] for i in assigned), cars,
+                    )
+
+                new_reservations = []
+                for i, car_pk in assigned.items():
+                    if car_pk in cars and schedules[car_pk].is_free(*intervals[i]):
+                        results[i] = Reservation(
+                            to_rent_at=intervals[i][0],
+                            to_return_at=intervals[i][1],
+                            car=cars[car_pk],
+                            request_id=requests[i][0],
+                        )
+                        new_reservations.append(results[i])
+                    else:
+                        pending.append(i)
+
+                with metrics.phase_seconds.time(phase='batch_insert'):
+                    Reservation.objects.bulk_create(new_reservations)
+                # bulk insert does not send any signal, colliding reservations are uncounted by `post_delete` of their
+                # rollback
+                if counters.is_enabled():
+                    counters.reservations_created(new_reservations)
+
+                # check that no other reservation was done for the same in the meanwhile (by requests not locking cars)
+                new_pks = [reservation.pk for reservation in new_reservations]
+                colliding = Reservation.objects.filter(
+                    car=OuterRef('car'),
+                    to_rent_at__lt=OuterRef('to_return_at'),
+                    to_return_at__gt=OuterRef('to_rent_at'),
+                ).exclude(pk=OuterRef('pk')).exclude(pk__in=new_pks)
+                with metrics.phase_seconds.time(phase='batch_confirm'):
+                    colliding_pks = set(
+                        Reservation.objects.filter(Exists(colliding), pk__in=new_pks).values_list('pk', flat=True)
+                    )
+                if colliding_pks:
+                    with metrics.phase_seconds.time(phase='rollback'):
+                        Reservation.objects.filter(pk__in=colliding_pks).delete()
+        except IntegrityError:
+            # request IDs used by concurrent requests in the meanwhile, the whole round has been rolled back
+            for i in assigned:
+                results[i] = ReservationFailedAttemptError()
+            used = _used_request_ids(requests, intervals, assigned, results, idempotent)
+            pending = [i for i in assigned if i not in used]
+            continue
+
+        for i in assigned:
+            result = results[i]
+            if isinstance(result, Reservation) and result.pk in colliding_pks:
+                pending.append(i)
+            elif isinstance(result, Reservation):
+                reserved.append(result)
+
+        for i in pending:
+            _record_collision(intervals[i][0])
+            results[i] = ReservationFailedAttemptError()
+        collisions += len(pending)
+        if not pending:
+            break
+
+    # bulk insert does not send any signal
+    signals.reservations_bulk_created(reserved)
+    events.reservations_created(reserved)
+
+    _log.info('reservations done', count=len(requests), reserved=len(reserved), collisions=collisions)
+    return results
+
+
+def _validate_time_window(start: datetime, end: datetime, min_duration: timedelta | None) -> timedelta:
+    if start >= end:
+        raise ValueError('time window has to end after its start')
+
+    if min_duration is None:
+        return timedelta(0)
+    if min_duration < timedelta(0):
+        raise ValueError('negative minimal duration')
+
+    return min_duration
+
+
+def free_slots_per_car(
+        start: datetime,
+        end: datetime,
+        min_duration: timedelta | None = None,
+        chunk_size: int = 2000,
+        after_pk: int | None = None,
+        limit: int | None = None,
+) -> Iterator[tuple[Car, list[tuple[datetime, datetime]]]]:
+    """Stream free time slots of each car (ordered by primary key) within the given time window, optionally only of
+    at most `limit` cars following the car of the given primary key.
+
+    Both cars and reservations are read by a single ordered pass, so memory consumption does not depend on
+    the size of the fleet or on the width of the window.
+    """
+
+    min_duration = _validate_time_window(start, end, min_duration)
+
+    cars = Car.objects.select_related('model__make').order_by('pk')
+    reservations = Reservation.objects.filter(_during_that_time_filter(to_rent_at=start, to_return_at=end))
+    if after_pk is not None:
+        cars = cars.filter(pk__gt=after_pk)
+        reservations = reservations.filter(car_id__gt=after_pk)
+    if limit is not None:
+        cars = list(cars[:limit])
+        if not cars:
+            return
+        # reservations of the page only
+        reservations = reservations.filter(car_id__lte=cars[-1].pk)
+    else:
+        cars = cars.iterator(chunk_size=chunk_size)
+    reservations = reservations.order_by('car_id', 'to_rent_at').values_list(
+        'car_id', 'to_rent_at', 'to_return_at',
+    ).iterator(chunk_size=chunk_size)
+
+    pending = next(reservations, None)
+    for car in cars:
+        # reservations of cars deleted in the meanwhile
+        while pending is not None and pending[0] < car.pk:
+            pending = next(reservations, None)
+
+        intervals = []
+        while pending is not None and pending[0] == car.pk:
+            intervals.append(pending[1:])
+            pending = next(reservations, None)
+
+        yield car, list(availability.free_gaps(intervals, start, end, min_duration))
+
+
+def free_slots_of_fleet(
+        start: datetime,
+        end: datetime,
+        min_duration: timedelta | None = None,
+        chunk_size: int = 2000,
+) -> Iterator[tuple[datetime, datetime, int]]:
+    """Stream time ranges within the given time window when at least one car is free (together with the lowest
+    number of free cars during each range). Reservations are read by a single pass ordered by their start.
+    """
+
+    min_duration = _validate_time_window(start, end, min_duration)
+
+    reservations = Reservation.objects.filter(
+        _during_that_time_filter(to_rent_at=start, to_return_at=end),
+    ).order_by('to_rent_at').values_list('car_id', 'to_rent_at', 'to_return_at').iterator(chunk_size=chunk_size)
+
+    yield from availability.fleet_free_ranges(Car.objects.count(), reservations, start, end, min_duration)
+
+
 def fetch_reservations():
     return Reservation.objects.all()
 
 
 def fetch_reservation_by_request_id(request_id):
+    """Retrieve reservation by its (unique) request ID, recently retrieved ones (including unknown request IDs) are
+    served from an in-process cache with short time to live.
+    """
+
+    if (reservation := caches.reservation_by_request_id.get(request_id)) is not MISSING:
+        return reservation
+
     try:
-        return Reservation.objects.get(request_id=request_id)
+        reservation = Reservation.objects.get(request_id=request_id)
     except Reservation.DoesNotExist:
-        return None
+        reservation = None
+
+    caches.reservation_by_request_id.set(request_id, reservation)
+    return reservation
@@ -0,0 +1,69 @@
+"""Signal receivers keeping in-memory structures in sync with reservations and cars stored in DB."""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.carpool.models import Car
+from apps.carpool.signals import cars_bulk_created
+from . import caches, utilization
+from .availability import index
+from .models import Reservation
+
+
+def _update_index(method, *args):
+    """Apply the change to the availability index (if loaded) once the current transaction (if any) is committed, so
+    rows rolled back (e.g. of failed reservation attempts or batches) never get into the index.
+    """
+
+    if index.loaded:
+        transaction.on_commit(lambda: index.loaded and method(*args))
+
+
+def _update_matrices(method, *args):
+    """Apply the change to the cached utilization matrices (if any) once the current transaction is committed."""
+
+    if utilization.matrices.active:
+        transaction.on_commit(lambda: method(*args))
+
+
+@receiver(post_save, sender=Reservation)
+def _reservation_saved(sender, instance: Reservation, **kwargs):
+    _update_index(index.add, instance.car_id, instance.to_rent_at, instance.to_return_at, instance.pk)
+    _update_matrices(utilization.matrices.add, instance.pk, instance.car_id, instance.to_rent_at, instance.to_return_at)
+    if instance.request_id is not None:
+        caches.reservation_by_request_id.delete(instance.request_id)
+
+
+@receiver(post_delete, sender=Reservation)
+def _reservation_deleted(sender, instance: Reservation, **kwargs):
+    _update_index(index.remove, instance.car_id, instance.pk)
+    _update_matrices(utilization.matrices.remove, instance.pk)
+    if instance.request_id is not None:
+        caches.reservation_by_request_id.delete(instance.request_id)
+
+
+@receiver(post_save, sender=Car)
+def _car_saved(sender, instance: Car, created: bool, **kwargs):
+    if created:
+        _update_index(index.add_car, instance.pk)
+        _update_matrices(utilization.matrices.add_car, instance.pk)
+
+
+@receiver(cars_bulk_created)
+def _cars_bulk_created(sender, cars: list[Car], **kwargs):
+    for car in cars:
+        _car_saved(Car, car, created=True)
+
+
+@receiver(post_delete, sender=Car)
+def _car_deleted(sender, instance: Car, **kwargs):
+    _update_index(index.remove_car, instance.pk)
+    _update_matrices(utilization.matrices.remove_car, instance.pk)
+
+
+def reservations_bulk_created(reservations: list[Reservation]):
+    """Counterpart of `post_save` receivers for reservations inserted by `bulk_create` (that sends no signals)."""
+
+    for reservation in reservations:
+        _reservation_saved(Reservation, reservation)
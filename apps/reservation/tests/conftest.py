@@ -0,0 +1,30 @@
+import pytest
+from django.utils.timezone import datetime, timedelta, timezone
+
+from apps.carpool.models import CarMake, CarModel, Car
+
+
+@pytest.fixture
+def model_Skoda_Octavia(db) -> CarModel:
+    make = CarMake.objects.create(name='Skoda', official_name='Skoda auto a.s.')
+    return CarModel.objects.create(name='Octavia', make=make)
+
+
+@pytest.fixture
+def car_C1(model_Skoda_Octavia: CarModel) -> Car:
+    return Car.objects.create(car_id='C1', registration_number='1AB 2345', model=model_Skoda_Octavia)
+
+
+@pytest.fixture
+def car_C2(model_Skoda_Octavia: CarModel) -> Car:
+    return Car.objects.create(car_id='C2', registration_number='2AB 2345', model=model_Skoda_Octavia)
+
+
+@pytest.fixture
+def noon() -> datetime:
+    return datetime(2030, 1, 1, 12, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def hour() -> timedelta:
+    return timedelta(hours=1)
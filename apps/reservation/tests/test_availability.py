@@ -0,0 +1,138 @@
+import uuid
+
+import pytest
+from django.db import transaction
+
+from apps.carpool.models import Car
+from apps.reservation import services as api
+from apps.reservation.availability import CarSchedule, fleet_free_ranges, free_gaps, index
+from apps.reservation.models import Reservation
+
+
+@pytest.fixture
+def availability_index(settings):
+    settings.RESERVATION_AVAILABILITY_INDEX = True
+    index.clear()
+    yield index
+    index.clear()
+
+
+def test__car_schedule__is_free(noon, hour):
+    schedule = CarSchedule()
+    assert schedule.is_free(noon, noon + hour)
+
+    schedule.add(noon, noon + hour, pk=1)
+    schedule.add(noon + 3 * hour, noon + 4 * hour, pk=2)
+    assert len(schedule) == 2
+
+    # touching intervals do not collide
+    assert schedule.is_free(noon - hour, noon)
+    assert schedule.is_free(noon + hour, noon + 3 * hour)
+    # overlaps on start, end, inside and around
+    assert not schedule.is_free(noon - hour / 2, noon + hour / 2)
+    assert not schedule.is_free(noon + hour / 2, noon + 2 * hour)
+    assert not schedule.is_free(noon + hour / 4, noon + hour / 2)
+    assert not schedule.is_free(noon - hour, noon + 5 * hour)
+
+
+def test__car_schedule__long_interval_before_short_ones(noon, hour):
+    schedule = CarSchedule()
+    schedule.add(noon, noon + 10 * hour, pk=1)
+    schedule.add(noon + hour, noon + 2 * hour, pk=2)
+    assert not schedule.is_free(noon + 5 * hour, noon + 6 * hour)
+
+    assert schedule.remove(1)
+    assert not schedule.remove(1)
+    assert schedule.is_free(noon + 5 * hour, noon + 6 * hour)
+
+
+def test__car_schedule__same_starts(noon, hour):
+    schedule = CarSchedule()
+    for pk in (1, 2, 3):
+        schedule.add(noon, noon + pk * hour, pk=pk)
+
+    assert schedule.remove(2)
+    schedule.add(noon + hour, noon + 2 * hour, pk=3)
+    assert list(schedule) == [(noon, noon + hour, 1), (noon + hour, noon + 2 * hour, 3)]
+
+
+def test__availability_index__load_and_sync(
+        availability_index, car_C1: Car, car_C2: Car, noon, hour, django_capture_on_commit_callbacks,
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        Reservation.objects.create(car=car_C1, to_rent_at=noon, to_return_at=noon + hour)
+    assert availability_index.free_cars(noon, noon + hour) == [car_C2.pk]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        reservation = Reservation.objects.create(car=car_C2, to_rent_at=noon, to_return_at=noon + hour)
+    assert availability_index.free_cars(noon, noon + hour) == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        reservation.delete()
+    assert availability_index.free_cars(noon, noon + hour) == [car_C2.pk]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        car_C2.delete()
+    assert availability_index.free_cars(noon, noon + hour) == []
+    assert availability_index.free_cars(noon + hour, noon + 2 * hour, limit=1) == [car_C1.pk]
+
+
+def test__availability_index__rolled_back(
+        availability_index, car_C1: Car, noon, hour, django_capture_on_commit_callbacks,
+):
+    availability_index.load()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        with pytest.raises(RuntimeError), transaction.atomic():
+            Reservation.objects.create(car=car_C1, to_rent_at=noon, to_return_at=noon + hour)
+            raise RuntimeError
+    # no phantom interval of the rolled back reservation
+    assert availability_index.free_cars(noon, noon + hour) == [car_C1.pk]
+
+
+def test__make_reservation__with_index(
+        availability_index, car_C1: Car, car_C2: Car, noon, hour, django_capture_on_commit_callbacks,
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        first = api.make_reservation(request_id=uuid.uuid4(), to_rent_at=noon, duration=hour)
+        second = api.make_reservation(request_id=uuid.uuid4(), to_rent_at=noon, duration=hour)
+    assert {first.car_id, second.car_id} == {car_C1.pk, car_C2.pk}
+    assert availability_index.free_cars(noon, noon + hour) == []
+
+
+def test__make_reservation__with_stale_index(availability_index, car_C1: Car, car_C2: Car, noon, hour):
+    availability_index.load()
+    # reservation stored behind the index back (e.g. by another process)
+    availability_index.remove(car_C1.pk, Reservation.objects.create(
+        car=car_C1, to_rent_at=noon, to_return_at=noon + hour,
+    ).pk)
+
+    reservation = api.make_reservation(request_id=uuid.uuid4(), to_rent_at=noon, duration=hour)
+    assert reservation.car_id == car_C2.pk
+    assert Reservation.objects.count() == 2
+
+
+def test__free_gaps(noon, hour):
+    intervals = [(noon + hour, noon + 2 * hour), (noon + hour, noon + 3 * hour), (noon + 4 * hour, noon + 5 * hour)]
+    assert list(free_gaps(intervals, noon, noon + 6 * hour)) == [
+        (noon, noon + hour), (noon + 3 * hour, noon + 4 * hour), (noon + 5 * hour, noon + 6 * hour),
+    ]
+    assert list(free_gaps(intervals, noon + hour, noon + 5 * hour)) == [(noon + 3 * hour, noon + 4 * hour)]
+    assert list(free_gaps(intervals, noon, noon + 6 * hour, min_duration=2 * hour)) == []
+    assert list(free_gaps([], noon, noon + hour)) == [(noon, noon + hour)]
+
+
+def test__fleet_free_ranges(noon, hour):
+    intervals = [
+        (1, noon - hour, noon + 2 * hour),
+        (2, noon + hour, noon + 3 * hour),
+        (1, noon + 2 * hour, noon + 4 * hour),
+    ]
+    assert list(fleet_free_ranges(2, intervals, noon, noon + 5 * hour)) == [
+        (noon, noon + hour, 1), (noon + 3 * hour, noon + 5 * hour, 1),
+    ]
+    assert list(fleet_free_ranges(3, intervals, noon, noon + 5 * hour)) == [(noon, noon + 5 * hour, 1)]
+    assert list(fleet_free_ranges(2, intervals, noon, noon + 5 * hour, min_duration=2 * hour)) == [
+        (noon + 3 * hour, noon + 5 * hour, 1),
+    ]
+    assert list(fleet_free_ranges(1, [], noon, noon + hour)) == [(noon, noon + hour, 1)]
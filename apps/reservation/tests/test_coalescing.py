@@ -0,0 +1,113 @@
+import asyncio
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory
+
+from apps.api.graphql.schema import schema
+from apps.api.graphql.views import AsyncGraphQLView
+from apps.carpool.models import Car, CarMake, CarModel
+from apps.reservation.coalescing import ReservationCoalescer, coalescer
+from apps.reservation.errors import ReservationNoCarAvailableError
+from apps.reservation.models import Reservation
+
+
+@pytest.fixture
+def fleet(transactional_db) -> list[Car]:
+    # coalesced reservations are made by another thread (and DB connection), so the data has to be committed
+    model = CarModel.objects.create(name='Octavia', make=CarMake.objects.create(name='Skoda', official_name='Skoda'))
+    return [
+        Car.objects.create(car_id=f'C{i}', registration_number=f'{i}AB 0000', model=model)
+        for i in range(1, 4)
+    ]
+
+
+def test__reservation_coalescer__batches_concurrent_requests(fleet: list[Car], noon, hour):
+    local_coalescer = ReservationCoalescer(window=0.2)
+    try:
+        futures = [local_coalescer.submit(uuid.uuid4(), noon, hour) for _ in range(len(fleet) + 1)]
+        outcomes = []
+        for future in futures:
+            try:
+                outcomes.append(future.result(timeout=10))
+            except ReservationNoCarAvailableError as ex:
+                outcomes.append(ex)
+    finally:
+        local_coalescer.stop()
+
+    # deterministic assignment in the order of arrival
+    assert [outcome.car_id for outcome in outcomes[:-1]] == [car.pk for car in fleet]
+    assert isinstance(outcomes[-1], ReservationNoCarAvailableError)
+    assert Reservation.objects.count() == len(fleet)
+
+
+def test__reservation_coalescer__withdrawn_on_timeout(fleet: list[Car], noon, hour):
+    local_coalescer = ReservationCoalescer(window=0.2)
+    try:
+        with pytest.raises(TimeoutError):
+            local_coalescer.reserve(uuid.uuid4(), noon, hour, timeout=0.01)
+        reservation = local_coalescer.reserve(uuid.uuid4(), noon, hour, timeout=10)
+    finally:
+        local_coalescer.stop()
+
+    # the request timed out is not made by the batch
+    assert list(Reservation.objects.values_list('pk', flat=True)) == [reservation.pk]
+
+
+def test__reservation_coalescer__async_withdrawn_on_timeout(fleet: list[Car], noon, hour):
+    local_coalescer = ReservationCoalescer(window=0.2)
+
+    async def reserve() -> Reservation:
+        with pytest.raises(TimeoutError):
+            await local_coalescer.reserve_async(uuid.uuid4(), noon, hour, timeout=0.01)
+        return await local_coalescer.reserve_async(uuid.uuid4(), noon, hour, timeout=10)
+
+    try:
+        reservation = asyncio.run(reserve())
+    finally:
+        local_coalescer.stop()
+
+    assert list(Reservation.objects.values_list('pk', flat=True)) == [reservation.pk]
+
+
+def test__reserve__mutation_coalesced_asynchronously(settings, fleet: list[Car], noon, monkeypatch):
+    settings.RESERVATION_COALESCING = True
+
+    def reserve(*args, **kwargs):
+        raise AssertionError('blocking variant used')
+
+    monkeypatch.setattr(coalescer, 'reserve', reserve)
+    body = {
+        'query': 'mutation ($input: ReserveInput!) { reserve(input: $input) { payload { car { carId } } } }',
+        'variables': {'input': {'toRentAt': noon.isoformat(), 'durationMinutes': 60}},
+    }
+    request = RequestFactory().post('/gql', data=json.dumps(body), content_type='application/json')
+    try:
+        response = async_to_sync(AsyncGraphQLView.as_view())(request)
+    finally:
+        coalescer.stop()
+
+    assert json.loads(response.content)['data'] == {'reserve': {'payload': {'car': {'carId': 'C1'}}}}
+
+
+def test__reserve__mutation_coalesced(settings, fleet: list[Car], noon, hour):
+    settings.RESERVATION_COALESCING = True
+    settings.RESERVATION_COALESCING_WINDOW_MS = 50
+
+    def reserve(_):
+        return schema.execute(
+            'mutation ($input: ReserveInput!) { reserve(input: $input) { payload { car { carId } } } }',
+            variable_values={'input': {'toRentAt': noon.isoformat(), 'durationMinutes': 60}},
+        )
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(fleet)) as executor:
+            results = list(executor.map(reserve, range(len(fleet))))
+    finally:
+        coalescer.stop()
+
+    assert all(result.errors is None for result in results)
+    assert sorted(result.data['reserve']['payload']['car']['carId'] for result in results) == ['C1', 'C2', 'C3']
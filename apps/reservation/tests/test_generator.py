@@ -0,0 +1,102 @@
+import random
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db.models import F
+
+from apps.carpool import services
+from apps.carpool.models import Car, CarMake, CarModel
+from apps.reservation import generator
+from apps.reservation.models import Reservation
+from apps.reservation.services import count_reservations_for_car
+
+
+@pytest.mark.parametrize('kind', generator.DISTRIBUTIONS)
+def test__duration_distribution__sample_within_bounds(kind: str):
+    durations = generator.DurationDistribution(
+        kind=kind,
+        mean=timedelta(hours=2),
+        minimum=timedelta(minutes=30),
+        maximum=timedelta(hours=8),
+    )
+    rng = random.Random(1)
+    samples = [durations.sample(rng) for _ in range(1000)]
+    assert all(timedelta(minutes=30) <= sample <= timedelta(hours=8) for sample in samples)
+    assert all(sample.total_seconds() % 60 == 0 for sample in samples)
+
+
+def test__duration_distribution__invalid():
+    with pytest.raises(ValueError):
+        generator.DurationDistribution(kind='normal')
+    with pytest.raises(ValueError):
+        generator.DurationDistribution(mean=timedelta(minutes=10), minimum=timedelta(minutes=30))
+
+
+def test__generate_fleet(car_C1: Car, noon):
+    generated = generator.generate_fleet(
+        makes=2, models_per_make=3, cars=7, reservations=45, start=noon, density=0.8, chunk_size=4,
+    )
+    # the existing make Skoda is reused
+    assert (generated.makes, generated.models, generated.cars, generated.reservations) == (1, 6, 7, 45)
+    assert CarMake.objects.count() == 2
+    assert CarModel.objects.count() == 6 + 1
+    # IDs of generated cars follow the existing ones
+    assert set(Car.objects.values_list('car_id', flat=True)) == {f'C{i}' for i in range(1, 9)}
+    assert Reservation.objects.count() == 45
+    assert Reservation.objects.filter(to_rent_at__lt=noon).count() == 0
+    assert Reservation.objects.filter(to_return_at__lte=F('to_rent_at')).count() == 0
+
+    for reservation in Reservation.objects.all():
+        assert count_reservations_for_car(reservation.car, reservation.to_rent_at, reservation.to_return_at) == 1
+
+
+def test__generate_fleet__reproducible(db, noon):
+    def generate() -> list:
+        generator.generate_fleet(makes=1, models_per_make=2, cars=3, reservations=10, start=noon, seed=42)
+        rows = list(Reservation.objects.order_by('pk').values_list(
+            'car__car_id', 'to_rent_at', 'to_return_at',
+        ))
+        Car.objects.all().delete()
+        return rows
+
+    assert generate() == generate()
+
+
+def test__generate_fleet__repeated(db, noon):
+    generator.generate_fleet(makes=2, models_per_make=2, cars=3, reservations=10, start=noon, seed=42)
+    generated = generator.generate_fleet(makes=3, models_per_make=2, cars=3, reservations=10, start=noon, seed=42)
+
+    # makes and models are reused, cars and reservations are added
+    assert (generated.makes, generated.models, generated.cars, generated.reservations) == (1, 2, 3, 10)
+    assert CarMake.objects.count() == 3
+    assert CarModel.objects.count() == 6
+    assert Car.objects.count() == 6
+    assert Reservation.objects.count() == 20
+    services.get_or_create_car('Skoda', 'Model 1', 'C7', '1AB 1234')
+
+
+def test__generate_fleet__rolled_back(db, noon, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError('failure')
+
+    monkeypatch.setattr(Reservation.objects, 'bulk_create', fail)
+    with pytest.raises(RuntimeError):
+        generator.generate_fleet(makes=2, models_per_make=2, cars=3, reservations=10, start=noon)
+
+    assert not CarMake.objects.exists()
+    assert not Car.objects.exists()
+
+
+def test__generate_fleet__command(db):
+    out = StringIO()
+    call_command(
+        'generate_fleet', '--cars=5', '--reservations=12', '--from=2030-01-01T12:00:00Z',
+        '--duration-distribution=fixed', '--mean-duration-minutes=60', '--density=1', stdout=out,
+    )
+    assert out.getvalue().strip() == 'Generated 10 makes, 50 models, 5 cars and 12 reservations.'
+    # fully booked cars with fixed durations have back-to-back reservations
+    reservation = Reservation.objects.filter(car__car_id='C1').order_by('to_rent_at').last()
+    assert reservation.to_rent_at.isoformat() == '2030-01-01T14:00:00+00:00'
+    assert reservation.to_return_at - reservation.to_rent_at == timedelta(hours=1)
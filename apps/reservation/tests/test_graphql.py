@@ -0,0 +1,116 @@
+import uuid
+
+from apps.api.graphql.schema import schema
+from apps.carpool.models import Car
+from apps.reservation.models import Reservation
+
+
+def test__reserve_many__mutation(car_C1: Car, noon, hour):
+    result = schema.execute(
+        '''
+        mutation ($input: ReserveManyInput!) {
+            reserveMany(input: $input) {
+                payload { error reservation { requestId car { carId } } }
+            }
+        }
+        ''',
+        variable_values={'input': {'items': [
+            {'toRentAt': noon.isoformat(), 'durationMinutes': 60},
+            {'toRentAt': noon.isoformat(), 'durationMinutes': 30},
+        ]}},
+    )
+    assert result.errors is None
+    first, second = result.data['reserveMany']['payload']
+    assert first['error'] is None
+    assert first['reservation']['car']['carId'] == car_C1.car_id
+    assert first['reservation']['requestId'] is not None
+    assert second == {'error': 'no car available for reservation', 'reservation': None}
+    assert Reservation.objects.count() == 1
+
+
+def test__reserve_many__idempotency_keys(car_C1: Car, noon, hour):
+    mutation = '''
+        mutation ($input: ReserveManyInput!) { reserveMany(input: $input) { payload { error reservation { id } } } }
+    '''
+    key = '0e6c6f39-5e0c-4e5b-9a3f-6a1b8d3f0c11'
+    items = [{'toRentAt': noon.isoformat(), 'durationMinutes': 60, 'idempotencyKey': key}]
+
+    first = schema.execute(mutation, variable_values={'input': {'items': items}})
+    retried = schema.execute(mutation, variable_values={'input': {'items': items}})
+    assert first.errors is None and retried.errors is None
+    assert retried.data == first.data
+    assert Reservation.objects.count() == 1
+
+    result = schema.execute(mutation, variable_values={'input': {'items': [
+        {'toRentAt': (noon + hour).isoformat(), 'durationMinutes': 60, 'idempotencyKey': str(uuid.uuid4())},
+    ] * 2}})
+    assert [item['error'] for item in result.data['reserveMany']['payload']] == [
+        None, 'request ID already used for a different reservation',
+    ]
+
+
+def test__availability__query(car_C1: Car, noon, hour):
+    Reservation.objects.create(car=car_C1, to_rent_at=noon + hour, to_return_at=noon + 2 * hour)
+
+    result = schema.execute(
+        '''
+        query ($from: DateTime!, $to: DateTime!) {
+            availability(from: $from, to: $to, minDurationMinutes: 60) {
+                cars { car { carId } freeSlots { start end durationMinutes } }
+                fleet { durationMinutes freeCars }
+            }
+        }
+        ''',
+        variable_values={'from': noon.isoformat(), 'to': (noon + 4 * hour).isoformat()},
+    )
+    assert result.errors is None
+    assert result.data['availability'] == {
+        'cars': [{
+            'car': {'carId': car_C1.car_id},
+            'freeSlots': [
+                {'start': noon.isoformat(), 'end': (noon + hour).isoformat(), 'durationMinutes': 60},
+                {'start': (noon + 2 * hour).isoformat(), 'end': (noon + 4 * hour).isoformat(), 'durationMinutes': 120},
+            ],
+        }],
+        'fleet': [{'durationMinutes': 60, 'freeCars': 1}, {'durationMinutes': 120, 'freeCars': 1}],
+    }
+
+
+def test__availability__cars_paginated(car_C1: Car, car_C2: Car, noon, hour, django_assert_num_queries):
+    query = '''
+        query ($after: String) {
+            availability(from: "2030-01-01T12:00:00Z", to: "2030-01-01T13:00:00Z") {
+                cars(first: 1, after: $after) { cursor car { carId } freeSlots { durationMinutes } }
+            }
+        }
+    '''
+
+    # the page of cars and reservations of the page
+    with django_assert_num_queries(2):
+        result = schema.execute(query)
+    assert result.errors is None
+    [first] = result.data['availability']['cars']
+    assert first['car']['carId'] == car_C1.car_id
+
+    result = schema.execute(query, variable_values={'after': first['cursor']})
+    [second] = result.data['availability']['cars']
+    assert second['car']['carId'] == car_C2.car_id
+    assert second['freeSlots'] == [{'durationMinutes': 60}]
+
+    result = schema.execute(query, variable_values={'after': second['cursor']})
+    assert result.data['availability']['cars'] == []
+
+
+def test__reserve__idempotency_key(car_C1: Car, noon, hour):
+    key = '0e6c6f39-5e0c-4e5b-9a3f-6a1b8d3f0c11'
+    mutation = '''
+        mutation ($input: ReserveInput!) { reserve(input: $input) { payload { id requestId } } }
+    '''
+    variables = {'input': {'toRentAt': noon.isoformat(), 'durationMinutes': 60, 'idempotencyKey': key}}
+
+    first = schema.execute(mutation, variable_values=variables)
+    retried = schema.execute(mutation, variable_values=variables)
+    assert first.errors is None and retried.errors is None
+    assert first.data == retried.data
+    assert first.data['reserve']['payload']['requestId'] == key
+    assert Reservation.objects.count() == 1
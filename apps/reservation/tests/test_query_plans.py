@@ -0,0 +1,64 @@
+"""EXPLAIN-based regression tests making sure that overlap lookups are served by indexes on reservations."""
+
+import re
+
+import pytest
+from django.db import connection
+from django.db.models import OuterRef, Exists
+
+from apps.api.graphql.pagination import keyset_filter
+from apps.carpool.models import Car
+from apps.reservation.models import Reservation
+from apps.reservation.services import _during_that_time_filter
+
+
+_reservation_scan = {
+    # SQLite reports full table scan as `SCAN <table or alias>`, index usage as `SEARCH ... USING INDEX`
+    'sqlite': re.compile(r'\bSCAN (reservation_reservation|U\d+)\b(?! USING (COVERING )?INDEX)'),
+    'postgresql': re.compile(r'Seq Scan on reservation_reservation'),
+}
+
+
+@pytest.fixture
+def plan_of(db):
+    if connection.vendor not in _reservation_scan:
+        pytest.skip(f'no plan checks for {connection.vendor}')
+
+    if connection.vendor == 'postgresql':
+        # tiny test tables would be always scanned sequentially
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def _plan_of(queryset) -> str:
+        plan = queryset.explain()
+        assert not _reservation_scan[connection.vendor].search(plan), plan
+        return plan
+
+    return _plan_of
+
+
+def test__count_reservations_for_car__uses_index(plan_of, car_C1, noon, hour):
+    plan = plan_of(Reservation.objects.filter(_during_that_time_filter(noon, noon + hour), car=car_C1))
+    assert 'reservation_car_period_idx' in plan
+
+
+def test__available_cars__uses_index(plan_of, noon, hour):
+    no_reservation_filter = ~Exists(
+        Reservation.objects.filter(_during_that_time_filter(noon, noon + hour), car=OuterRef('pk'))
+    )
+    plan = plan_of(Car.objects.filter(no_reservation_filter)[:11])
+    assert 'reservation_car_period_idx' in plan
+
+
+def test__reservations_in_interval__uses_index(plan_of, noon, hour):
+    plan = plan_of(Reservation.objects.filter(_during_that_time_filter(noon, noon + hour)))
+    assert 'reservation_period_idx' in plan
+
+
+def test__reservations_page__uses_index(plan_of, noon):
+    page = Reservation.objects.filter(keyset_filter(('to_rent_at', 'id'), [noon, 1])).order_by('to_rent_at', 'id')[:11]
+    plan = plan_of(page)
+    assert 'reservation_period_idx' in plan
+    # rows are read in the order of the index
+    assert 'TEMP B-TREE' not in plan
+    assert 'Sort' not in plan
@@ -0,0 +1,100 @@
+import uuid
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+
+from apps.carpool.models import Car
+from apps.reservation import availability, metrics, selection, services as api
+from apps.reservation.models import Reservation
+
+
+@pytest.fixture
+def fleet(model_Skoda_Octavia) -> list[Car]:
+    return [
+        Car.objects.create(car_id=f'C{i}', registration_number=f'{i}AB 0000', model=model_Skoda_Octavia)
+        for i in range(1, 9)
+    ]
+
+
+@pytest.mark.parametrize('strategy', [
+    selection.STRATEGY_DEFAULT,
+    selection.STRATEGY_RANDOM,
+    selection.STRATEGY_SHARDED,
+    selection.STRATEGY_LEAST_RECENTLY_RESERVED,
+])
+def test__order_candidates__keeps_all_cars(fleet: list[Car], strategy: str):
+    ordered = selection.order_candidates(Car.objects.all(), request_id=uuid.uuid4(), strategy=strategy)
+    assert sorted(car.pk for car in ordered) == [car.pk for car in fleet]
+
+
+def test__order_candidates__sharded_spreads_requests(fleet: list[Car]):
+    first_cars = {
+        selection.order_candidates(Car.objects.all(), request_id=uuid.uuid4(), strategy=selection.STRATEGY_SHARDED)
+        .first().pk
+        for _ in range(50)
+    }
+    assert len(first_cars) > 1
+
+    # the same request always starts with the same car
+    request_id = uuid.uuid4()
+    assert len({
+        selection.order_candidates(Car.objects.all(), request_id=request_id, strategy=selection.STRATEGY_SHARDED)
+        .first().pk
+        for _ in range(5)
+    }) == 1
+
+
+def test__order_candidates__least_recently_reserved(fleet: list[Car], noon, hour):
+    for car in fleet[:-1]:
+        Reservation.objects.create(car=car, to_rent_at=noon, to_return_at=noon + hour)
+
+    ordered = list(selection.order_candidates(
+        Car.objects.all(), request_id=uuid.uuid4(), strategy=selection.STRATEGY_LEAST_RECENTLY_RESERVED,
+    ))
+    assert ordered[0].pk == fleet[-1].pk
+    assert ordered[1].pk == fleet[0].pk
+
+
+@pytest.mark.parametrize('index_enabled', [False, True])
+def test__available_cars__bounded_pool(settings, fleet: list[Car], noon, hour, index_enabled: bool):
+    settings.RESERVATION_AVAILABILITY_INDEX = index_enabled
+    settings.RESERVATION_CAR_SELECTION_POOL = 3
+    availability.index.clear()
+    Reservation.objects.create(car=fleet[6], to_rent_at=noon, to_return_at=noon + hour)
+
+    pk_positions = {car.pk: i for i, car in enumerate(fleet)}
+    for _ in range(20):
+        candidates = api._available_cars(
+            noon, noon + hour, limit=2, request_id=uuid.uuid4(), strategy=selection.STRATEGY_RANDOM,
+        )
+        positions = sorted(pk_positions[car.pk] for car in candidates)
+        # free cars following each other in the fleet (wrapping around)
+        assert len(positions) == 3
+        assert 6 not in positions
+        assert positions in ([0, 1, 2], [1, 2, 3], [2, 3, 4], [3, 4, 5], [4, 5, 7], [0, 5, 7], [0, 1, 7])
+
+    # the pool is never smaller than the number of the requested cars
+    candidates = api._available_cars(
+        noon, noon + hour, limit=5, request_id=uuid.uuid4(), strategy=selection.STRATEGY_SHARDED,
+    )
+    assert len(candidates) == 5
+    availability.index.clear()
+
+
+def test__current_strategy__unknown(settings):
+    settings.RESERVATION_CAR_SELECTION = 'first come first served'
+    with pytest.raises(ImproperlyConfigured):
+        selection.current_strategy()
+
+
+def test__make_reservation__retry_rate(settings, fleet: list[Car], noon, hour):
+    settings.RESERVATION_CAR_SELECTION = selection.STRATEGY_RANDOM
+    metrics.trials.reset()
+
+    reserved = {
+        api.make_reservation(request_id=uuid.uuid4(), to_rent_at=noon, duration=hour).car_id
+        for _ in range(len(fleet))
+    }
+    assert reserved == {car.pk for car in fleet}
+    assert selection.retry_rate(selection.STRATEGY_RANDOM) == 0.0
+    assert metrics.trials.count(mode=api.RESERVATION_MODE_OPTIMISTIC, strategy=selection.STRATEGY_RANDOM) == len(fleet)
@@ -0,0 +1,328 @@
+import uuid
+
+import pytest
+
+from apps.carpool.models import Car
+from apps.reservation import caches, metrics, services as api
+from apps.reservation.errors import (
+    ReservationFailedAttemptError,
+    ReservationInternalError,
+    ReservationNoCarAvailableError,
+    ReservationRequestIdConflictError,
+)
+from apps.reservation.models import Reservation
+from libs.metrics import registry as metrics_registry
+
+
+def test__count_reservations_for_car__overlaps(car_C1: Car, noon, hour):
+    Reservation.objects.create(car=car_C1, to_rent_at=noon, to_return_at=noon + 2 * hour)
+
+    def count(start, end):
+        return api.count_reservations_for_car(car=car_C1, to_rent_at=start, to_return_at=end)
+
+    # touching intervals
+    assert count(noon - hour, noon) == 0
+    assert count(noon + 2 * hour, noon + 3 * hour) == 0
+    # colliding with start, with end, inside, around and equal
+    assert count(noon - hour, noon + hour) == 1
+    assert count(noon + hour, noon + 3 * hour) == 1
+    assert count(noon + hour / 2, noon + hour) == 1
+    assert count(noon - hour, noon + 3 * hour) == 1
+    assert count(noon, noon + 2 * hour) == 1
+
+
+def test__make_reservation__ok(car_C1: Car, noon, hour):
+    request_id = uuid.uuid4()
+    reservation = api.make_reservation(request_id=request_id, to_rent_at=noon, duration=hour)
+    assert reservation.pk is not None
+    assert reservation.car_id == car_C1.pk
+    assert reservation.request_id == request_id
+    assert reservation.to_return_at == noon + hour
+
+
+def test__make_reservation__dry_run(car_C1: Car, noon, hour):
+    reservation = api.make_reservation(request_id=uuid.uuid4(), to_rent_at=noon, duration=hour, dry_run=True)
+    assert reservation.pk is None
+    assert reservation.car_id == car_C1.pk
+    assert Reservation.objects.count() == 0
+
+
+def test__make_reservation__no_car_available(car_C1: Car, noon, hour):
+    api.make_reservation(request_id=uuid.uuid4(), to_rent_at=noon, duration=hour)
+    with pytest.raises(ReservationNoCarAvailableError):
+        api.make_reservation(request_id=uuid.uuid4(), to_rent_at=noon + hour / 2, duration=hour)
+    assert Reservation.objects.count() == 1
+
+
+@pytest.fixture
+def reservation_metrics():
+    metrics_registry.reset()
+    yield metrics
+    metrics_registry.reset()
+
+
+def test__make_reservation__metrics(reservation_metrics, car_C1: Car, noon, hour):
+    optimistic = {'mode': api.RESERVATION_MODE_OPTIMISTIC, 'strategy': 'default'}
+
+    api.make_reservation(request_id=uuid.uuid4(), to_rent_at=noon, duration=hour)
+    with pytest.raises(ReservationNoCarAvailableError):
+        api.make_reservation(request_id=uuid.uuid4(), to_rent_at=noon, duration=hour)
+
+    assert metrics.requests.value(**optimistic, outcome=metrics.OUTCOME_RESERVED) == 1
+    assert metrics.requests.value(**optimistic, outcome=metrics.OUTCOME_NO_CAR_AVAILABLE) == 1
+    assert metrics.trials.count(**optimistic) == 1
+    assert metrics.candidates.count() == 2
+    assert metrics.candidates.sum() == 1
+    for phase in ('candidates', 'insert', 'confirm', 'finalize'):
+        assert metrics.phase_seconds.count(phase=phase) >= 1
+
+
+@pytest.fixture
+def locking_mode(settings):
+    settings.RESERVATION_MODE = api.RESERVATION_MODE_LOCKING
+
+
+def test__make_reservation__locking__ok(
+        locking_mode, car_C1: Car, car_C2: Car, noon, hour, django_assert_max_num_queries,
+):
+    # lock + confirmation + insert (with savepoints around)
+    with django_assert_max_num_queries(5):
+        first = api.make_reservation(request_id=uuid.uuid4(), to_rent_at=noon, duration=hour)
+    second = api.make_reservation(request_id=uuid.uuid4(), to_rent_at=noon, duration=hour)
+    assert [first.car_id, second.car_id] == [car_C1.pk, car_C2.pk]
+    assert first.request_id is not None
+
+    with pytest.raises(ReservationNoCarAvailableError):
+        api.make_reservation(request_id=uuid.uuid4(), to_rent_at=noon, duration=hour)
+    assert Reservation.objects.count() == 2
+
+
+def test__make_reservation__locking__dry_run(locking_mode, car_C1: Car, noon, hour):
+    reservation = api.make_reservation(request_id=uuid.uuid4(), to_rent_at=noon, duration=hour, dry_run=True)
+    assert reservation.pk is None
+    assert reservation.car_id == car_C1.pk
+    assert Reservation.objects.count() == 0
+
+
+def test__make_reservation__locking__concurrent_collision(
+        locking_mode, reservation_metrics, settings, car_C1: Car, noon, hour,
+):
+    from apps.reservation.availability import index
+
+    settings.RESERVATION_AVAILABILITY_INDEX = True
+    index.clear()
+    index.load()
+    # the index still offers the car reserved by somebody else in the meanwhile
+    index.remove(car_C1.pk, Reservation.objects.create(car=car_C1, to_rent_at=noon, to_return_at=noon + hour).pk)
+    try:
+        with pytest.raises(ReservationFailedAttemptError):
+            api.make_reservation(request_id=uuid.uuid4(), to_rent_at=noon, duration=hour)
+    finally:
+        index.clear()
+    assert Reservation.objects.count() == 1
+    assert reservation_metrics.collisions.value(rent_hour=noon.hour) == 1
+    assert reservation_metrics.requests.value(
+        mode=api.RESERVATION_MODE_LOCKING, strategy='default', outcome=reservation_metrics.OUTCOME_FAILED_ATTEMPTS,
+    ) == 1
+
+
+def test__make_reservation__locking__next_candidate_after_collision(
+        locking_mode, reservation_metrics, settings, car_C1: Car, car_C2: Car, noon, hour,
+        django_capture_on_commit_callbacks,
+):
+    from apps.reservation.availability import index
+
+    settings.RESERVATION_AVAILABILITY_INDEX = True
+    index.clear()
+    index.load()
+    # the index misses the reservation of C1 (e.g. made by another process)
+    index.remove(car_C1.pk, Reservation.objects.create(car=car_C1, to_rent_at=noon, to_return_at=noon + hour).pk)
+    try:
+        with django_capture_on_commit_callbacks(execute=True):
+            reservation = api.make_reservation(request_id=uuid.uuid4(), to_rent_at=noon, duration=hour)
+        assert reservation.car_id == car_C2.pk
+        # the stale schedule of C1 has been reloaded
+        assert index.free_cars(noon, noon + hour) == []
+    finally:
+        index.clear()
+    assert reservation_metrics.collisions.value(rent_hour=noon.hour) == 1
+    assert reservation_metrics.trials.count(mode=api.RESERVATION_MODE_LOCKING, strategy='default') == 1
+    assert reservation_metrics.trials.sum(mode=api.RESERVATION_MODE_LOCKING, strategy='default') == 2
+
+
+def test__make_reservations__assigns_cars_without_conflicts(car_C1: Car, car_C2: Car, noon, hour,
+                                                            django_assert_max_num_queries):
+    api.make_reservation(request_id=uuid.uuid4(), to_rent_at=noon, duration=hour)  # takes C1
+
+    requests = [
+        (uuid.uuid4(), noon, hour),  # C2
+        (uuid.uuid4(), noon + hour / 2, hour),  # collides with both the previous ones
+        (uuid.uuid4(), noon + hour, hour),  # C2 (released by the first one)
+        (uuid.uuid4(), noon + hour, hour),  # C1 (partially reserved within the window)
+    ]
+    # candidates, schedules of partially reserved cars, lock, re-check, insert and confirmation (within a savepoint)
+    with django_assert_max_num_queries(8):
+        results = api.make_reservations(requests)
+
+    assert isinstance(results[0], Reservation) and results[0].car_id == car_C2.pk
+    assert isinstance(results[1], ReservationNoCarAvailableError)
+    assert isinstance(results[2], Reservation) and results[2].car_id == car_C2.pk
+    assert isinstance(results[3], Reservation) and results[3].car_id == car_C1.pk
+    assert [result.request_id for result in results if isinstance(result, Reservation)] == [
+        request_id for i, (request_id, _, _) in enumerate(requests) if i != 1
+    ]
+    assert Reservation.objects.count() == 4
+    assert all(result.pk is not None for result in results if isinstance(result, Reservation))
+
+
+def test__make_reservations__concurrently_reserved_car(car_C1: Car, car_C2: Car, noon, hour, monkeypatch):
+    assign_cars = api._assign_cars
+
+    def assign_and_reserve(*args, **kwargs):
+        assigned = assign_cars(*args, **kwargs)
+        if not Reservation.objects.exists():
+            # the picked car is reserved by somebody else before it is locked
+            Reservation.objects.create(car_id=assigned[0], to_rent_at=noon, to_return_at=noon + hour)
+        return assigned
+
+    monkeypatch.setattr(api, '_assign_cars', assign_and_reserve)
+    [result] = api.make_reservations([(uuid.uuid4(), noon, hour)])
+
+    # retried with the other car
+    assert isinstance(result, Reservation) and result.car_id == car_C2.pk
+    assert Reservation.objects.count() == 2
+
+
+def test__make_reservations__car_reserved_outside_of_leftovers(car_C1: Car, car_C2: Car, noon, hour):
+    Reservation.objects.create(car=car_C2, to_rent_at=noon, to_return_at=noon + hour)
+
+    results = api.make_reservations([
+        (uuid.uuid4(), noon, hour),
+        (uuid.uuid4(), noon + 4 * hour, hour),
+        (uuid.uuid4(), noon + 4 * hour, hour),
+    ])
+
+    # the last request does not fit the fully free car, but the car reserved only before it
+    assert [result.car_id for result in results] == [car_C1.pk, car_C1.pk, car_C2.pk]
+
+
+def test__make_reservations__idempotent(car_C1: Car, car_C2: Car, noon, hour):
+    first, second = uuid.uuid4(), uuid.uuid4()
+    made = api.make_reservations([(first, noon, hour), (second, noon, hour)], idempotent=True)
+
+    retried = api.make_reservations([
+        (first, noon, hour),
+        (second, noon, 2 * hour),
+        (first, noon + hour, hour),
+        (uuid.uuid4(), noon + hour, hour),
+    ], idempotent=True)
+    assert retried[0].pk == made[0].pk
+    assert isinstance(retried[1], ReservationRequestIdConflictError)
+    # the same key twice within a batch
+    assert isinstance(retried[2], ReservationRequestIdConflictError)
+    assert isinstance(retried[3], Reservation)
+    assert Reservation.objects.count() == 3
+
+    # not idempotent requests do not look up their request IDs, but they cannot reuse them either
+    assert isinstance(api.make_reservations([(first, noon + hour, hour)])[0], ReservationInternalError)
+    assert Reservation.objects.count() == 3
+
+
+def test__make_reservations__request_id_used_concurrently(car_C1: Car, car_C2: Car, noon, hour, monkeypatch):
+    request_id = uuid.uuid4()
+    assign_cars = api._assign_cars
+
+    def assign_and_reserve(*args, **kwargs):
+        if not Reservation.objects.exists():
+            # the same (retried) request made by somebody else after the request IDs were looked up
+            Reservation.objects.create(car=car_C2, to_rent_at=noon, to_return_at=noon + hour, request_id=request_id)
+        return assign_cars(*args, **kwargs)
+
+    monkeypatch.setattr(api, '_assign_cars', assign_and_reserve)
+    [result] = api.make_reservations([(request_id, noon, hour)], idempotent=True)
+
+    # the round failed on the unique request ID is resolved by the existing reservation
+    assert result.request_id == request_id and result.car_id == car_C2.pk
+    assert Reservation.objects.count() == 1
+
+
+def test__make_reservations__empty_and_too_many(db, noon, hour):
+    assert api.make_reservations([]) == []
+
+    with pytest.raises(ValueError):
+        api.make_reservations([(uuid.uuid4(), noon, hour)] * (api.MAX_BATCH_SIZE + 1))
+
+
+def test__free_slots_per_car(car_C1: Car, car_C2: Car, noon, hour, django_assert_num_queries):
+    Reservation.objects.create(car=car_C1, to_rent_at=noon + hour, to_return_at=noon + 2 * hour)
+    Reservation.objects.create(car=car_C2, to_rent_at=noon - hour, to_return_at=noon + 3 * hour)
+
+    with django_assert_num_queries(2):
+        slots = [(car.pk, gaps) for car, gaps in api.free_slots_per_car(noon, noon + 4 * hour)]
+    assert slots == [
+        (car_C1.pk, [(noon, noon + hour), (noon + 2 * hour, noon + 4 * hour)]),
+        (car_C2.pk, [(noon + 3 * hour, noon + 4 * hour)]),
+    ]
+
+    slots = [(car.pk, gaps) for car, gaps in api.free_slots_per_car(noon, noon + 4 * hour, min_duration=2 * hour)]
+    assert slots == [(car_C1.pk, [(noon + 2 * hour, noon + 4 * hour)]), (car_C2.pk, [])]
+
+
+def test__free_slots_of_fleet(car_C1: Car, car_C2: Car, noon, hour):
+    Reservation.objects.create(car=car_C1, to_rent_at=noon + hour, to_return_at=noon + 2 * hour)
+    Reservation.objects.create(car=car_C2, to_rent_at=noon - hour, to_return_at=noon + 3 * hour)
+
+    assert list(api.free_slots_of_fleet(noon, noon + 4 * hour)) == [
+        (noon, noon + hour, 1), (noon + 2 * hour, noon + 4 * hour, 1),
+    ]
+
+    with pytest.raises(ValueError):
+        list(api.free_slots_of_fleet(noon, noon))
+
+
+@pytest.fixture
+def lookup_cache():
+    caches.reservation_by_request_id.clear()
+    yield caches.reservation_by_request_id
+    caches.reservation_by_request_id.clear()
+
+
+@pytest.mark.parametrize('mode', [api.RESERVATION_MODE_OPTIMISTIC, api.RESERVATION_MODE_LOCKING])
+def test__make_reservation__idempotent(settings, mode, car_C1: Car, car_C2: Car, noon, hour):
+    settings.RESERVATION_MODE = mode
+    request_id = uuid.uuid4()
+
+    first = api.make_reservation(request_id=request_id, to_rent_at=noon, duration=hour, idempotent=True)
+    retried = api.make_reservation(request_id=request_id, to_rent_at=noon, duration=hour, idempotent=True)
+    assert retried.pk == first.pk
+    assert Reservation.objects.count() == 1
+
+    with pytest.raises(ReservationRequestIdConflictError):
+        api.make_reservation(request_id=request_id, to_rent_at=noon, duration=2 * hour, idempotent=True)
+
+    with pytest.raises(ReservationInternalError):
+        api.make_reservation(request_id=request_id, to_rent_at=noon, duration=hour)
+    assert Reservation.objects.count() == 1
+
+
+def test__fetch_reservation_by_request_id__cached(lookup_cache, car_C1: Car, noon, hour, django_assert_num_queries):
+    request_id = uuid.uuid4()
+
+    with django_assert_num_queries(1):
+        assert api.fetch_reservation_by_request_id(request_id) is None
+        assert api.fetch_reservation_by_request_id(request_id) is None
+
+    # negative entry is dropped as soon as the reservation is made
+    reservation = api.make_reservation(request_id=request_id, to_rent_at=noon, duration=hour)
+    with django_assert_num_queries(1):
+        assert api.fetch_reservation_by_request_id(request_id).pk == reservation.pk
+        assert api.fetch_reservation_by_request_id(request_id).pk == reservation.pk
+
+    reservation.delete()
+    assert api.fetch_reservation_by_request_id(request_id) is None
+
+
+def test__fetch_reservation_by_request_id__expired(lookup_cache, db, monkeypatch):
+    monkeypatch.setattr(lookup_cache, 'negative_ttl', 0)
+    api.fetch_reservation_by_request_id(uuid.uuid4())
+    assert len(lookup_cache) == 0
@@ -0,0 +1,116 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import transaction
+
+from apps.api.graphql.schema import schema
+from apps.carpool.models import Car
+from apps.reservation import utilization
+from apps.reservation.models import Reservation
+
+
+@pytest.fixture
+def matrices():
+    utilization.matrices.clear()
+    yield utilization.matrices
+    utilization.matrices.clear()
+
+
+def test__occupancy_matrix__fill(noon, hour):
+    matrix = utilization.OccupancyMatrix(noon, hour, 4, car_pks=[2, 1])
+    matrix.fill([
+        (10, 1, noon - hour, noon + hour),  # starts before the window
+        (11, 1, noon + 2 * hour + hour / 4, noon + 2 * hour + hour / 2),  # within a single bucket
+        (12, 2, noon + hour, noon + 10 * hour),  # ends after the window
+        (13, 3, noon, noon + hour),  # unknown car
+        (14, 2, noon + 5 * hour, noon + 6 * hour),  # out of the window
+    ])
+    assert matrix.occupied.tolist() == [[True, False, True, False], [False, True, True, True]]
+    assert matrix.free_cars().tolist() == [1, 1, 0, 1]
+    assert matrix.occupied_cars().tolist() == [1, 1, 2, 1]
+
+    matrix.remove(12)
+    matrix.add(15, 2, noon, noon + hour / 2)
+    assert matrix.occupied.tolist() == [[True, False, True, False], [True, False, False, False]]
+
+    matrix.add_car(3)
+    matrix.remove_car(1)
+    assert matrix.free_cars().tolist() == [1, 2, 2, 2]
+
+
+def test__occupancy_matrix__add_single_reservation(noon, hour, monkeypatch):
+    matrix = utilization.OccupancyMatrix(noon, hour, 4, car_pks=[1, 2])
+    monkeypatch.setattr(matrix, 'fill', None)
+
+    matrix.add(10, 2, noon + hour / 2, noon + 2 * hour)
+    matrix.add(11, 2, noon + 3 * hour, noon + 9 * hour)
+    matrix.add(12, 3, noon, noon + hour)  # unknown car
+    matrix.add(13, 1, noon - 2 * hour, noon - hour)  # out of the window
+    # saved again (e.g. with its request ID)
+    matrix.add(10, 2, noon + hour / 2, noon + 2 * hour)
+    assert matrix.counts.tolist() == [[0, 0, 0, 0], [1, 1, 0, 1]]
+
+    matrix.remove(10)
+    assert matrix.counts.tolist() == [[0, 0, 0, 0], [0, 0, 0, 1]]
+
+
+def test__free_cars_per_bucket__incremental(
+        matrices, car_C1: Car, car_C2: Car, noon, hour, django_capture_on_commit_callbacks,
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        Reservation.objects.create(car=car_C1, to_rent_at=noon, to_return_at=noon + hour)
+    assert [free for _, free, _ in utilization.free_cars_per_bucket(noon, hour, 3)] == [1, 2, 2]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        reservation = Reservation.objects.create(car=car_C2, to_rent_at=noon, to_return_at=noon + 2 * hour)
+    assert [free for _, free, _ in utilization.free_cars_per_bucket(noon, hour, 3)] == [0, 1, 2]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        reservation.delete()
+        car_C1.delete()
+    assert [free for _, free, _ in utilization.free_cars_per_bucket(noon, hour, 3)] == [1, 1, 1]
+
+
+def test__free_cars_per_bucket__rolled_back(matrices, car_C1: Car, noon, hour):
+    assert [free for _, free, _ in utilization.free_cars_per_bucket(noon, hour, 2)] == [1, 1]
+
+    with pytest.raises(RuntimeError), transaction.atomic():
+        Reservation.objects.create(car=car_C1, to_rent_at=noon, to_return_at=noon + hour)
+        raise RuntimeError
+
+    # the matrix is updated only by committed changes
+    assert [free for _, free, _ in utilization.free_cars_per_bucket(noon, hour, 2)] == [1, 1]
+
+
+def test__align(noon, hour):
+    assert utilization.align(noon + hour / 3, hour / 4) == noon + hour / 4
+    with pytest.raises(ValueError):
+        utilization.align(noon, hour / 7)
+
+
+def test__utilization__query(matrices, car_C1: Car, noon, hour):
+    Reservation.objects.create(car=car_C1, to_rent_at=noon, to_return_at=noon + hour / 2)
+
+    result = schema.execute(
+        'query ($from: DateTime) { utilization(from: $from, bucketMinutes: 30, buckets: 2) '
+        '{ start freeCars occupiedCars } }',
+        variable_values={'from': noon.isoformat()},
+    )
+    assert result.errors is None
+    assert result.data['utilization'] == [
+        {'start': noon.isoformat(), 'freeCars': 0, 'occupiedCars': 1},
+        {'start': (noon + hour / 2).isoformat(), 'freeCars': 1, 'occupiedCars': 0},
+    ]
+
+
+def test__utilization__command(car_C1: Car, noon, hour):
+    Reservation.objects.create(car=car_C1, to_rent_at=noon, to_return_at=noon + hour)
+
+    out = StringIO()
+    call_command('utilization', '--from', noon.isoformat(), '--bucket-minutes', '60', '--buckets', '2', stdout=out)
+    assert out.getvalue().splitlines() == [
+        'start,free_cars,occupied_cars',
+        f'{noon.isoformat()},0,1',
+        f'{(noon + hour).isoformat()},1,0',
+    ]
@@ -0,0 +1,240 @@
+"""Fleet-wide utilization computed on a cars x time-buckets occupancy matrix.
+
+The matrix is built from reservations by vectorized NumPy operations (difference array + cumulative sum per car)
+and cached matrices are kept up to date incrementally when reservations or cars are created or deleted
+(see `signals.py`).
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
+
+
+MAX_BUCKETS = 10_000
+
+
+class OccupancyMatrix:
+    """Number of reservations of each car (rows ordered by car primary key) in each time bucket (columns).
+
+    Counts (instead of plain booleans) allow removing a reservation without rebuilding the whole matrix.
+    """
+
+    def __init__(self, start: datetime, bucket: timedelta, buckets: int, car_pks):
+        if bucket <= timedelta(0) or buckets <= 0:
+            raise ValueError('invalid time buckets')
+
+        self.start = start
+        self.bucket = bucket
+        self.buckets = buckets
+        self.car_pks = np.asarray(sorted(car_pks), dtype=np.int64)
+        self.counts = np.zeros((len(self.car_pks), buckets), dtype=np.uint16)
+        # reservation pk -> (car pk, first bucket, last bucket exclusive) of reservations applied to the matrix
+        self._applied: dict[int, tuple[int, int, int]] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def end(self) -> datetime:
+        return self.start + self.buckets * self.bucket
+
+    def _bucket_range(self, starts: np.ndarray, ends: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """First and last (exclusive) buckets touched by intervals given by POSIX timestamps."""
+
+        origin = self.start.timestamp()
+        size = self.bucket.total_seconds()
+        first = np.clip(np.floor((starts - origin) / size), 0, self.buckets).astype(np.int64)
+        last = np.clip(np.ceil((ends - origin) / size), 0, self.buckets).astype(np.int64)
+        return first, last
+
+    def fill(self, rows: list[tuple[int, int, datetime, datetime]]):
+        """Apply `(pk, car_pk, start, end)` reservation rows at once."""
+
+        if not rows:
+            return
+
+        pks = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        car_pks = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+        starts = np.fromiter((row[2].timestamp() for row in rows), dtype=np.float64, count=len(rows))
+        ends = np.fromiter((row[3].timestamp() for row in rows), dtype=np.float64, count=len(rows))
+
+        with self._lock:
+            car_rows = np.searchsorted(self.car_pks, car_pks)
+            known = (car_rows < len(self.car_pks))
+            known[known] = self.car_pks[car_rows[known]] == car_pks[known]
+
+            first, last = self._bucket_range(starts, ends)
+            valid = known & (first < last)
+            car_rows, first, last = car_rows[valid], first[valid], last[valid]
+
+            # accumulated in place in the (unsigned) dtype of the matrix, the wrapping arithmetic is exact as long as
+            # the resulting counts fit it
+            diff = np.zeros((len(self.car_pks), self.buckets + 1), dtype=self.counts.dtype)
+            np.add.at(diff, (car_rows, first), 1)
+            np.subtract.at(diff, (car_rows, last), 1)
+            np.cumsum(diff, axis=1, dtype=diff.dtype, out=diff)
+            self.counts += diff[:, :-1]
+
+            self._applied.update(zip(
+                pks[valid].tolist(),
+                zip(car_pks[valid].tolist(), first.tolist(), last.tolist()),
+            ))
+
+    def _row(self, car_pk: int) -> int | None:
+        row = int(np.searchsorted(self.car_pks, car_pk))
+        if row < len(self.car_pks) and self.car_pks[row] == car_pk:
+            return row
+        return None
+
+    def add(self, pk: int, car_pk: int, start: datetime, end: datetime):
+        """Apply a single reservation (touching only the buckets of its row, unlike `fill`)."""
+
+        with self._lock:
+            self.remove(pk)
+            if (row := self._row(car_pk)) is None:
+                return
+
+            first, last = self._bucket_range(np.array([start.timestamp()]), np.array([end.timestamp()]))
+            first, last = int(first[0]), int(last[0])
+            if first < last:
+                self.counts[row, first:last] += 1
+                self._applied[pk] = (car_pk, first, last)
+
+    def remove(self, pk: int):
+        with self._lock:
+            if (applied := self._applied.pop(pk, None)) is None:
+                return
+
+            car_pk, first, last = applied
+            if (row := self._row(car_pk)) is not None:
+                self.counts[row, first:last] -= 1
+
+    def add_car(self, car_pk: int):
+        with self._lock:
+            if self._row(car_pk) is not None:
+                return
+
+            row = np.searchsorted(self.car_pks, car_pk)
+            self.car_pks = np.insert(self.car_pks, row, car_pk)
+            self.counts = np.insert(self.counts, row, 0, axis=0)
+
+    def remove_car(self, car_pk: int):
+        with self._lock:
+            if (row := self._row(car_pk)) is None:
+                return
+
+            self.car_pks = np.delete(self.car_pks, row)
+            self.counts = np.delete(self.counts, row, axis=0)
+            self._applied = {pk: applied for pk, applied in self._applied.items() if applied[0] != car_pk}
+
+    @property
+    def occupied(self) -> np.ndarray:
+        """Boolean cars x buckets matrix of occupied cars."""
+
+        return self.counts > 0
+
+    def occupied_cars(self) -> np.ndarray:
+        """Number of cars occupied (at least partially) in each bucket."""
+
+        with self._lock:
+            return self.occupied.sum(axis=0)
+
+    def free_cars(self) -> np.ndarray:
+        """Number of cars free during the whole bucket."""
+
+        with self._lock:
+            return len(self.car_pks) - self.occupied.sum(axis=0)
+
+    def bucket_starts(self) -> list[datetime]:
+        return [self.start + i * self.bucket for i in range(self.buckets)]
+
+
+def build(start: datetime, bucket: timedelta, buckets: int) -> OccupancyMatrix:
+    """Build a new occupancy matrix from DB (one query for cars and one for reservations within the time window)."""
+
+    from apps.carpool.models import Car
+    from .models import Reservation
+
+    matrix = OccupancyMatrix(start, bucket, buckets, Car.objects.values_list('pk', flat=True))
+    rows = Reservation.objects.filter(
+        to_rent_at__lt=matrix.end,
+        to_return_at__gt=matrix.start,
+    ).values_list('pk', 'car_id', 'to_rent_at', 'to_return_at')
+    matrix.fill(list(rows.iterator(chunk_size=10000)))
+    return matrix
+
+
+class MatrixCache:
+    """A few recently used matrices kept up to date by reservation and car changes."""
+
+    def __init__(self, size: int = 4):
+        self._size = size
+        self._matrices: OrderedDict[tuple, OccupancyMatrix] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, start: datetime, bucket: timedelta, buckets: int) -> OccupancyMatrix:
+        key = (start, bucket, buckets)
+        with self._lock:
+            if (matrix := self._matrices.get(key)) is not None:
+                self._matrices.move_to_end(key)
+                return matrix
+
+        matrix = build(start, bucket, buckets)
+
+        with self._lock:
+            self._matrices[key] = matrix
+            while len(self._matrices) > self._size:
+                self._matrices.popitem(last=False)
+
+        return matrix
+
+    @property
+    def active(self) -> bool:
+        """Whether any matrix is cached (and has to be kept up to date)."""
+
+        with self._lock:
+            return bool(self._matrices)
+
+    def _all(self) -> list[OccupancyMatrix]:
+        with self._lock:
+            return list(self._matrices.values())
+
+    def clear(self):
+        with self._lock:
+            self._matrices.clear()
+
+    def add(self, pk: int, car_pk: int, start: datetime, end: datetime):
+        for matrix in self._all():
+            matrix.add(pk, car_pk, start, end)
+
+    def remove(self, pk: int):
+        for matrix in self._all():
+            matrix.remove(pk)
+
+    def add_car(self, car_pk: int):
+        for matrix in self._all():
+            matrix.add_car(car_pk)
+
+    def remove_car(self, car_pk: int):
+        for matrix in self._all():
+            matrix.remove_car(car_pk)
+
+
+matrices = MatrixCache()
+
+
+def align(moment: datetime, bucket: timedelta) -> datetime:
+    """Align the given moment down to the whole bucket (counted since the Unix epoch)."""
+
+    seconds = int(bucket.total_seconds())
+    if seconds <= 0 or seconds != bucket.total_seconds():
+        raise ValueError('bucket has to be a positive whole number of seconds')
+
+    return moment - timedelta(seconds=int(moment.timestamp()) % seconds, microseconds=moment.microsecond)
+
+
+def free_cars_per_bucket(start: datetime, bucket: timedelta, buckets: int) -> list[tuple[datetime, int, int]]:
+    """Number of free and occupied cars in each bucket as `(bucket start, free cars, occupied cars)` tuples."""
+
+    matrix = matrices.get(start, bucket, buckets)
+    return list(zip(matrix.bucket_starts(), matrix.free_cars().tolist(), matrix.occupied_cars().tolist()))
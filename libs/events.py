@@ -0,0 +1,146 @@
+"""In-process fan-out of events to subscribers (e.g. streams of server-sent events).
+
+Every subscriber has a bounded queue of its own and publishing never blocks. A subscriber too slow to keep up loses
+the events that do not fit into its queue and gets a single `resync` event instead (telling it to reload the state
+rather than to apply events). Events are delivered to subscribers of the same process only.
+"""
+
+import asyncio
+import itertools
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+
+from django.db import transaction
+
+
+RESYNC = 'resync'
+
+
+@dataclass(frozen=True)
+class Event:
+    id: int
+    type: str
+    data: dict = field(default_factory=dict)
+
+
+class Subscription:
+    """Queue of events published since subscribing, read either by a thread (`get`) or by a coroutine (`aget`)."""
+
+    def __init__(self, broker: 'Broker', max_size: int):
+        self.max_size = max_size
+        self._broker = broker
+        self._events: deque[Event] = deque()
+        self._lagged = False
+        self._last_id = 0
+        self._condition = threading.Condition()
+        # loop of the last `aget`, woken up from publishing threads
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+
+    def __enter__(self) -> 'Subscription':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._broker.unsubscribe(self)
+
+    def put(self, event: Event):
+        with self._condition:
+            self._last_id = event.id
+            if len(self._events) < self.max_size:
+                self._events.append(event)
+            else:
+                self._lagged = True
+            self._condition.notify()
+            loop, wakeup = self._loop, self._wakeup
+
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                # the loop of the subscriber has been closed already
+                pass
+
+    def _drain(self) -> list[Event]:
+        if self._lagged:
+            events = [Event(id=self._last_id, type=RESYNC)]
+            self._lagged = False
+        else:
+            events = list(self._events)
+        self._events.clear()
+        return events
+
+    def get(self, timeout: float | None = None) -> list[Event]:
+        """Wait (at most the timeout) for events, return all of them queued so far (empty list on timeout)."""
+
+        with self._condition:
+            if not self._events and not self._lagged:
+                self._condition.wait(timeout)
+            return self._drain()
+
+    async def aget(self, timeout: float | None = None) -> list[Event]:
+        """Asynchronous counterpart of `get`."""
+
+        if self._loop is not (loop := asyncio.get_running_loop()):
+            with self._condition:
+                self._loop, self._wakeup = loop, asyncio.Event()
+
+        self._wakeup.clear()
+        with self._condition:
+            if self._events or self._lagged:
+                return self._drain()
+
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except TimeoutError:
+            pass
+
+        with self._condition:
+            return self._drain()
+
+
+class Broker:
+    def __init__(self):
+        self._subscriptions: set[Subscription] = set()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+    def has_subscribers(self) -> bool:
+        return bool(self._subscriptions)
+
+    def subscribe(self, max_size: int = 100, max_subscribers: int | None = None) -> Subscription | None:
+        """New subscription with a queue of the given size, None if there are too many subscribers already."""
+
+        with self._lock:
+            if max_subscribers is not None and len(self._subscriptions) >= max_subscribers:
+                return None
+            subscription = Subscription(self, max_size=max_size)
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, type: str, data: dict | None = None) -> Event:
+        # every subscriber gets events in the order of their IDs
+        with self._lock:
+            event = Event(id=next(self._ids), type=type, data=data or {})
+            for subscription in self._subscriptions:
+                subscription.put(event)
+        return event
+
+
+broker = Broker()
+
+
+def publish_on_commit(type: str, data: dict | None = None):
+    """Publish the event by the broker once the current transaction (if any) is committed."""
+
+    transaction.on_commit(lambda: broker.publish(type, data))
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 import logging
 import os
 import structlog
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -34,7 +35,9 @@ ALLOWED_HOSTS = []
 # Application definition
 
 INSTALLED_APPS = [
+    'apps.api',
     'apps.carpool',
+    'apps.counters',
     'apps.reservation',
     'django_hosts',
     'graphene_django',
@@ -92,6 +95,30 @@ DATABASES = {
     }
 }
 
+# Local PostgreSQL (e.g. a throw-away container) can be used instead of SQLite, mainly for benchmarks and query
+# plan checks, by setting `RESCARAPI_DB_ENGINE=postgresql` (and the other `RESCARAPI_DB_*` variables if needed).
+if os.environ.get('RESCARAPI_DB_ENGINE') == 'postgresql':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('RESCARAPI_DB_NAME', 'rescarapi'),
+        'USER': os.environ.get('RESCARAPI_DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('RESCARAPI_DB_PASSWORD', ''),
+        'HOST': os.environ.get('RESCARAPI_DB_HOST', 'localhost'),
+        'PORT': os.environ.get('RESCARAPI_DB_PORT', '5432'),
+    }
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # shared by all the processes of the host
+    'graphql-responses': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'rescarapi-graphql-responses'),
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -147,6 +174,99 @@ GRAPHENE = {
     'SCHEMA-OUTPUT': 'schema.json',
     'SCHEMA-INDENT': 2,
 }
+# Number of parsed and validated GraphQL documents kept in memory (least recently used ones are dropped).
+GRAPHQL_DOCUMENT_CACHE_SIZE = 1000
+# Persisted queries: JSON file mapping SHA-256 hashes to queries (or None) and number of queries registered by
+# clients (sending a query along with its hash) kept in memory. In strict mode, only queries of the file are
+# executed.
+GRAPHQL_PERSISTED_QUERIES = None
+GRAPHQL_PERSISTED_QUERIES_CACHE_SIZE = 1000
+GRAPHQL_PERSISTED_QUERIES_STRICT = False
+# Static cost analysis: operations costing more than the maximum (or nested deeper) are rejected before execution,
+# the cost is reported in `extensions.cost` of responses. Lists without any size argument count as the given number
+# of items. Cost budgets of clients (by address) can be throttled: refilled by the given rate per second up to the
+# burst (None disables throttling).
+GRAPHQL_MAX_COST = 10_000
+GRAPHQL_MAX_DEPTH = 10
+GRAPHQL_COST_LIST_SIZE = 100
+GRAPHQL_COST_THROTTLE_RATE = None
+GRAPHQL_COST_THROTTLE_BURST = 20_000
+# Maximum number of operations of a batched request (JSON array of operations).
+GRAPHQL_MAX_BATCH_SIZE = 20
+# Cache of responses of read-only queries (e.g. of cars) invalidated by changes done by services: None (disabled),
+# 'in-process' or 'shared' (Django cache of the given alias shared by all the worker processes). Cached responses
+# expire after the given timeout (in seconds), in-process cache keeps at most the given number of them.
+GRAPHQL_RESPONSE_CACHE = None
+GRAPHQL_RESPONSE_CACHE_TIMEOUT = 300
+GRAPHQL_RESPONSE_CACHE_SIZE = 1000
+GRAPHQL_RESPONSE_CACHE_ALIAS = 'graphql-responses'
+# Serve the GraphQL end-point by the asynchronous view (for ASGI servers, see `rescarapi/asgi.py`): operations are
+# executed on the event loop and DB work of resolvers runs off the loop, at most the given number of DB calls of the
+# whole process at once (keep it within the number of DB connections available to the process).
+GRAPHQL_ASYNC = False
+GRAPHQL_ASYNC_DB_CONCURRENCY = 10
+# Tracing of GraphQL operations: durations of phases, timings and DB queries of resolvers of the given fraction of
+# operations are returned in `extensions.tracing` of responses and/or logged (by structlog).
+GRAPHQL_TRACING = False
+GRAPHQL_TRACING_SAMPLE_RATE = 1.0
+GRAPHQL_TRACING_EXTENSION = True
+GRAPHQL_TRACING_LOG = False
+
+# Carpool-oriented settings.
+# Imported cars (by `import_cars` management command and `importCars` mutation) are inserted by chunks of the given
+# size.
+CARPOOL_IMPORT_CHUNK_SIZE = 1000
+
+# Reservation-oriented settings.
+# Keep per-car reservation intervals in memory and use DB only to confirm the car selected for a reservation.
+RESERVATION_AVAILABILITY_INDEX = False
+# Either 'optimistic' (insert provisional reservation, re-count collisions and retry with another car) or 'locking'
+# (lock a free car row and reserve it in a single transaction with constant number of statements).
+RESERVATION_MODE = 'optimistic'
+# Order of candidate cars for a reservation: 'default' (by primary key), 'random', 'sharded' (by hash of request ID
+# into RESERVATION_CAR_SELECTION_SHARDS shards) or 'least_recently_reserved'. The strategies other than the default
+# one choose from a pool of (at most) RESERVATION_CAR_SELECTION_POOL free cars following a position in the fleet.
+RESERVATION_CAR_SELECTION = 'default'
+RESERVATION_CAR_SELECTION_SHARDS = 16
+RESERVATION_CAR_SELECTION_POOL = 100
+# Collect reserve mutations arriving within the given window (in milliseconds) and make them by a single batch
+# (batches follow RESERVATION_CAR_SELECTION, but not RESERVATION_MODE -- cars picked for a batch are always locked).
+RESERVATION_COALESCING = False
+RESERVATION_COALESCING_WINDOW_MS = 5
+RESERVATION_COALESCING_TIMEOUT = 30
+# In-process cache of reservations looked up by request ID (time to live in seconds, separately for unknown IDs).
+RESERVATION_LOOKUP_CACHE_TTL = 5
+RESERVATION_LOOKUP_CACHE_NEGATIVE_TTL = 1
+RESERVATION_LOOKUP_CACHE_SIZE = 10_000
+
+# Counters-oriented settings.
+# Maintain counters of cars and reservations (global and per car) used for total counts instead of `COUNT(*)`
+# (run `rebuild_counters` management command after enabling). Global counters are split into the given number of
+# rows to spread concurrent updates.
+COUNTERS = False
+COUNTERS_SHARDS = 8
+
+# Export-oriented settings.
+# Only requests from these addresses can stream exports of reservations and cars, rows are fetched (and written) in
+# chunks of the given size.
+EXPORT_ALLOWED_ADDRESSES = ['127.0.0.1', '::1']
+EXPORT_CHUNK_SIZE = 2000
+
+# Events-oriented settings.
+# Server-sent events about reservations and cars: each subscriber (stream) has a queue of the given size (overflowing
+# subscriber gets a `resync` event instead of the lost ones), number of subscribers of a process is limited and idle
+# streams get a comment every given number of seconds. Only requests from these addresses can subscribe, streams of
+# a synchronous (WSGI) server hold a worker each, so they are closed after the given number of seconds (clients
+# reconnect on their own).
+EVENTS_QUEUE_SIZE = 100
+EVENTS_MAX_SUBSCRIBERS = 100
+EVENTS_HEARTBEAT = 15
+EVENTS_ALLOWED_ADDRESSES = ['127.0.0.1', '::1']
+EVENTS_SYNC_MAX_DURATION = 60
+
+# Metrics-oriented settings.
+# Only requests from these addresses can read the metrics end-point.
+METRICS_ALLOWED_ADDRESSES = ['127.0.0.1', '::1']
 
 # Very basic logger settings
 structlog.configure(